@@ -0,0 +1,175 @@
+"""
+Parallel analytics of recorded flights
+
+Each recording (see siyi_recorder) is memory-mapped and decoded with siyi_decoder in its own
+worker process, and only its summary row comes back, so directories of captures are analysed
+on all cores.
+
+    rows = analyzeDirectory("flights/", output="summary.csv")
+
+or
+    python siyi_analytics.py flights/ --output summary.csv --workers 8
+
+Requires numpy
+"""
+import argparse
+import csv
+import glob
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError: # optional, only needed for the analytics
+    np = None
+
+# Columns of the summary table, in order
+SUMMARY_FIELDS = (
+    'file', 'error', 'duration_s', 'frames', 'crc_errors', 'crc_error_rate', 'unknown',
+    # Attitude replies and pushed attitude
+    'att_count', 'att_rate_hz', 'att_gap_p50_ms', 'att_gap_p99_ms', 'att_gap_max_ms',
+    'yaw_min', 'yaw_max', 'pitch_min', 'pitch_max',
+    'yaw_speed_abs_max', 'pitch_speed_abs_max', 'roll_speed_abs_max',
+    # Max_Min_Temp and BOX_TEMP replies
+    'temp_count', 'temp_max', 'temp_min', 'box_temp_count', 'box_temp_max', 'box_temp_min',
+    # Rangefinder, 0 is no return
+    'range_count', 'range_valid_ratio', 'range_min', 'range_p50', 'range_p95', 'range_max',
+)
+
+
+def _percentile(values, p):
+    return float(np.percentile(values, p)) if len(values) else None
+
+def _extremum(func, values):
+    return float(func(values)) if len(values) else None
+
+def summarizeFrames(frames):
+    """
+    Reduces the decoded frames of one flight to a summary row
+
+    Params
+    --
+    - frames [DecodedFrames] see siyi_decoder.decodeStream()
+
+    Returns
+    --
+    [dict] Values of SUMMARY_FIELDS, None where there is no data
+    """
+    row = dict.fromkeys(SUMMARY_FIELDS)
+    row['frames'] = frames.frames
+    row['crc_errors'] = frames.crc_errors
+    row['crc_error_rate'] = frames.crc_errors/(frames.frames+frames.crc_errors) if frames.frames+frames.crc_errors else 0.
+    row['unknown'] = frames.unknown
+
+    stamps = [array['stamp'] for array in frames.values() if len(array)]
+    if stamps:
+        stamps = np.concatenate(stamps)
+        row['duration_s'] = float(np.nanmax(stamps)-np.nanmin(stamps)) if not np.isnan(stamps).all() else None
+
+    att = frames.get('gimbal_attitude')
+    if att is not None and len(att):
+        row['att_count'] = len(att)
+        t = np.sort(att['stamp'])
+        if len(t) > 1 and t[-1] > t[0]:
+            gaps = np.diff(t)*1e3
+            row['att_rate_hz'] = (len(t)-1)/(t[-1]-t[0])
+            row['att_gap_p50_ms'] = _percentile(gaps, 50)
+            row['att_gap_p99_ms'] = _percentile(gaps, 99)
+            row['att_gap_max_ms'] = float(gaps.max())
+        for name in ('yaw', 'pitch'):
+            row[name+'_min'] = float(att[name].min())
+            row[name+'_max'] = float(att[name].max())
+        for name in ('yaw_speed', 'pitch_speed', 'roll_speed'):
+            row[name+'_abs_max'] = float(np.abs(att[name]).max())
+
+    for key, prefix in (('max_min_temperature', 'temp'), ('box_temperature', 'box_temp')):
+        temp = frames.get(key)
+        if temp is not None and len(temp):
+            row[prefix+'_count'] = len(temp)
+            row[prefix+'_max'] = float(temp['temp_max'].max())
+            row[prefix+'_min'] = float(temp['temp_min'].min())
+
+    rng = frames.get('range_finder')
+    if rng is not None and len(rng):
+        values = rng['Range_value']
+        valid = values[values > 0.]
+        row['range_count'] = len(values)
+        row['range_valid_ratio'] = len(valid)/len(values)
+        row['range_min'] = _extremum(np.min, valid)
+        row['range_p50'] = _percentile(valid, 50)
+        row['range_p95'] = _percentile(valid, 95)
+        row['range_max'] = _extremum(np.max, valid)
+    return row
+
+def summarizeRecording(path):
+    """
+    Decodes and summarises one recording. Errors are reported in the error column,
+    so one bad file does not stop a batch
+
+    Returns
+    --
+    [dict] Summary row, see SUMMARY_FIELDS
+    """
+    from siyi_decoder import decodeRecording
+    try:
+        row = summarizeFrames(decodeRecording(path))
+    except Exception as e:
+        row = dict.fromkeys(SUMMARY_FIELDS)
+        row['error'] = "%s: %s" % (e.__class__.__name__, e)
+    row['file'] = path
+    return row
+
+def analyzeDirectory(directory, pattern='*.siyirec', workers=None, output=None):
+    """
+    Summarises every recording of a directory on a process pool
+
+    Params
+    --
+    - directory [str] Folder of recordings. Subfolders are included
+    - pattern [str] File name pattern
+    - workers [int] Processes. Number of CPUs if None
+    - output [str] CSV file to write the combined table to
+
+    Returns
+    --
+    [list] Summary rows sorted by file, see SUMMARY_FIELDS
+    """
+    if np is None:
+        raise ImportError("siyi_analytics requires numpy")
+    files = sorted(glob.glob(os.path.join(directory, '**', pattern), recursive=True))
+    if not files:
+        logging.getLogger(__name__).warning("No %s file in %s", pattern, directory)
+        rows = []
+    elif workers==1 or len(files)==1:
+        rows = [summarizeRecording(path) for path in files]
+    else:
+        # Largest files first, so a long flight does not start last
+        order = sorted(files, key=os.path.getsize, reverse=True)
+        with ProcessPoolExecutor(workers) as pool:
+            rows = sorted(pool.map(summarizeRecording, order), key=lambda row: row['file'])
+    if output is not None:
+        writeTable(rows, output)
+    return rows
+
+def writeTable(rows, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: '' if v is None else v for k, v in row.items()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise recorded SIYI flights")
+    parser.add_argument('directory', help="folder of recordings")
+    parser.add_argument('--pattern', default='*.siyirec', help="file name pattern (default *.siyirec)")
+    parser.add_argument('--workers', type=int, default=None, help="processes, number of CPUs by default")
+    parser.add_argument('--output', default='summary.csv', help="CSV table to write (default summary.csv)")
+    args = parser.parse_args()
+    rows = analyzeDirectory(args.directory, args.pattern, args.workers, args.output)
+    failed = sum(1 for row in rows if row['error'])
+    print("%d recordings summarised to %s, %d failed" % (len(rows), args.output, failed))
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+asyncio client of the SIYI SDK
+
+All cameras share the event loop of the caller. There are no threads: the
+socket is an asyncio DatagramTransport and the polling loops are tasks.
+
+    async def main():
+        cam = AsyncSIYISDK(server_ip="192.168.144.25", port=37260)
+        if not await cam.connect():
+            return
+        print(await cam.getAttitude())
+        await cam.disconnect()
+"""
+import asyncio
+import logging
+from siyi_message import COMMAND, DATA_STREAM_FREQS, cmdId
+from siyi_sdk import SIYISDK, REPLY_TIMEOUT, REPLY_RETRIES
+
+
+class _SIYIProtocol(asyncio.DatagramProtocol):
+    def __init__(self, cam) -> None:
+        self._cam = cam
+
+    def datagram_received(self, data, addr):
+        self._cam._core.feedBuffer(data)
+
+    def error_received(self, exc):
+        self._cam._logger.warning("Socket error: %s", exc)
+
+
+class AsyncSIYISDK:
+    def __init__(self, server_ip="192.168.144.25", port=37260, debug=False):
+        """
+
+        Params
+        --
+        - server_ip [str] IP address of the camera
+        - port: [int] UDP port of the camera
+        """
+        self._debug= debug # print debug messages
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        self._server_ip = server_ip
+        self._port = port
+
+        self._transport = None
+        # Parsing, state records and in-flight requests are shared with the threaded SDK.
+        # Its threads are never started
+        self._core = None
+
+        self._connected = False
+        self._tasks = []
+
+        self._conn_loop_rate = 1 # seconds
+        self._gimbal_info_loop_rate = 1
+        self._gimbal_att_loop_rate = 0.1
+
+    async def connect(self, maxWaitTime=3.0):
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(lambda: _SIYIProtocol(self),
+                                                                 local_addr=('0.0.0.0', 0))
+        self._core = SIYISDK(self._server_ip, self._port, debug=self._debug, sock=self._transport)
+
+        self._tasks.append(asyncio.ensure_future(self.connectionLoop(self._conn_loop_rate)))
+        t0 = loop.time()
+        while not self._connected:
+            if loop.time()-t0 > maxWaitTime:
+                await self.disconnect()
+                self._logger.error("Failed to connect to camera")
+                return False
+            await asyncio.sleep(0.05)
+
+        self._tasks.append(asyncio.ensure_future(self._periodic(self._core.requestFirmwareVersion,
+                                                                self._gimbal_info_loop_rate)))
+        self._tasks.append(asyncio.ensure_future(self._periodic(self._core._pollAttitude,
+                                                                self._gimbal_att_loop_rate)))
+        return True
+
+    async def disconnect(self):
+        self._logger.info("Stopping all tasks")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._connected = False
+        if self._core is not None:
+            self._core.resetVars()
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def __aenter__(self):
+        if not await self.connect():
+            raise ConnectionError("Failed to connect to camera %s:%s" % (self._server_ip, self._port))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.disconnect()
+
+    def isConnected(self):
+        return self._connected
+
+    async def connectionLoop(self, t):
+        """
+        Checks the connection every t seconds. A check that timed out took the whole period,
+        one that failed at once, e.g. on a send error, still waits for the next period
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            deadline = loop.time()+t
+            fw = await self._reply(COMMAND.ACQUIRE_DEVICE_INF, (), timeout=t, retries=0)
+            self._connected = fw is not None
+            self._core._inflight.expire()
+            await asyncio.sleep(max(0., deadline-loop.time()))
+
+    async def _periodic(self, request, t):
+        """
+        Calls request every t seconds. Periods are kept on the loop clock, so they do not drift
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            if self._connected:
+                request()
+            deadline += t
+            await asyncio.sleep(max(0., deadline-loop.time()))
+
+    async def _reply(self, cmd_id, values, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, attr=None, max_age=None):
+        """
+        Sends a request and awaits its reply record, see SIYISDK.submit()
+
+        Params
+        --
+        - attr [str] State record of the reply. With max_age, a record younger than
+          max_age seconds is returned without sending anything
+
+        Returns
+        --
+        The reply record. None if there was no reply
+        """
+        if max_age is not None and attr is not None:
+            record = getattr(self._core, attr)
+            if record.stamp and asyncio.get_running_loop().time()-record.stamp <= max_age:
+                return record
+        for attempt in range(retries+1):
+            future = asyncio.wrap_future(self._core.submit(cmd_id, *values, timeout=timeout))
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except (asyncio.TimeoutError, TimeoutError):
+                self._logger.warning("No reply to CMD ID %02x within %s second(s) (attempt %d of %d)",
+                                     cmdId(cmd_id), timeout, attempt+1, retries+1)
+            except Exception as e:
+                self._logger.error("Error %s", e)
+                return None
+        return None
+
+    ##################################################
+    #               Request functions                #
+    ##################################################
+    async def requestZoomSet(self, target_zoom, tolerance=0.5):
+        current_zoom = await self.getZoomLevel()
+        if current_zoom is None:
+            self._logger.error("Could not read the zoom level")
+            return False
+        zoom_step_delay = 0.5
+
+        while abs(current_zoom - target_zoom) > tolerance:
+            if target_zoom > current_zoom:
+                self._core.requestZoomIn()
+            else:
+                self._core.requestZoomOut()
+            await asyncio.sleep(zoom_step_delay)
+
+            current_zoom = await self.getZoomLevel()
+            if current_zoom is None:
+                self._logger.error("Could not read the zoom level")
+                return False
+            if abs(current_zoom - target_zoom) < 5:
+                zoom_step_delay = 0.1
+        self._core.requestZoomHold()
+        self._core.requestAutoFocus()
+        return True
+
+    async def requestThermalRAWData(self, mode):
+        raw = await self._reply(COMMAND.Thermal_Raw_data, (mode,))
+        if raw is None:
+            return None
+        return raw.mode
+
+    async def requestDataStream(self, data_type, freq, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES):
+        """
+        See SIYISDK.requestDataStream()
+        """
+        if freq not in DATA_STREAM_FREQS:
+            raise ValueError("Unsupported data stream rate %s Hz, use one of %s" %
+                             (freq, sorted(DATA_STREAM_FREQS)))
+        ack = await self._reply(COMMAND.DATA_STREAM, (data_type, DATA_STREAM_FREQS[freq]), timeout, retries)
+        return self._core._setStream(data_type, freq, ack)
+
+    async def stopDataStream(self, data_type, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES):
+        return await self.requestDataStream(data_type, 0, timeout, retries)
+
+    def getDataStreams(self):
+        return self._core.getDataStreams()
+
+    ##################################################
+    #                   Get functions                #
+    ##################################################
+    def getGimbalFirmwareVersion(self):
+        return self._core.getGimbalFirmwareVersion()
+
+    def getZoomFirmwareVersion(self):
+        return self._core.getZoomFirmwareVersion()
+
+    def getHardwareID(self):
+        return self._core.getHardwareID()
+
+    def getAttitudeSpeed(self):
+        return self._core.getAttitudeSpeed()
+
+    def getMsg(self, cmd_id):
+        return self._core.getMsg(cmd_id)
+
+    async def getAttitude(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        att = await self._reply(COMMAND.ACQUIRE_GIMBAL_ATT, (), timeout, retries, '_att_msg', max_age)
+        if att is None:
+            return None
+        return(att.yaw, att.pitch, att.roll)
+
+    async def getMotionMode(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        gmm = await self._reply(COMMAND.ACQUIRE_GIMBAL_MOUTION, (), timeout, retries, '_gmm_msg', max_age)
+        if gmm is None:
+            return None
+        return gmm.gimbal_moution_mode
+
+    async def getZoomLevel(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        # The stop zoom request is answered with the zoom level
+        zoom = await self._reply(COMMAND.MANUAL_ZOOM, (0,), timeout, retries, '_manualZoom_msg', max_age)
+        if zoom is None:
+            return None
+        return(zoom.level)
+
+    async def getMaxMinTemprature(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        temp = await self._reply(COMMAND.Max_Min_Temp, (1,), timeout, retries, '_temp_msg', max_age)
+        if temp is None:
+            return None
+        return(temp.temp_max, temp.temp_max_x, temp.temp_max_y,
+               temp.temp_min, temp.temp_min_x, temp.temp_min_y)
+
+    async def getRangeFinder(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        rf = await self._reply(COMMAND.RANGE_FİNDER, (), timeout, retries, '_rangefinder_msg', max_age)
+        if rf is None:
+            return None
+        return(rf.Range_value)
+
+    async def getBoxTemprature(self,startx,starty,endx,endy, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES):
+        box = await self._reply(COMMAND.BOX_TEMP, (startx, starty, endx, endy, 1), timeout, retries)
+        if box is None:
+            return None
+        return(   box.temp_max, box.temp_max_x, box.temp_max_y,
+                  box.temp_min, box.temp_min_x, box.temp_min_y)
+
+    async def getPointTemprature(self,pointx,pointy, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES):
+        point = await self._reply(COMMAND.POINT_TEMP, (pointx, pointy, 1), timeout, retries)
+        if point is None:
+            return None
+        return (point.temprature, point.temp_point_x, point.temp_point_y)
+
+    async def getColorMap(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        cmap = await self._reply(COMMAND.INF_COLOR_MAP, (), timeout, retries, '_color_map_msg', max_age)
+        if cmap is None:
+            return None
+        return cmap.pseudo_color
+
+    async def getImageMod(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        mode = await self._reply(COMMAND.IMAGE_MOD, (), timeout, retries, '_image_mod_msg', max_age)
+        if mode is None:
+            return None
+        return mode.vdisp_mode
+
+    async def getRangefinderStatus(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        status = await self._reply(COMMAND.Range_finder_params_get, (), timeout, retries,
+                                   '_rangefinder_params_msg', max_age)
+        if status is None:
+            return None
+        return status.laser_state
+
+    async def getThermalGain(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        gain = await self._reply(COMMAND.Thermal_Gain_Get, (), timeout, retries, '_thermal_gain_msg', max_age)
+        if gain is None:
+            return None
+        return gain.gain_status
+
+    async def getThermalMAP(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        tmap = await self._reply(COMMAND.Thermal_Map, (), timeout, retries, '_thermal_tempmap_msg', max_age)
+        if tmap is None:
+            return None
+        return tmap.ack
+
+    async def getThermalParams(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        params = await self._reply(COMMAND.Thermal_Params_Get, (), timeout, retries, '_thermal_params_msg', max_age)
+        if params is None:
+            return None
+        return params.Distance,params.Target_emission_rate,params.Humidity,params.Atmospheric_Temperature,params.Reflection_Temperature
+
+    async def pipeline(self, requests, window=16, timeout=REPLY_TIMEOUT):
+        """
+        Sends many requests while keeping up to window of them in flight, see SIYISDK.pipeline()
+
+        Returns
+        --
+        [list] Reply of each request, in order. None for requests that failed or timed out
+        """
+        slots = asyncio.Semaphore(window)
+        async def one(request):
+            async with slots:
+                return await self._reply(request[0], request[1:], timeout, retries=0)
+        return await asyncio.gather(*[one(request) for request in requests])
+
+
+# Requests that only send a frame are forwarded to the shared SDK core
+_FORWARDED_REQUESTS = (
+    'requestFirmwareVersion', 'requestMoiton', 'requestZoomIn', 'requestZoomOut', 'requestZoomHold',
+    'requestGimbalAttitude', 'requestMaxMinTemp', 'requestRangeFinder', 'requestInfCMap',
+    'requestInfImageMode', 'requestbackand_RangefinderStatus', 'requestbackand_ThermalGain',
+    'requestbackand_ThermalMAP', 'requestbackand_ThermalParams', 'requestAutoFocus',
+    'requestCenterGimbal', 'requestPhoto', 'requestRecording', 'requestFPVMode', 'requestLockMode',
+    'requestFollowMode', 'requestColorMap', 'requestImageModChange', 'requestPointTemp',
+    'requestBoxTemp', 'requestGimbalAngle', 'requestRangefinderStatus', 'requestThermalGain',
+    'requestThermalParams', 'requestCommand')
+
+def _forwardRequest(name):
+    async def request(self, *args, **kwargs):
+        return getattr(self._core, name)(*args, **kwargs)
+    request.__name__ = request.__qualname__ = name
+    request.__doc__ = getattr(SIYISDK, name).__doc__
+    return request
+
+for _name in _FORWARDED_REQUESTS:
+    setattr(AsyncSIYISDK, _name, _forwardRequest(_name))
@@ -0,0 +1,647 @@
+"""
+Benchmark suite of the SIYI SDK: microbenchmarks of the hot paths and end-to-end
+round trips against the local simulator
+
+Run with
+    python siyi_benchmark.py                              # full suite, printed
+    python siyi_benchmark.py --quick --json run.json      # short run, saved for later comparison
+    python siyi_benchmark.py --baseline run.json          # flags results worse than the baseline
+
+The exit code is 1 when a result is worse than the baseline by more than --threshold.
+Inputs are fixed, and each microbenchmark keeps the best of several repeats
+"""
+from time import perf_counter, process_time, monotonic, sleep
+import argparse
+import json
+import logging
+import platform
+import socket
+import statistics
+import sys
+import threading
+import time
+from crc16_python import crc16, crc16_str_swap, _crc16_table
+from siyi_message import SIYIMESSAGE, COMMAND, SCHEMAS, cmdId, FrameReassembler
+from utils import toInt, Hexcon
+from siyi_engine import SelectorEngine
+
+# Runs of each microbenchmark, the best one is kept
+REPEAT = 3
+
+
+def _legacyEncode(data, cmd_id):
+    """
+    Reference copy of the hex string encoder, used as baseline
+    """
+    data_len = format(len(data)//2, '04x')
+    data_len = data_len[2:]+data_len[0:2]
+    msg_front = '5566'+'01'+data_len+'0000'+cmd_id+data
+    return bytes.fromhex(msg_front+crc16_str_swap(msg_front))
+
+def _legacyDecode(buff):
+    """
+    Reference copy of the hex string decoder, used as baseline
+    """
+    msg = buff.hex()
+    data_len = int('0x'+msg[8:10]+msg[6:8], base=16)
+    if crc16_str_swap(msg[:-4])!=msg[-4:]:
+        return None
+    seq = int('0x'+msg[12:14]+msg[10:12], base=16)
+    return msg[16:16+data_len*2], data_len, msg[14:16], seq
+
+def _rate(func, n, repeat=None):
+    """
+    Best calls/s of func over repeat runs of n calls
+    """
+    best = 0.
+    for _ in range(REPEAT if repeat is None else repeat):
+        t0 = perf_counter()
+        for _ in range(n):
+            func()
+        best = max(best, n/(perf_counter()-t0))
+    return best
+
+def benchCodec(n=50000):
+    """
+    Compares frames/s of the bytes codec against the hex string pipeline
+
+    Returns
+    --
+    [dict] frames/s per path
+    """
+    msg = SIYIMESSAGE()
+    data = bytes(12)
+    frame = msg.encodeFrame(data, COMMAND.ACQUIRE_GIMBAL_ATT)
+
+    return {
+        'encode_hex': _rate(lambda: _legacyEncode(data.hex(), COMMAND.ACQUIRE_GIMBAL_ATT), n),
+        'encode_bytes': _rate(lambda: msg.encodeFrame(data, COMMAND.ACQUIRE_GIMBAL_ATT), n),
+        'decode_hex': _rate(lambda: _legacyDecode(frame), n),
+        'decode_bytes': _rate(lambda: msg.decodeFrame(frame), n),
+    }
+
+def benchHexCodec(n=50000):
+    """
+    frames/s of the hex string wrappers encodeMsg() and decodeMsg()
+
+    Returns
+    --
+    [dict] frames/s per function
+    """
+    msg = SIYIMESSAGE()
+    data = bytes(12).hex()
+    frame = msg.encodeMsg(data, COMMAND.ACQUIRE_GIMBAL_ATT)
+    return {
+        'encodeMsg': _rate(lambda: msg.encodeMsg(data, COMMAND.ACQUIRE_GIMBAL_ATT), n),
+        'decodeMsg': _rate(lambda: msg.decodeMsg(frame), n),
+    }
+
+def benchUtils(n=200000):
+    """
+    calls/s of the hex helpers of utils
+
+    Returns
+    --
+    [dict] calls/s per function
+    """
+    return {
+        'toInt': _rate(lambda: toInt('fb2e'), n),
+        'Hexcon_negative': _rate(lambda: Hexcon(-1234), n),
+        'Hexcon_positive': _rate(lambda: Hexcon(1234), n),
+    }
+
+def benchCRC(n=100000):
+    """
+    Compares crc16 calls/s of the available engines on an attitude reply sized frame
+
+    Returns
+    --
+    [dict] calls/s per engine
+    """
+    frame = bytes(20)
+    frame_hex = frame.hex()
+    return {
+        'crc16': _rate(lambda: crc16(frame), n),
+        'crc16_table': _rate(lambda: _crc16_table(frame), n),
+        'crc16_str_swap': _rate(lambda: crc16_str_swap(frame_hex), n),
+    }
+
+# Order of the command ID checks in the former elif chain of bufferCallback
+_LEGACY_CHAIN = ('01', '04', '08', '19', '05', '0d', '14', '13', '15', '07', '12', '1A', '1B',
+                 '10', '11', '0E', '34', '35', '37', '38', '3B', '3C', '31', '32')
+
+def _legacyDispatch(cmd_id, data, seq):
+    """
+    Reference copy of the elif chain dispatch, used as baseline
+    """
+    for c in _LEGACY_CHAIN:
+        if cmd_id==c:
+            return c
+    return None
+
+def benchDispatch(n=200000, mix=None):
+    """
+    Compares per-packet dispatch overhead of the elif chain against the handler table.
+    Handlers do nothing, only the routing is measured
+
+    Params
+    --
+    - mix [dict] Share of traffic per command ID. Default is attitude dominated
+
+    Returns
+    --
+    [dict] ns/packet per dispatcher
+    """
+    if mix is None:
+        mix = {COMMAND.ACQUIRE_GIMBAL_ATT: 0.9, COMMAND.ACQUIRE_DEVICE_INF: 0.05,
+               COMMAND.Max_Min_Temp: 0.03, COMMAND.Thermal_Params_Get: 0.02}
+    traffic = []
+    for cmd_id, share in mix.items():
+        traffic += [cmd_id]*int(share*100)
+    traffic_int = [int(c, 16) for c in traffic]
+
+    handlers = [None]*256
+    for c in _LEGACY_CHAIN:
+        handlers[int(c, 16)] = lambda data, seq: None
+
+    def table(cmd_id, data, seq):
+        handler = handlers[cmd_id]
+        if handler is not None:
+            handler(data, seq)
+
+    def run(dispatch, ids):
+        t0 = perf_counter()
+        for _ in range(n//len(ids)):
+            for cmd_id in ids:
+                dispatch(cmd_id, b'', 0)
+        return (perf_counter()-t0)/(n//len(ids)*len(ids))*1e9
+
+    return {
+        'elif_chain': run(_legacyDispatch, traffic),
+        'handler_table': run(table, traffic_int),
+    }
+
+def benchFrameCache(n=100000):
+    """
+    Compares frames/s of building requests from scratch against the payload cache,
+    with and without sequence numbers. Each cached path is measured against building
+    with the same sequence number setting
+
+    Returns
+    --
+    [dict] frames/s per path
+    """
+    msg = SIYIMESSAGE()
+    msg_seq = SIYIMESSAGE(use_seq=True)
+    point = SCHEMAS[cmdId(COMMAND.POINT_TEMP)].request
+    return {
+        'build_const': _rate(lambda: msg.encodeFrame(b'', COMMAND.ACQUIRE_GIMBAL_ATT), n),
+        'cached_const': _rate(msg.gimbalAttFrame, n),
+        'build_const_seq': _rate(lambda: msg_seq.encodeFrame(b'', COMMAND.ACQUIRE_GIMBAL_ATT), n),
+        'cached_const_seq': _rate(msg_seq.gimbalAttFrame, n),
+        'build_point': _rate(lambda: msg.encodeFrame(point.encode(100, 200, 1), COMMAND.POINT_TEMP), n),
+        'cached_point': _rate(lambda: msg.PointTempFrame(100, 200), n),
+        'build_point_seq': _rate(lambda: msg_seq.encodeFrame(point.encode(100, 200, 1), COMMAND.POINT_TEMP), n),
+        'cached_point_seq': _rate(lambda: msg_seq.PointTempFrame(100, 200), n),
+    }
+
+def _legacyParseAttitude(msg):
+    """
+    Reference copy of the hex string attitude parser, used as baseline
+    """
+    return (toInt(msg[2:4]+msg[0:2]) /10., toInt(msg[6:8]+msg[4:6]) /10., toInt(msg[10:12]+msg[8:10]) /10.,
+            toInt(msg[14:16]+msg[12:14]) /10., toInt(msg[18:20]+msg[16:18]) /10., toInt(msg[22:24]+msg[20:22]) /10.)
+
+def benchParse(n=100000):
+    """
+    Compares attitude payloads/s of the toInt slicing parser against the schema decoder
+
+    Returns
+    --
+    [dict] payloads/s per parser
+    """
+    schema = SCHEMAS[cmdId(COMMAND.ACQUIRE_GIMBAL_ATT)].response
+    data = schema.encode(12.3, -4.5, 0.1, 1.0, -2.0, 3.0)
+    data_hex = data.hex()
+    return {
+        'parse_toInt': _rate(lambda: _legacyParseAttitude(data_hex), n),
+        'parse_schema': _rate(lambda: schema.decode(data), n),
+    }
+
+def _legacySplit(buff):
+    """
+    Reference copy of the hex string buffer scan of bufferCallback, used as baseline
+    """
+    buff_str = buff.hex()
+    packets = []
+    while(len(buff_str)>=20):
+        if buff_str[0:4]!='5566':
+            buff_str=buff_str[1:]
+            continue
+        char_len = int('0x'+buff_str[8:10]+buff_str[6:8], base=16)*2
+        if(len(buff_str) < (20+char_len)):
+            break
+        packets.append(_legacyDecode(bytes.fromhex(buff_str[0:20+char_len])))
+        buff_str = buff_str[20+char_len:]
+    return packets
+
+def benchReassembly(n=20000, noise=32):
+    """
+    Compares datagrams/s of the hex string scan against FrameReassembler, on datagrams
+    carrying three attitude replies behind some bytes of line noise
+
+    Returns
+    --
+    [dict] datagrams/s per path
+    """
+    msg = SIYIMESSAGE()
+    frame = msg.encodeFrame(bytes(12), COMMAND.ACQUIRE_GIMBAL_ATT)
+    datagram = bytes(range(1, noise+1))+frame*3
+    reassembler = FrameReassembler(datagram=True)
+    return {
+        'split_hex': _rate(lambda: _legacySplit(datagram), n),
+        'reassembler': _rate(lambda: reassembler.feed(datagram), n),
+    }
+
+def _fakeCamera():
+    """
+    Loopback UDP responder answering firmware and attitude requests, like a gimbal would.
+    Returns its port
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(('127.0.0.1', 0))
+    msg = SIYIMESSAGE()
+    reassembler = FrameReassembler(datagram=True)
+    replies = {cmdId(COMMAND.ACQUIRE_DEVICE_INF): msg.encodeFrame(bytes(12), COMMAND.ACQUIRE_DEVICE_INF),
+               cmdId(COMMAND.ACQUIRE_GIMBAL_ATT): msg.encodeFrame(bytes(12), COMMAND.ACQUIRE_GIMBAL_ATT)}
+    def serve():
+        while True:
+            data, addr = server.recvfrom(1024)
+            for cmd_id, seq, payload in reassembler.feed(data):
+                reply = replies.get(cmd_id)
+                if reply is not None:
+                    server.sendto(reply, addr)
+    threading.Thread(target=serve, daemon=True).start()
+    return server.getsockname()[1]
+
+def benchScheduler(cameras=4, duration=5.0):
+    """
+    Compares the thread per loop model against SelectorEngine, polling fake cameras on loopback.
+    Both runs include the CPU time of the fake cameras
+
+    Params
+    --
+    - cameras [int] Number of cameras polled at once
+    - duration [float] Seconds measured per model
+
+    Returns
+    --
+    [dict] Per model: cpu_percent, mean attitude poll period and its jitter (standard deviation), in ms
+    """
+    from siyi_sdk import SIYISDK
+
+    def run(engine):
+        cams = [SIYISDK('127.0.0.1', _fakeCamera()) for _ in range(cameras)]
+        polls = []
+        for cam in cams:
+            stamps = []
+            polls.append(stamps)
+            def request(cam=cam, stamps=stamps):
+                stamps.append(monotonic())
+                return SIYISDK.requestGimbalAttitude(cam)
+            cam.requestGimbalAttitude = request
+        for cam in cams:
+            cam.connect(engine=engine)
+        wall0, cpu0 = monotonic(), process_time()
+        for stamps in polls:
+            del stamps[:]
+        sleep(duration)
+        cpu = (process_time()-cpu0)/(monotonic()-wall0)*100
+        for cam in cams:
+            cam.disconnect()
+            if engine is None:
+                cam._socket.close() # unblocks the receive thread
+        periods = [(b-a)*1e3 for stamps in polls for a, b in zip(stamps, stamps[1:])]
+        return {'cpu_percent': cpu,
+                'period_ms': statistics.mean(periods),
+                'jitter_ms': statistics.pstdev(periods)}
+
+    engine = SelectorEngine()
+    try:
+        return {'threads': run(None), 'engine': run(engine)}
+    finally:
+        engine.close()
+
+def benchFleet(cameras=32, duration=3.0):
+    """
+    Polls fake cameras on loopback through one SIYIFleet and reports its aggregate throughput
+
+    Returns
+    --
+    [dict] SIYIFleet.stats() plus cpu_percent of the process, fake cameras included
+    """
+    from siyi_fleet import SIYIFleet
+    fleet = SIYIFleet(local_addr=('127.0.0.1', 0))
+    try:
+        for _ in range(cameras):
+            fleet.addCamera('127.0.0.1', _fakeCamera())
+        fleet.connect()
+        wall0, cpu0 = monotonic(), process_time()
+        sleep(duration)
+        stats = fleet.stats()
+        stats['cpu_percent'] = (process_time()-cpu0)/(monotonic()-wall0)*100
+        return stats
+    finally:
+        fleet.close()
+
+def benchFanout(n=20000, subscribers=(0, 1, 10, 100)):
+    """
+    Measures the receive thread cost of an attitude frame against the number of subscribers.
+    Callbacks do nothing, only feedBuffer() is timed
+
+    Returns
+    --
+    [dict] us/frame per number of subscribers
+    """
+    from siyi_sdk import SIYISDK
+    from siyi_pubsub import POLICY_DROP
+    frame = SIYIMESSAGE().encodeFrame(bytes(12), COMMAND.ACQUIRE_GIMBAL_ATT)
+    result = {}
+    for count in subscribers:
+        cam = SIYISDK(sock=socket.socket(socket.AF_INET, socket.SOCK_DGRAM))
+        for _ in range(count):
+            cam.subscribe(COMMAND.ACQUIRE_GIMBAL_ATT, lambda cmd_id, record: None, policy=POLICY_DROP)
+        t0 = perf_counter()
+        for _ in range(n):
+            cam.feedBuffer(frame)
+        result[count] = (perf_counter()-t0)/n*1e6
+        if cam._hub is not None:
+            cam._hub.close()
+        cam._socket.close()
+    return result
+
+def benchBufferCallback(n=20000, batch=100):
+    """
+    calls/s of SIYISDK.bufferCallback() reading attitude replies from a loopback socket:
+    recvfrom, reassembly, dispatch and parse. Datagrams are queued in batches, so only
+    the reads are timed
+
+    Returns
+    --
+    [dict] calls/s
+    """
+    from siyi_sdk import SIYISDK
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    receiver.settimeout(1.0)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    frame = SIYIMESSAGE().encodeFrame(SCHEMAS[cmdId(COMMAND.ACQUIRE_GIMBAL_ATT)].response.encode(
+        12.3, -4.5, 0.1, 1.0, -2.0, 3.0), COMMAND.ACQUIRE_GIMBAL_ATT)
+    cam = SIYISDK(sock=receiver)
+    best = 0.
+    try:
+        for _ in range(REPEAT):
+            elapsed = 0.
+            for _ in range(n//batch):
+                for _ in range(batch):
+                    sender.sendto(frame, receiver.getsockname())
+                t0 = perf_counter()
+                for _ in range(batch):
+                    cam.bufferCallback()
+                elapsed += perf_counter()-t0
+            best = max(best, n//batch*batch/elapsed)
+    finally:
+        sender.close()
+        receiver.close()
+    return {'bufferCallback': best}
+
+def _simulatedCamera(engine, sim):
+    """
+    SIYISDK reading the simulator on engine, without the polling loops of connect()
+    """
+    from siyi_sdk import SIYISDK
+    cam = SIYISDK(*sim.address)
+    cam._socket.setblocking(False)
+    cam._stop = False
+    engine.addReader(cam._socket, cam.bufferCallback)
+    return cam
+
+def _rttSummary(cam, name):
+    rtt = cam.stats()['commands'].get(name, {}).get('rtt_ms', {})
+    return rtt.get('p50', 0.), rtt.get('p99', 0.)
+
+def benchPolling(rates=(10, 50, 100), duration=3.0):
+    """
+    Polls the attitude of the simulator with blocking getAttitude() round trips at each rate,
+    like a control loop. Deadlines are absolute, a late reply shortens the next wait
+
+    Returns
+    --
+    [dict] Per rate: achieved_hz, rtt_p50_ms, rtt_p99_ms, timeouts, and cpu_percent of the
+    process, simulator included
+    """
+    from siyi_simulator import SIYISimulator
+    engine = SelectorEngine()
+    sim = SIYISimulator(port=0, engine=engine).start()
+    result = {}
+    try:
+        for rate in rates:
+            cam = _simulatedCamera(engine, sim)
+            period = 1./rate
+            polls = timeouts = 0
+            wall0, cpu0 = monotonic(), process_time()
+            deadline = wall0
+            while monotonic()-wall0 < duration:
+                if cam.getAttitude(timeout=period, retries=0) is None:
+                    timeouts += 1
+                polls += 1
+                deadline += period
+                delay = deadline-monotonic()
+                if delay > 0.:
+                    sleep(delay)
+            elapsed = monotonic()-wall0
+            p50, p99 = _rttSummary(cam, 'gimbal_attitude')
+            result['%dhz' % rate] = {'achieved_hz': polls/elapsed,
+                                     'rtt_p50_ms': p50,
+                                     'rtt_p99_ms': p99,
+                                     'timeouts': timeouts,
+                                     'cpu_percent': (process_time()-cpu0)/elapsed*100}
+            engine.removeReader(cam._socket)
+            cam._socket.close()
+    finally:
+        sim.close()
+        engine.close()
+    return result
+
+def benchPointTempBurst(burst=500, window=16):
+    """
+    Sends a burst of point temperature queries to the simulator with pipeline(), each one
+    for another pixel so no frame comes from the cache
+
+    Returns
+    --
+    [dict] replies_per_s, elapsed_ms, rtt_p50_ms, rtt_p99_ms and lost replies
+    """
+    from siyi_simulator import SIYISimulator, THERMAL_WIDTH, THERMAL_HEIGHT
+    engine = SelectorEngine()
+    sim = SIYISimulator(port=0, engine=engine).start()
+    try:
+        cam = _simulatedCamera(engine, sim)
+        requests = [(COMMAND.POINT_TEMP, (i*7) % THERMAL_WIDTH, (i*13) % THERMAL_HEIGHT, 1)
+                    for i in range(burst)]
+        t0 = perf_counter()
+        replies = cam.pipeline(requests, window)
+        elapsed = perf_counter()-t0
+        p50, p99 = _rttSummary(cam, 'point_temperature')
+        lost = sum(1 for reply in replies if reply is None)
+        engine.removeReader(cam._socket)
+        cam._socket.close()
+    finally:
+        sim.close()
+        engine.close()
+    return {'replies_per_s': (burst-lost)/elapsed,
+            'elapsed_ms': elapsed*1e3,
+            'rtt_p50_ms': p50,
+            'rtt_p99_ms': p99,
+            'lost': lost}
+
+# Suite run by main(): name, function, arguments of a full run, arguments of a quick run,
+# and unit of the results. None if the unit is given by the suffix of each result name
+SUITE = (
+    ('codec', benchCodec, {}, {'n': 5000}, 'frames/s'),
+    ('hex_codec', benchHexCodec, {}, {'n': 5000}, 'frames/s'),
+    ('frame_cache', benchFrameCache, {}, {'n': 10000}, 'frames/s'),
+    ('crc', benchCRC, {}, {'n': 10000}, 'calls/s'),
+    ('utils', benchUtils, {}, {'n': 20000}, 'calls/s'),
+    ('parse', benchParse, {}, {'n': 10000}, 'payloads/s'),
+    ('reassembly', benchReassembly, {}, {'n': 2000}, 'datagrams/s'),
+    ('dispatch', benchDispatch, {}, {'n': 20000}, 'ns/packet'),
+    ('buffer_callback', benchBufferCallback, {}, {'n': 2000}, 'calls/s'),
+    ('fanout', benchFanout, {}, {'n': 2000}, 'us/frame'),
+    ('polling', benchPolling, {}, {'duration': 1.0}, None),
+    ('point_temp_burst', benchPointTempBurst, {}, {'burst': 100}, None),
+    ('scheduler', benchScheduler, {}, {'duration': 1.0}, None),
+    ('fleet', benchFleet, {}, {'cameras': 8, 'duration': 1.0}, None),
+)
+
+# Units of results named by suffix, and whether higher is better. None for results that
+# are only informative, e.g. the poll period, whose target is fixed
+_SUFFIX_UNITS = (('period_ms', 'ms', None), ('_per_s', '1/s', True), ('_hz', 'Hz', True),
+                 ('_ms', 'ms', False), ('cpu_percent', '%', False))
+
+def _unit(name, unit):
+    """
+    Returns (unit, better) of a result. better is 'higher', 'lower', or None for results
+    that are only informative, e.g. counters
+    """
+    if unit is not None:
+        return unit, 'higher' if unit.endswith('/s') else 'lower'
+    for suffix, suffix_unit, higher in _SUFFIX_UNITS:
+        if name.endswith(suffix):
+            if higher is None:
+                return suffix_unit, None
+            return suffix_unit, 'higher' if higher else 'lower'
+    return '', None
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            name = str(key) if not isinstance(key, int) else "subscribers_%d" % key
+            _flatten(prefix+"."+name, item, out)
+    else:
+        out[prefix] = value
+    return out
+
+def runSuite(quick=False, only=None):
+    """
+    Runs the benchmarks of SUITE
+
+    Params
+    --
+    - quick [bool] Shorter runs, for CI
+    - only: Names of the benchmarks to run. All if None
+
+    Returns
+    --
+    [dict] 'meta': run environment. 'results': {name: {'value', 'unit', 'better'}}
+    """
+    results = {}
+    for name, func, full, short, unit in SUITE:
+        if only and name not in only:
+            continue
+        for key, value in _flatten(name, func(**(short if quick else full)), {}).items():
+            result_unit, better = _unit(key, unit)
+            results[key] = {'value': value, 'unit': result_unit, 'better': better}
+    meta = {'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'quick': quick,
+            'repeat': REPEAT}
+    return {'meta': meta, 'results': results}
+
+# Absolute changes below these are noise, whatever their relative size, e.g. a jitter
+# going from 0.1 to 0.2 ms
+_NOISE = {'ms': 0.5, '%': 1.0}
+
+def compareResults(baseline, current, threshold=0.1):
+    """
+    Finds the results that got worse than baseline by more than threshold
+
+    Params
+    --
+    - baseline, current [dict] Outputs of runSuite(), e.g. loaded from JSON
+    - threshold [float] Relative change, 0.1 is 10%. Changes of times and CPU usage
+      smaller than _NOISE are ignored
+
+    Returns
+    --
+    [list] (name, baseline value, current value, relative change) of each regression, worst first
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None or result['better'] is None or not base['value']:
+            continue
+        if abs(result['value']-base['value']) < _NOISE.get(result['unit'], 0.):
+            continue
+        change = (result['value']-base['value'])/abs(base['value'])
+        worse = -change if result['better']=='higher' else change
+        if worse > threshold:
+            regressions.append((name, base['value'], result['value'], worse))
+    regressions.sort(key=lambda r: -r[3])
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="SIYI SDK benchmark suite")
+    parser.add_argument('--quick', action='store_true', help="shorter runs")
+    parser.add_argument('--only', default=None,
+                        help="comma separated benchmarks to run: %s" % ",".join(entry[0] for entry in SUITE))
+    parser.add_argument('--json', default=None, help="write the results to this file")
+    parser.add_argument('--baseline', default=None, help="results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="relative change counted as a regression (default 0.1)")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    run = runSuite(args.quick, args.only.split(',') if args.only else None)
+    for name, result in run['results'].items():
+        value = result['value']
+        text = "%.2f" % value if isinstance(value, float) and abs(value) < 1000 else "%.0f" % value
+        print("%-48s %14s %s" % (name, text, result['unit']))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(run, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compareResults(baseline, run, args.threshold)
+        for name, base, value, worse in regressions:
+            print("REGRESSION %-37s %14.2f -> %.2f (%+.0f%%)" % (name, base, value, worse*100))
+        if regressions:
+            sys.exit(1)
+        print("No regression beyond %.0f%%" % (args.threshold*100))
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Vectorised offline decoding of recorded SIYI traffic into NumPy structured arrays
+
+The whole byte stream is scanned for frame headers at once, CRCs are checked for all
+candidate frames together, and the payloads of each command ID are decoded with a single
+np.frombuffer into a structured dtype built from its schema in SCHEMAS, scale factors applied.
+
+    frames = decodeRecording("flight.siyirec")
+    att = frames['gimbal_attitude']        # fields stamp, seq, yaw, pitch, roll, yaw_speed, ...
+    print(att['yaw'].mean(), frames.crc_errors)
+    df = frames.toDataFrames()['gimbal_attitude']  # pandas, if installed
+
+Requires numpy
+"""
+from siyi_message import SCHEMAS, STX, MINIMUM_FRAME_LEN, HEADER_LEN, MAX_DATA_LEN
+from siyi_recorder import RecordingReader, RX
+from crc16_python import _TABLE
+
+try:
+    import numpy as np
+except ImportError: # optional, only needed by the decoder
+    np = None
+
+# struct formats of the schemas and their NumPy types
+_DTYPES = {'b': 'i1', 'B': 'u1', 'h': '<i2', 'H': '<u2', 'i': '<i4', 'I': '<u4',
+           'l': '<i4', 'L': '<u4', 'q': '<i8', 'Q': '<u8', 'f': '<f4', 'd': '<f8'}
+
+
+def _rawDtype(schema):
+    return np.dtype([(name, _DTYPES[fmt]) for name, fmt in zip(schema.names, schema.formats)])
+
+def _outDtype(schema):
+    """
+    Output columns: stamp, seq, then the schema fields. Scaled fields are float64
+    """
+    fields = [('stamp', '<f8'), ('seq', '<u2')]
+    for name, fmt, scale in zip(schema.names, schema.formats, schema.scales):
+        fields.append((name, '<f8' if scale!=1 else _DTYPES[fmt]))
+    return np.dtype(fields)
+
+
+def crc16Batch(buf, starts, length):
+    """
+    CRC-16 (CCITT) of the length bytes at each of starts, computed for all of them at once
+
+    Params
+    --
+    - buf [numpy.ndarray] uint8 stream
+    - starts [numpy.ndarray] Offsets of the blocks
+    - length [int] Length of every block
+
+    Returns
+    --
+    [numpy.ndarray] uint16 CRCs
+    """
+    table = np.asarray(_TABLE, dtype=np.uint16)
+    block = buf[starts[:, None]+np.arange(length)]
+    crc = np.zeros(len(starts), dtype=np.uint16)
+    for column in block.T:
+        crc = (crc << 8) ^ table[(crc >> 8) ^ column]
+    return crc
+
+
+class DecodedFrames(dict):
+    """
+    Structured arrays of decoded frames by schema name, with the scan counters
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.frames = 0 # frames with a valid CRC
+        self.crc_errors = 0 # headers with a plausible length whose CRC failed
+        self.unknown = 0 # valid frames of command IDs without response schema
+        self.short = 0 # valid frames with less data than their schema
+
+    def toDataFrames(self):
+        """
+        Returns
+        --
+        [dict] pandas.DataFrame by schema name. Requires pandas
+        """
+        import pandas as pd
+        return {name: pd.DataFrame(array) for name, array in self.items()}
+
+    def __repr__(self) -> str:
+        return "DecodedFrames(%s, frames=%d, crc_errors=%d, unknown=%d)" % (
+            ", ".join("%s=%d" % (name, len(array)) for name, array in self.items()),
+            self.frames, self.crc_errors, self.unknown)
+
+
+def scanFrames(stream):
+    """
+    Finds the valid frames of a byte stream
+
+    Returns
+    --
+    [tuple] (starts, data_lens) arrays of the frames in stream order, and the number of CRC errors
+    """
+    if np is None:
+        raise ImportError("siyi_decoder requires numpy")
+    starts, data_lens, crc_errors, _ = _scan(np.frombuffer(stream, dtype=np.uint8))
+    return starts, data_lens, crc_errors
+
+def _scan(buf, limit=None):
+    """
+    scanFrames() of a uint8 array, keeping only the frames and CRC errors that start before
+    limit, the end of buf if None
+
+    Returns
+    --
+    [tuple] starts, data_lens, crc_errors, and the offset the next scan must start at: limit,
+    or the end of the last frame if it runs past limit
+    """
+    n = len(buf)
+    limit = n if limit is None else limit
+    empty = np.zeros(0, dtype=np.int64)
+    if n < MINIMUM_FRAME_LEN:
+        return empty, empty, 0, limit
+
+    starts = np.flatnonzero((buf[:-1]==STX[0]) & (buf[1:]==STX[1])).astype(np.int64)
+    starts = starts[starts+MINIMUM_FRAME_LEN <= n]
+    data_lens = buf[starts+3].astype(np.int64) | (buf[starts+4].astype(np.int64) << 8)
+    plausible = (data_lens <= MAX_DATA_LEN) & (starts+data_lens+MINIMUM_FRAME_LEN <= n)
+    starts, data_lens = starts[plausible], data_lens[plausible]
+
+    # CRCs, one batch per frame length
+    valid = np.zeros(len(starts), dtype=bool)
+    for data_len in np.unique(data_lens):
+        group = np.flatnonzero(data_lens==data_len)
+        s = starts[group]
+        end = s+HEADER_LEN+data_len
+        expected = buf[end].astype(np.uint16) | (buf[end+1].astype(np.uint16) << 8)
+        valid[group] = crc16Batch(buf, s, HEADER_LEN+int(data_len))==expected
+
+    # A header found inside an accepted frame is payload, not a frame. Only kept frames
+    # count: a rejected candidate must not hide the frames after it
+    ends = starts+data_lens+MINIMUM_FRAME_LEN
+    ok_starts, ok_ends = starts[valid], ends[valid]
+    nested = np.flatnonzero(ok_starts[1:] < ok_ends[:-1])
+    if len(nested):
+        keep = np.ones(len(ok_starts), dtype=bool)
+        last_end = 0
+        for i, (start, end) in enumerate(zip(ok_starts.tolist(), ok_ends.tolist())):
+            if start < last_end:
+                keep[i] = False
+            else:
+                last_end = end
+        ok_starts, ok_ends = ok_starts[keep], ok_ends[keep]
+
+    bad = starts[~valid]
+    bad = bad[bad < limit]
+    j = np.searchsorted(ok_starts, bad, 'right')-1
+    inside = (j >= 0) & (bad < ok_ends[np.maximum(j, 0)]) if len(ok_starts) else np.zeros(len(bad), bool)
+    crc_errors = int(np.count_nonzero(~inside))
+
+    before = ok_starts < limit
+    ok_starts, ok_ends = ok_starts[before], ok_ends[before]
+    next_start = max(limit, int(ok_ends[-1])) if len(ok_ends) else limit
+    return ok_starts, ok_ends-ok_starts-MINIMUM_FRAME_LEN, crc_errors, next_start
+
+
+def decodeStream(stream, offsets=None, stamps=None):
+    """
+    Decodes all frames of a byte stream
+
+    Params
+    --
+    - stream: bytes-like received stream, e.g. RecordingReader.data()
+    - offsets, stamps: Start offset in stream and receive time of each datagram, increasing.
+      Frames get the stamp of the datagram they start in. NaN if not given
+
+    Returns
+    --
+    [DecodedFrames] Structured array by schema name, e.g. 'gimbal_attitude', 'max_min_temperature',
+    'range_finder'. Columns stamp, seq and the response fields, see SCHEMAS
+    """
+    if np is None:
+        raise ImportError("siyi_decoder requires numpy")
+    buf = np.frombuffer(stream, dtype=np.uint8)
+    starts, data_lens, crc_errors, _ = _scan(buf)
+    result = DecodedFrames()
+    result.crc_errors = crc_errors
+    parts = _decodeFrames(buf, starts, data_lens, offsets, stamps, result)
+    for name, arrays in parts.items():
+        result[name] = arrays[0]
+    return result
+
+def _decodeFrames(buf, starts, data_lens, offsets, stamps, result):
+    """
+    Decodes the frames found by _scan() and counts them in result
+
+    Returns
+    --
+    [dict] List of one structured array by schema name
+    """
+    parts = {}
+    result.frames += len(starts)
+    if not len(starts):
+        return parts
+
+    cmd_ids = buf[starts+7]
+    seqs = buf[starts+5].astype(np.uint16) | (buf[starts+6].astype(np.uint16) << 8)
+    if offsets is not None and len(offsets):
+        index = np.searchsorted(np.asarray(offsets), starts, 'right')-1
+        frame_stamps = np.asarray(stamps, dtype=float)[np.maximum(index, 0)]
+    else:
+        frame_stamps = np.full(len(starts), np.nan)
+
+    for cmd_id in np.unique(cmd_ids):
+        group = np.flatnonzero(cmd_ids==cmd_id)
+        command = SCHEMAS.get(int(cmd_id))
+        if command is None or command.response is None:
+            result.unknown += len(group)
+            continue
+        schema = command.response
+        long_enough = data_lens[group] >= schema.size
+        result.short += int(np.count_nonzero(~long_enough))
+        group = group[long_enough]
+        payload = buf[starts[group, None]+HEADER_LEN+np.arange(schema.size)]
+        raw = np.frombuffer(payload, dtype=_rawDtype(schema))
+        out = np.empty(len(group), dtype=_outDtype(schema))
+        out['stamp'] = frame_stamps[group]
+        out['seq'] = seqs[group]
+        for name, scale in zip(schema.names, schema.scales):
+            out[name] = raw[name]/scale if scale!=1 else raw[name]
+        parts.setdefault(command.name, []).append(out)
+    return parts
+
+
+def decodeRecording(path, direction=RX, chunk_size=4*1024*1024):
+    """
+    Decodes the received (or sent) traffic of a file written by SIYISDK.startRecording()
+
+    The memory-mapped records are decoded chunk_size bytes at a time, so memory use does not
+    grow with the length of the recording. The bytes after the last complete frame of a chunk
+    are carried into the next one, so frames split across chunks are found like in one stream
+
+    Returns
+    --
+    [DecodedFrames] see decodeStream(). Stamps are time.monotonic() receive times,
+    RecordingReader.wallTime() converts them
+    """
+    if np is None:
+        raise ImportError("siyi_decoder requires numpy")
+    # Bytes a frame may need after its start
+    max_frame = MAX_DATA_LEN+MINIMUM_FRAME_LEN
+    result = DecodedFrames()
+    parts = {}
+    chunk = bytearray()
+    offsets, stamps = [], [] # datagrams of chunk
+
+    def decodeChunk(last):
+        buf = np.frombuffer(chunk, dtype=np.uint8)
+        limit = len(chunk) if last else max(0, len(chunk)-max_frame+1)
+        starts, data_lens, crc_errors, next_start = _scan(buf, limit)
+        result.crc_errors += crc_errors
+        decoded = _decodeFrames(buf, starts, data_lens, offsets, stamps, result)
+        for name, arrays in decoded.items():
+            parts.setdefault(name, []).extend(arrays)
+        del buf, decoded
+        # Keep the datagram the carried bytes start in, and the ones after it
+        first = max(0, np.searchsorted(offsets, next_start, 'right')-1)
+        offsets[:] = [max(0, offset-next_start) for offset in offsets[first:]]
+        del stamps[:first]
+        del chunk[:next_start]
+        if not chunk:
+            offsets.clear()
+            stamps.clear()
+
+    with RecordingReader(path) as reader:
+        for stamp, rec_direction, data in reader:
+            if rec_direction!=direction:
+                continue
+            offsets.append(len(chunk))
+            stamps.append(stamp)
+            chunk += data
+            if len(chunk) >= chunk_size:
+                decodeChunk(False)
+    decodeChunk(True)
+    for name, arrays in parts.items():
+        result[name] = np.concatenate(arrays) if len(arrays) > 1 else arrays[0]
+    return result
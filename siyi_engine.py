@@ -0,0 +1,209 @@
+"""
+Single-threaded I/O engine of the SIYI SDK
+
+One selectors loop reads the sockets of any number of cameras and runs their periodic
+tasks from a timer heap, instead of one receive thread and three sleep() threads per camera.
+
+    engine = SelectorEngine()
+    cam = SIYISDK(server_ip="192.168.144.25", port=37260)
+    cam.connect(engine=engine)  # starts the engine thread if it is not running
+    print(cam.getAttitude())
+
+Callbacks run on the engine thread. They must not block: do not call get* functions from them,
+the reply they wait for is read by the same thread.
+"""
+import heapq
+import logging
+import selectors
+import socket
+import threading
+from itertools import count
+from time import monotonic
+
+
+class Timer:
+    """
+    Handle of a scheduled callback, see SelectorEngine.callLater() and SelectorEngine.callEvery()
+    """
+    __slots__ = ('deadline', 'period', 'callback', 'cancelled', 'runs', 'late')
+
+    def __init__(self, deadline, period, callback) -> None:
+        self.deadline = deadline
+        self.period = period
+        self.callback = callback
+        self.cancelled = False
+        self.runs = 0
+        self.late = 0 # periods skipped because the loop was busy
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class SelectorEngine:
+    def __init__(self, clock=monotonic) -> None:
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._clock = clock
+        self._selector = selectors.DefaultSelector()
+        self._timers = [] # heap of (deadline, n, Timer)
+        self._timer_ids = count()
+        self._lock = threading.Lock()
+
+        # Wakes the loop up when another thread adds a timer or stops it
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, self._drainWakeup)
+
+        self._thread = None
+        self._stop = False
+
+    def _wakeup(self):
+        if self._thread is not None and threading.current_thread() is self._thread:
+            return
+        try:
+            self._wake_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass # a wakeup is already pending
+
+    def _drainWakeup(self):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+    def isRunning(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def addReader(self, sock, callback):
+        """
+        Calls callback() whenever sock is readable. callback reads the socket itself
+
+        Params
+        --
+        - sock: Socket or file object
+        - callback [callable] Called without arguments on the engine thread
+        """
+        with self._lock:
+            self._selector.register(sock, selectors.EVENT_READ, callback)
+        self._wakeup()
+
+    def removeReader(self, sock):
+        with self._lock:
+            try:
+                self._selector.unregister(sock)
+            except (KeyError, ValueError):
+                return False
+        self._wakeup()
+        return True
+
+    def _schedule(self, deadline, period, callback):
+        timer = Timer(deadline, period, callback)
+        with self._lock:
+            heapq.heappush(self._timers, (deadline, next(self._timer_ids), timer))
+        self._wakeup()
+        return timer
+
+    def callLater(self, delay, callback):
+        """
+        Calls callback() once, delay seconds from now
+
+        Returns
+        --
+        [Timer]
+        """
+        return self._schedule(self._clock()+delay, None, callback)
+
+    def callEvery(self, period, callback, delay=0.):
+        """
+        Calls callback() every period seconds. The next deadline is computed from the previous one,
+        not from the end of the callback, so periods do not drift. Deadlines missed while the loop
+        was busy are skipped, they are not run in a burst
+
+        Params
+        --
+        - period [float] Seconds between calls
+        - delay [float] Seconds until the first call
+
+        Returns
+        --
+        [Timer]
+        """
+        return self._schedule(self._clock()+delay, period, callback)
+
+    def _runTimers(self):
+        """
+        Runs due timers. Returns the seconds until the next deadline, None if there is no timer
+        """
+        while True:
+            with self._lock:
+                if not self._timers:
+                    return None
+                deadline, _, timer = self._timers[0]
+                now = self._clock()
+                if timer.cancelled:
+                    heapq.heappop(self._timers)
+                    continue
+                if deadline > now:
+                    return deadline-now
+                heapq.heappop(self._timers)
+                if timer.period is not None:
+                    next_deadline = deadline+timer.period
+                    if next_deadline <= now:
+                        missed = int((now-deadline)//timer.period)
+                        timer.late += missed
+                        next_deadline += missed*timer.period
+                    timer.deadline = next_deadline
+                    heapq.heappush(self._timers, (next_deadline, next(self._timer_ids), timer))
+            timer.runs += 1
+            try:
+                timer.callback()
+            except Exception as e:
+                self._logger.error("Timer callback %s failed: %s", timer.callback, e)
+
+    def runOnce(self, timeout=None):
+        """
+        Runs due timers, then waits for readable sockets up to the next deadline or timeout
+        and dispatches them
+        """
+        delay = self._runTimers()
+        if timeout is not None:
+            delay = timeout if delay is None else min(delay, timeout)
+        for key, _ in self._selector.select(delay):
+            try:
+                key.data()
+            except Exception as e:
+                self._logger.error("Reader callback %s failed: %s", key.data, e)
+
+    def run(self):
+        """
+        Runs the loop on the calling thread until stop() is called
+        """
+        self._stop = False
+        self._logger.debug("Started engine loop")
+        while not self._stop:
+            self.runOnce()
+        self._logger.debug("Exiting engine loop")
+
+    def start(self):
+        """
+        Runs the loop in a daemon thread. Does nothing if it is already running
+        """
+        if self.isRunning():
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self.run, name="SelectorEngine", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._stop = True
+        self._wakeup()
+        if self._thread is not None and threading.current_thread() is not self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def close(self):
+        self.stop()
+        self._selector.close()
+        self._wake_r.close()
+        self._wake_w.close()
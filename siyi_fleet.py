@@ -0,0 +1,209 @@
+"""
+Many SIYI cameras behind one UDP socket and one SelectorEngine
+
+    fleet = SIYIFleet()
+    cam1 = fleet.addCamera("192.168.144.25")
+    cam2 = fleet.addCamera("192.168.144.26")
+    fleet.connect()
+    print(cam1.getAttitude(), cam2.getAttitude())
+    print(fleet.stats())
+
+Cameras are SIYISDK instances sharing the fleet socket, so the whole SIYISDK API is available.
+Replies are routed to them by source address.
+"""
+import logging
+import socket
+import threading
+from time import monotonic, sleep
+from siyi_sdk import SIYISDK
+from siyi_engine import SelectorEngine
+
+
+class SIYIFleet:
+    def __init__(self, engine=None, local_addr=('0.0.0.0', 0), debug=False):
+        """
+
+        Params
+        --
+        - engine [SelectorEngine] Engine shared with other users. A new one is created if None
+        - local_addr [tuple] Address the shared socket is bound to
+        """
+        self._debug = debug
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(local_addr)
+        self._socket.setblocking(False)
+        self._BUFF_SIZE = 1024
+
+        self._own_engine = engine is None
+        self._engine = SelectorEngine() if engine is None else engine
+        self._timers = []
+
+        # Cameras indexed by (ip, port), the source address of their replies.
+        # Replaced, never modified, so the engine thread iterates it without locking
+        self._cameras = {}
+        self._cameras_lock = threading.Lock()
+
+        self._conn_loop_rate = 1 # seconds
+        self._gimbal_info_loop_rate = 1
+        self._gimbal_att_loop_rate = 0.1
+
+        self._datagrams = 0
+        self._bytes = 0
+        self._unknown = 0 # datagrams from addresses that are not in the fleet
+        self._recv_errors = 0
+        self._t0 = None
+
+    def __len__(self):
+        return len(self._cameras)
+
+    def cameras(self):
+        return list(self._cameras.values())
+
+    def addCamera(self, server_ip, port=37260):
+        """
+        Adds a camera to the fleet. It is polled from the next scheduler tick
+
+        Returns
+        --
+        [SIYISDK] The camera
+        """
+        addr = (socket.gethostbyname(server_ip), port)
+        with self._cameras_lock:
+            cam = self._cameras.get(addr)
+            if cam is None:
+                cam = SIYISDK(addr[0], port, debug=self._debug, sock=self._socket)
+                self._cameras = {**self._cameras, addr: cam}
+        return cam
+
+    def removeCamera(self, server_ip, port=37260):
+        addr = (socket.gethostbyname(server_ip), port)
+        with self._cameras_lock:
+            cameras = dict(self._cameras)
+            cam = cameras.pop(addr, None)
+            if cam is None:
+                return False
+            self._cameras = cameras
+        cam._stop = True
+        cam.resetVars()
+        return True
+
+    def connect(self, maxWaitTime=3.0):
+        """
+        Starts polling all cameras and waits until each one answered or maxWaitTime passed
+
+        Returns
+        --
+        [bool] True if all cameras answered. See isConnected() of each camera otherwise
+        """
+        self._start()
+        t0 = monotonic()
+        while monotonic()-t0 <= maxWaitTime:
+            if all(cam.isConnected() for cam in self._cameras.values()):
+                return True
+            sleep(0.01)
+        missing = ["%s:%s" % addr for addr, cam in self._cameras.items() if not cam.isConnected()]
+        self._logger.error("Failed to connect to camera(s) %s", ", ".join(missing))
+        return False
+
+    def _start(self):
+        if self._timers:
+            return
+        self._t0 = monotonic()
+        for cam in self._cameras.values():
+            cam._stop = False
+        self._engine.addReader(self._socket, self._onReadable)
+        self._timers = [
+            self._engine.callEvery(self._conn_loop_rate, self._connectionTick),
+            self._engine.callEvery(self._gimbal_info_loop_rate, self._gimbalInfoTick),
+            self._engine.callEvery(self._gimbal_att_loop_rate, self._gimbalAttTick)]
+        self._engine.start()
+
+    def disconnect(self):
+        self._logger.info("Stopping fleet")
+        for timer in self._timers:
+            timer.cancel()
+        self._timers = []
+        self._engine.removeReader(self._socket)
+        for cam in self._cameras.values():
+            cam._stop = True
+            cam.resetVars()
+        if self._own_engine:
+            self._engine.stop()
+
+    def close(self):
+        self.disconnect()
+        if self._own_engine:
+            self._engine.close()
+        self._socket.close()
+
+    def _onReadable(self):
+        """
+        Reads every pending datagram and routes it to the camera it came from
+        """
+        cameras = self._cameras
+        while True:
+            try:
+                buff, addr = self._socket.recvfrom(self._BUFF_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                # e.g. ICMP port unreachable of a camera that is down. Retried when the
+                # socket is readable again, so a failed socket does not spin the engine
+                self._recv_errors += 1
+                self._logger.debug("Socket error: %s", e)
+                return
+            self._datagrams += 1
+            self._bytes += len(buff)
+            cam = cameras.get(addr)
+            if cam is None:
+                self._unknown += 1
+                continue
+            cam.feedBuffer(buff)
+
+    def _connectionTick(self):
+        for cam in self._cameras.values():
+            cam._inflight.expire()
+            cam.requestFirmwareVersion()
+        self._engine.callLater(0.1, self._updateConnections)
+
+    def _updateConnections(self):
+        for cam in self._cameras.values():
+            cam._updateConnection()
+
+    def _gimbalInfoTick(self):
+        for cam in self._cameras.values():
+            if cam.isConnected():
+                cam.requestFirmwareVersion()
+
+    def _gimbalAttTick(self):
+        for cam in self._cameras.values():
+            if cam.isConnected():
+                cam._pollAttitude()
+
+    def stats(self):
+        """
+        Aggregate telemetry throughput since connect()
+
+        Returns
+        --
+        [dict] cameras, connected, datagrams, bytes, frames, crc_errors, unknown (datagrams from
+        other addresses), recv_errors, elapsed (s), datagrams_per_s, frames_per_s, bytes_per_s
+        """
+        elapsed = monotonic()-self._t0 if self._t0 is not None else 0.
+        cams = tuple(self._cameras.values())
+        frames = sum(cam._reassembler.frames for cam in cams)
+        rate = (lambda n: n/elapsed) if elapsed > 0 else (lambda n: 0.)
+        return {'cameras': len(cams),
+                'connected': sum(1 for cam in cams if cam.isConnected()),
+                'datagrams': self._datagrams,
+                'bytes': self._bytes,
+                'frames': frames,
+                'crc_errors': sum(cam._reassembler.crc_errors for cam in cams),
+                'unknown': self._unknown,
+                'recv_errors': self._recv_errors,
+                'elapsed': elapsed,
+                'datagrams_per_s': rate(self._datagrams),
+                'frames_per_s': rate(frames),
+                'bytes_per_s': rate(self._bytes)}
@@ -0,0 +1,471 @@
+"""
+Local gateway sharing one SIYI camera link between many processes
+
+The gateway owns the UDP link to the camera and serves clients on a Unix domain datagram
+socket, with the same frames as the camera. Sequence numbers are rewritten on the way up so
+each reply goes back to the client that asked, with the client's own sequence number.
+Identical read-only queries in flight are sent to the camera once and answered together,
+and their replies are served from a short-lived cache, so several services polling the
+attitude or the firmware version cost the camera a single stream of requests.
+
+Gateway process:
+
+    python siyi_gateway.py --camera-ip 192.168.144.25 --socket /tmp/siyi_gateway.sock
+
+Each client, with the unchanged SDK:
+
+    cam = SIYISDK(sock=GatewaySocket("/tmp/siyi_gateway.sock"))
+    cam.connect()
+
+Control commands (speed, angles, zoom, photos...) are always forwarded and empty the cache.
+Data streams are pushed to every client that asked for them, at the highest rate asked.
+"""
+import argparse
+import logging
+import os
+import socket
+import shutil
+import stat
+import tempfile
+from collections import defaultdict
+from itertools import count
+from time import monotonic, sleep
+from siyi_engine import SelectorEngine
+from siyi_message import SCHEMAS, COMMAND, DATA_STREAM_TYPE, FrameReassembler, cmdId, buildFrame
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'siyi_gateway.sock')
+
+# Requests that only read the camera state. Identical ones are coalesced and cached
+QUERY_CMDS = frozenset(cmdId(cmd_id) for cmd_id in (
+    COMMAND.ACQUIRE_DEVICE_INF, COMMAND.ACQUIRE_GIMBAL_ATT, COMMAND.ACQUIRE_GIMBAL_MOUTION,
+    COMMAND.Max_Min_Temp, COMMAND.BOX_TEMP, COMMAND.POINT_TEMP, COMMAND.RANGE_FİNDER,
+    COMMAND.INF_COLOR_MAP, COMMAND.IMAGE_MOD, COMMAND.Range_finder_params_get,
+    COMMAND.Thermal_Gain_Get, COMMAND.Thermal_Params_Get, COMMAND.MAGNETIC_ENCODER,
+    COMMAND.MOTOR_VOLTAGE))
+
+# Cache lifetime of replies that do not change while flying, in seconds
+CACHE_TTLS = {cmdId(COMMAND.ACQUIRE_DEVICE_INF): 1.0}
+
+_DATA_STREAM = cmdId(COMMAND.DATA_STREAM)
+# Command ID of the frames pushed for each DATA_STREAM_TYPE
+_STREAM_CMDS = {DATA_STREAM_TYPE.ATTITUDE: cmdId(COMMAND.ACQUIRE_GIMBAL_ATT),
+                DATA_STREAM_TYPE.LASER_RANGE: cmdId(COMMAND.RANGE_FİNDER),
+                DATA_STREAM_TYPE.MAGNETIC_ENCODER: cmdId(COMMAND.MAGNETIC_ENCODER),
+                DATA_STREAM_TYPE.MOTOR_VOLTAGE: cmdId(COMMAND.MOTOR_VOLTAGE)}
+
+
+class GatewaySocket(socket.socket):
+    """
+    Client end of a gateway, usable as the sock of SIYISDK. sendto() ignores the camera
+    address, everything goes to the gateway
+    """
+    def __init__(self, path=DEFAULT_SOCKET, timeout=5.0) -> None:
+        """
+        Params
+        --
+        - path [str] Socket of the gateway
+        - timeout [float] Receive timeout in seconds, like the SDK's own socket
+        """
+        super().__init__(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._dir = None
+        # The gateway replies to the address of the client, so it needs one.
+        # Linux gives an abstract one, other systems get a file in a private directory
+        try:
+            self.bind('')
+        except OSError:
+            pass
+        if not self.getsockname():
+            self._dir = tempfile.mkdtemp(prefix='siyi_client_')
+            self.bind(os.path.join(self._dir, 'client.sock'))
+        self.connect(path)
+        self.settimeout(timeout)
+
+    def sendto(self, data, *args):
+        return self.send(data)
+
+    def close(self):
+        super().close()
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+
+
+class _Client:
+    """
+    A process using the gateway, by socket address
+    """
+    __slots__ = ('addr', 'reassembler', 'streams', 'last_seen')
+
+    def __init__(self, addr) -> None:
+        self.addr = addr
+        self.reassembler = FrameReassembler(datagram=True)
+        self.streams = {} # DATA_STREAM_TYPE: frequency code asked for
+        self.last_seen = monotonic()
+
+
+class _Upstream:
+    """
+    A request sent to the camera and the clients waiting for its reply
+    """
+    __slots__ = ('seq', 'cmd_id', 'key', 'waiters', 'deadline')
+
+    def __init__(self, seq, cmd_id, key, deadline) -> None:
+        self.seq = seq
+        self.cmd_id = cmd_id
+        self.key = key # (cmd_id, data) of a query, None otherwise
+        self.waiters = [] # (client, client seq)
+        self.deadline = deadline
+
+
+class SIYIGateway:
+    def __init__(self, server_ip="192.168.144.25", port=37260, path=DEFAULT_SOCKET,
+                 ttl=0.05, timeout=1.0, client_timeout=10.0, engine=None) -> None:
+        """
+        Params
+        --
+        - server_ip [str] IP address of the camera
+        - port [int] UDP port of the camera
+        - path [str] Unix socket the clients connect to. A stale one is replaced
+        - ttl [float] Seconds a query reply is served from the cache, see also CACHE_TTLS.
+          0 only coalesces queries in flight
+        - timeout [float] Seconds after which an unanswered request is forgotten, so the
+          next identical query is sent again
+        - client_timeout [float] Seconds of silence after which a client is forgotten and its
+          streams are stopped. SIYISDK checks its connection every second, so it never idles
+        - engine [SelectorEngine] Engine to run on. The gateway creates and runs its own if None
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._camera = (server_ip, port)
+        self.path = path
+        self.ttl = ttl
+        self.timeout = timeout
+        self.client_timeout = client_timeout
+
+        self._own_engine = engine is None
+        self._engine = SelectorEngine() if engine is None else engine
+
+        self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._udp.setblocking(False)
+        self._reassembler = FrameReassembler(datagram=True)
+
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+        self._unix = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._unix.bind(path)
+        self._unix.setblocking(False)
+
+        self._clients = {} # address: _Client
+        self._anonymous = _Client(None) # clients without address, they get no reply
+        self._seqs = count(1)
+        self._pending = defaultdict(dict) # cmd_id: {upstream seq: _Upstream}, oldest first
+        self._inflight = {} # (cmd_id, data): _Upstream of queries
+        self._cache = {} # (cmd_id, data): (expiry, reply data)
+        self._stream_clients = defaultdict(set) # pushed cmd_id: clients
+
+        self.requests = 0
+        self.forwarded = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+        self.replies = 0
+        self.pushed = 0
+        self.unmatched = 0
+        self.timeouts = 0
+        self.send_errors = 0
+        self._timer = None
+        self._started = False
+
+    ##################################################
+    #                   Lifecycle                    #
+    ##################################################
+    def start(self):
+        """
+        Starts serving. Runs the engine thread if the gateway owns the engine
+
+        Returns
+        --
+        [SIYIGateway] self
+        """
+        if self._started:
+            return self
+        self._started = True
+        self._engine.addReader(self._udp, self._onCamera)
+        self._engine.addReader(self._unix, self._onClients)
+        self._timer = self._engine.callEvery(min(0.1, self.timeout/4.), self._expire)
+        self._engine.start()
+        self._logger.info("Gateway of camera %s:%s on %s", self._camera[0], self._camera[1], self.path)
+        return self
+
+    def serveForever(self):
+        """
+        Starts the gateway and blocks the calling thread until stop() is called from another
+        thread or Ctrl+C, then closes it. Requests are served on the engine thread
+        """
+        self.start()
+        try:
+            while self._started:
+                sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def stop(self):
+        if not self._started:
+            return
+        self._started = False
+        self._timer.cancel()
+        self._engine.removeReader(self._udp)
+        self._engine.removeReader(self._unix)
+        if self._own_engine:
+            self._engine.stop()
+
+    def close(self):
+        self.stop()
+        self._udp.close()
+        self._unix.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        if self._own_engine:
+            self._engine.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        """
+        Returns
+        --
+        [dict] Counters of client requests, how they were served, and the number of clients
+        """
+        return {'requests': self.requests,
+                'forwarded': self.forwarded,
+                'coalesced': self.coalesced,
+                'cache_hits': self.cache_hits,
+                'replies': self.replies,
+                'pushed': self.pushed,
+                'unmatched': self.unmatched,
+                'timeouts': self.timeouts,
+                'send_errors': self.send_errors,
+                'in_flight': sum(len(pending) for pending in list(self._pending.values())),
+                'clients': len(self._clients)}
+
+    ##################################################
+    #                    Clients                     #
+    ##################################################
+    def _onClients(self):
+        # Drain the socket, many requests can be waiting
+        while True:
+            try:
+                buff, addr = self._unix.recvfrom(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                self._logger.error("Receive failed: %s", e)
+                return
+            if addr:
+                client = self._clients.get(addr)
+                if client is None:
+                    client = self._clients[addr] = _Client(addr)
+                    self._logger.debug("Client %r connected", addr)
+                client.last_seen = monotonic()
+            else:
+                client = self._anonymous
+            for cmd_id, seq, data in client.reassembler.feed(buff):
+                self._onRequest(client, cmd_id, seq, data)
+
+    def _onRequest(self, client, cmd_id, seq, data):
+        self.requests += 1
+        now = monotonic()
+        if cmd_id in QUERY_CMDS:
+            key = (cmd_id, data)
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > now:
+                self.cache_hits += 1
+                self._sendClient(client, buildFrame(cmd_id, cached[1], seq))
+                return
+            upstream = self._inflight.get(key)
+            if upstream is not None:
+                self.coalesced += 1
+                upstream.waiters.append((client, seq))
+                return
+        else:
+            # The camera state may change, cached replies are not trusted any more
+            key = None
+            self._cache.clear()
+            if cmd_id==_DATA_STREAM and len(data) >= 2:
+                data = self._streamRequest(client, data[0], data[1])
+
+        upstream = self._forward(cmd_id, data, key, now)
+        if upstream is not None:
+            upstream.waiters.append((client, seq))
+
+    def _forward(self, cmd_id, data, key=None, now=None):
+        """
+        Sends a request to the camera
+
+        Returns
+        --
+        [_Upstream] Waiting for the reply, None for requests without reply
+        """
+        seq = next(self._seqs) & 0xffff
+        self.forwarded += 1
+        self._sendCamera(buildFrame(cmd_id, data, seq))
+        command = SCHEMAS.get(cmd_id)
+        if command is not None and command.response is None:
+            return None
+        upstream = _Upstream(seq, cmd_id, key, (monotonic() if now is None else now)+self.timeout)
+        self._pending[cmd_id][seq] = upstream
+        if key is not None:
+            self._inflight[key] = upstream
+        return upstream
+
+    def _streamRequest(self, client, data_type, freq_code):
+        """
+        Records the stream rate asked by client
+
+        Returns
+        --
+        [bytes] DATA_STREAM payload to send: the highest rate any client asked for
+        """
+        if freq_code:
+            client.streams[data_type] = freq_code
+        else:
+            client.streams.pop(data_type, None)
+        cmd_id = _STREAM_CMDS.get(data_type)
+        if cmd_id is not None:
+            if freq_code:
+                self._stream_clients[cmd_id].add(client)
+            else:
+                self._stream_clients[cmd_id].discard(client)
+        return bytes((data_type, self._streamRate(data_type)))
+
+    def _streamRate(self, data_type):
+        return max((c.streams.get(data_type, 0) for c in self._clients.values()), default=0)
+
+    def _dropClient(self, client):
+        """
+        Forgets a client that is gone or idle, and slows down the streams it used
+        """
+        if self._clients.pop(client.addr, None) is None:
+            return
+        self._logger.debug("Client %r disconnected", client.addr)
+        for clients in self._stream_clients.values():
+            clients.discard(client)
+        for data_type, freq_code in client.streams.items():
+            rate = self._streamRate(data_type)
+            if rate < freq_code:
+                self._forward(_DATA_STREAM, bytes((data_type, rate)))
+        client.streams.clear()
+
+    def _sendClient(self, client, frame):
+        if client.addr is None:
+            return
+        try:
+            self._unix.sendto(frame, client.addr)
+        except (ConnectionRefusedError, FileNotFoundError):
+            self._dropClient(client)
+        except OSError as e:
+            # A full client buffer drops the frame, the gateway never waits for a client
+            self.send_errors += 1
+            self._logger.debug("Send to client %r failed: %s", client.addr, e)
+
+    ##################################################
+    #                     Camera                     #
+    ##################################################
+    def _sendCamera(self, frame):
+        try:
+            self._udp.sendto(frame, self._camera)
+        except OSError as e:
+            self.send_errors += 1
+            self._logger.error("Send to camera failed: %s", e)
+
+    def _onCamera(self):
+        while True:
+            try:
+                buff, addr = self._udp.recvfrom(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                self._logger.error("Receive failed: %s", e)
+                return
+            for cmd_id, seq, data in self._reassembler.feed(buff):
+                self._onReply(cmd_id, seq, data)
+
+    def _onReply(self, cmd_id, seq, data):
+        # Matched by seq when the camera echoes it, otherwise it answers the oldest request
+        # of the command, like InFlightRequests.resolve() of the SDK
+        pending = self._pending.get(cmd_id)
+        upstream = by_seq = None
+        if pending:
+            upstream = by_seq = pending.pop(seq, None)
+            if upstream is None:
+                upstream = pending.pop(next(iter(pending)))
+
+        # Without a seq match the frame may be pushed by a stream as well
+        clients = self._stream_clients.get(cmd_id) if by_seq is None else None
+        if clients:
+            self.pushed += 1
+            frame = buildFrame(cmd_id, data, seq)
+            waiting = {client for client, _ in upstream.waiters} if upstream is not None else ()
+            for client in list(clients):
+                if client not in waiting:
+                    self._sendClient(client, frame)
+        if upstream is None:
+            if not clients:
+                self.unmatched += 1
+            return
+
+        if upstream.key is not None:
+            self._inflight.pop(upstream.key, None)
+            ttl = CACHE_TTLS.get(cmd_id, self.ttl)
+            if ttl > 0.:
+                self._cache[upstream.key] = (monotonic()+ttl, data)
+        for client, client_seq in upstream.waiters:
+            self.replies += 1
+            self._sendClient(client, buildFrame(cmd_id, data, client_seq))
+
+    def _expire(self):
+        now = monotonic()
+        for pending in self._pending.values():
+            while pending:
+                seq = next(iter(pending))
+                upstream = pending[seq]
+                if upstream.deadline > now:
+                    break
+                del pending[seq]
+                self.timeouts += 1
+                if upstream.key is not None:
+                    self._inflight.pop(upstream.key, None)
+        if len(self._cache) > 1024:
+            self._cache = {key: value for key, value in self._cache.items() if value[0] > now}
+        idle = now-self.client_timeout
+        for client in [client for client in self._clients.values() if client.last_seen < idle]:
+            self._dropClient(client)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Share one SIYI camera between local processes")
+    parser.add_argument('--camera-ip', default="192.168.144.25", help="IP address of the camera")
+    parser.add_argument('--port', type=int, default=37260, help="UDP port of the camera")
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help="Unix socket of the clients (default %(default)s)")
+    parser.add_argument('--ttl', type=float, default=0.05, help="seconds query replies are cached")
+    parser.add_argument('--timeout', type=float, default=1.0, help="seconds to wait for a reply of the camera")
+    parser.add_argument('--client-timeout', type=float, default=10.0, help="seconds before a silent client is forgotten")
+    parser.add_argument('--stats', type=float, default=0., help="print counters every this many seconds")
+    parser.add_argument('--debug', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(format=' [%(levelname)s] %(asctime)s [%(name)s] :\t%(message)s',
+                        level=logging.DEBUG if args.debug else logging.INFO)
+    gateway = SIYIGateway(args.camera_ip, args.port, args.socket, args.ttl, args.timeout, args.client_timeout)
+    if args.stats > 0.:
+        gateway._engine.callEvery(args.stats, lambda: print(gateway.stats(), flush=True), args.stats)
+    gateway.serveForever()
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Fixed-capacity attitude history backed by NumPy arrays
+
+    cam.enableAttitudeHistory(capacity=65536)
+    ...
+    att = cam.getAttitudeHistory().interpolate(frame_stamps)  # (n, 6) array
+    yaw, pitch, roll = att[:, 0], att[:, 1], att[:, 2]
+
+Timestamps are time.monotonic() receive times, like the stamp of the state records.
+Requires numpy
+"""
+import threading
+from time import monotonic
+
+try:
+    import numpy as np
+except ImportError: # optional, only needed by AttitudeHistory
+    np = None
+
+FIELDS = ('yaw', 'pitch', 'roll', 'yaw_speed', 'pitch_speed', 'roll_speed')
+
+
+def _wrap180(deg):
+    """
+    Wraps angles to [-180, 180)
+    """
+    return (deg+180.) % 360. - 180.
+
+def _toQuaternion(yaw, pitch, roll):
+    """
+    Z-Y-X (yaw, pitch, roll) Euler angles in degrees to unit quaternions, as an (n, 4) w, x, y, z array
+    """
+    y, p, r = np.radians(yaw)/2., np.radians(pitch)/2., np.radians(roll)/2.
+    cy, sy, cp, sp, cr, sr = np.cos(y), np.sin(y), np.cos(p), np.sin(p), np.cos(r), np.sin(r)
+    return np.stack((cr*cp*cy + sr*sp*sy,
+                     sr*cp*cy - cr*sp*sy,
+                     cr*sp*cy + sr*cp*sy,
+                     cr*cp*sy - sr*sp*cy), axis=-1)
+
+def _toEuler(q):
+    """
+    Inverse of _toQuaternion(). Returns yaw, pitch, roll in degrees
+    """
+    w, x, y, z = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+    roll = np.arctan2(2.*(w*x + y*z), 1. - 2.*(x*x + y*y))
+    pitch = np.arcsin(np.clip(2.*(w*y - z*x), -1., 1.))
+    yaw = np.arctan2(2.*(w*z + x*y), 1. - 2.*(y*y + z*z))
+    return np.degrees(yaw), np.degrees(pitch), np.degrees(roll)
+
+def _slerp(q0, q1, w):
+    """
+    Spherical linear interpolation between rows of q0 and q1, w in [0, 1]
+    """
+    dot = np.sum(q0*q1, axis=1)
+    # q and -q are the same rotation, take the short way
+    q1 = np.where((dot < 0.)[:, None], -q1, q1)
+    dot = np.abs(dot)
+    theta = np.arccos(np.clip(dot, -1., 1.))
+    sin_theta = np.sin(theta)
+    small = sin_theta < 1e-6
+    safe = np.where(small, 1., sin_theta)
+    s0 = np.where(small, 1.-w, np.sin((1.-w)*theta)/safe)
+    s1 = np.where(small, w, np.sin(w*theta)/safe)
+    q = s0[:, None]*q0 + s1[:, None]*q1
+    return q/np.linalg.norm(q, axis=1)[:, None]
+
+
+class AttitudeHistory:
+    def __init__(self, capacity=65536) -> None:
+        """
+        Memory is allocated once: capacity*7 float64, about 3.5 MB for the default capacity,
+        i.e. 11 minutes at 100 Hz or 1.8 hours at 10 Hz. Older samples are overwritten
+
+        Params
+        --
+        - capacity [int] Number of samples kept
+        """
+        if np is None:
+            raise ImportError("AttitudeHistory requires numpy")
+        if capacity < 2:
+            raise ValueError("capacity must be at least 2")
+        self.capacity = capacity
+        self._t = np.zeros(capacity)
+        self._data = np.zeros((capacity, len(FIELDS)))
+        self._next = 0 # physical index of the next sample
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        with self._lock:
+            self._next = 0
+            self._count = 0
+
+    def append(self, stamp, yaw, pitch, roll, yaw_speed=0., pitch_speed=0., roll_speed=0.):
+        """
+        Adds a sample. Stamps must not decrease, older ones are ignored
+        """
+        with self._lock:
+            if self._count and stamp < self._t[self._next-1]:
+                return False
+            i = self._next
+            self._t[i] = stamp
+            self._data[i] = (yaw, pitch, roll, yaw_speed, pitch_speed, roll_speed)
+            self._next = i+1 if i+1 < self.capacity else 0
+            if self._count < self.capacity:
+                self._count += 1
+        return True
+
+    def appendMsg(self, att):
+        """
+        Adds an AttitdueMsg record
+        """
+        return self.append(att.stamp, att.yaw, att.pitch, att.roll, att.yaw_speed, att.pitch_speed, att.roll_speed)
+
+    def _ordered(self):
+        """
+        Returns the timestamps oldest first and the offset of the oldest sample. Call with the lock held
+        """
+        start = (self._next-self._count) % self.capacity
+        if start+self._count <= self.capacity:
+            return self._t[start:start+self._count].copy(), start
+        return np.concatenate((self._t[start:], self._t[:self._next])), start
+
+    def samples(self, t0=None, t1=None):
+        """
+        Returns
+        --
+        [tuple] (timestamps, values) of the samples with t0 <= stamp <= t1, oldest first.
+        values is an (n, 6) array with the columns of FIELDS
+        """
+        with self._lock:
+            t, start = self._ordered()
+            lo = 0 if t0 is None else np.searchsorted(t, t0, 'left')
+            hi = len(t) if t1 is None else np.searchsorted(t, t1, 'right')
+            rows = (np.arange(lo, hi)+start) % self.capacity
+            return t[lo:hi], self._data[rows]
+
+    def interpolate(self, timestamps, method='linear', clamp=False):
+        """
+        Attitude at arbitrary times, e.g. the capture times of video frames
+
+        Params
+        --
+        - timestamps: Sequence or array of monotonic times, in any order
+        - method [str] 'linear' interpolates each angle, with yaw wrapped through +-180.
+          'slerp' interpolates the orientation on the shortest arc. Rates are always linear
+        - clamp [bool] Times outside the history get the first or last sample. NaN otherwise
+
+        Returns
+        --
+        [numpy.ndarray] (n, 6) array with the columns of FIELDS
+        """
+        if method not in ('linear', 'slerp'):
+            raise ValueError("Unknown method %r, use 'linear' or 'slerp'" % method)
+        ts = np.asarray(timestamps, dtype=float).reshape(-1)
+        out = np.full((len(ts), len(FIELDS)), np.nan)
+        with self._lock:
+            if self._count==0:
+                return out
+            t, start = self._ordered()
+            n = len(t)
+            hi = np.searchsorted(t, ts, 'right')
+            i1 = np.clip(hi, 1, n-1) if n > 1 else np.zeros_like(hi)
+            i0 = np.maximum(i1-1, 0)
+            d0 = self._data[(i0+start) % self.capacity]
+            d1 = self._data[(i1+start) % self.capacity]
+        t0, t1 = t[i0], t[i1]
+        span = t1-t0
+        w = np.clip(np.where(span > 0., (ts-t0)/np.where(span > 0., span, 1.), 0.), 0., 1.)
+
+        out[:] = d0 + w[:, None]*(d1-d0)
+        if method=='slerp':
+            q = _slerp(_toQuaternion(d0[:, 0], d0[:, 1], d0[:, 2]),
+                       _toQuaternion(d1[:, 0], d1[:, 1], d1[:, 2]), w)
+            out[:, 0], out[:, 1], out[:, 2] = _toEuler(q)
+        else:
+            out[:, 0] = _wrap180(d0[:, 0] + w*_wrap180(d1[:, 0]-d0[:, 0]))
+
+        if not clamp:
+            out[(ts < t[0]) | (ts > t[-1])] = np.nan
+        return out
+
+    def stats(self, duration=None, now=None):
+        """
+        Statistics over the last duration seconds, or the whole history if None
+
+        Returns
+        --
+        [dict] count, and mean, std, min, max of each field in FIELDS. The yaw mean and std
+        are circular, min and max are of the raw angles
+        """
+        if duration is None:
+            t, values = self.samples()
+        else:
+            t, values = self.samples((monotonic() if now is None else now)-duration)
+        result = {'count': len(t)}
+        if len(t)==0:
+            return result
+        for i, name in enumerate(FIELDS):
+            column = values[:, i]
+            result[name] = {'mean': float(column.mean()), 'std': float(column.std()),
+                            'min': float(column.min()), 'max': float(column.max())}
+        yaw = np.radians(values[:, 0])
+        s, c = np.sin(yaw).mean(), np.cos(yaw).mean()
+        r = min(1., float(np.hypot(s, c)))
+        result['yaw']['mean'] = float(np.degrees(np.arctan2(s, c)))
+        result['yaw']['std'] = float(np.degrees(np.sqrt(-2.*np.log(r)))) if r > 0. else float('inf')
+        return result
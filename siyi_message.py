@@ -1,7 +1,28 @@
-from os import stat
-from crc16_python import crc16_str_swap
+import struct
+from itertools import count
+from collections import namedtuple
+from functools import lru_cache
+from crc16_python import crc16, crc16_bytes
 import logging
-from utils import toHex ,Hexcon
+from siyi_schema import SchemaRegistry
+
+# Frame layout: STX+CTRL+Data_len+SEQ+CMD_ID+DATA+CRC16
+#                2 + 1  +    2   + 2 +   1  +  n + 2
+# Multi-byte fields are little endian, according to SIYI SDK
+STX = b'\x55\x66'
+CTRL = 0x01
+_FRAME_HEAD = struct.Struct('<2sBHHB')
+_CRC = struct.Struct('<H')
+_U16 = struct.Struct('<H')
+# Target angles the int16 tenths of a degree of the target_angle request can hold
+_TARGET_ANGLE_LIMITS = (-0x8000/10., 0x7fff/10.)
+HEADER_LEN = _FRAME_HEAD.size
+CRC_LEN = _CRC.size
+MINIMUM_FRAME_LEN = HEADER_LEN+CRC_LEN
+# Longer data lengths are treated as a corrupted header
+MAX_DATA_LEN = 1024
+# Number of parameterised request payloads kept by encodeCommand
+FRAME_CACHE_SIZE = 256
 
 
 class COMMAND:
@@ -29,130 +50,230 @@ class COMMAND:
     Thermal_Gain_Get= '37'    
     Thermal_Params_Send = '3C'
     Thermal_Params_Get = '3B'
+    DATA_STREAM = '25'
+    MAGNETIC_ENCODER = '26'
+    MOTOR_VOLTAGE = '2A'
     
     
     GIMBAL_ROT = '07'
 
+def cmdId(cmd_id):
+    """
+    Returns the integer value of a command ID. Accepts COMMAND hex strings and integers
+    """
+    if isinstance(cmd_id, str):
+        return int(cmd_id, 16)
+    return cmd_id
+
+HARDWARE_IDS = {0x6b: "ZR10", 0x73: "A8 Mini", 0x75: "A2 Mini", 0x78: "ZR30", 0x7a: "ZT30"}
+
+MOTION_MODES = {0: "lock mode", 1: "follow mode", 2: "fpv mode"}
+
+# Data pushed by the gimbal after a DATA_STREAM request, and the command ID of the pushed frames
+class DATA_STREAM_TYPE:
+    ATTITUDE = 1 # ACQUIRE_GIMBAL_ATT
+    LASER_RANGE = 2 # RANGE_FİNDER
+    MAGNETIC_ENCODER = 3 # MAGNETIC_ENCODER
+    MOTOR_VOLTAGE = 4 # MOTOR_VOLTAGE
+
+# Push rates in Hz and their DATA_STREAM frequency codes. 0 stops the stream
+DATA_STREAM_FREQS = {0: 0, 2: 1, 4: 2, 5: 3, 10: 4, 20: 5, 50: 6, 100: 7}
+
+#############################################
+# Payload schemas, indexed by integer CMD ID.
+# New commands can be added with SCHEMAS.register() and used with
+# SIYIMESSAGE.encodeCommand() and SIYISDK.getMsg()
+SCHEMAS = SchemaRegistry()
+_STATUS = [('success', 'B')]
+_TEMP_REGION = [('temp_max', 'h', 100.), ('temp_min', 'h', 100.),
+                ('temp_max_x', 'H'), ('temp_max_y', 'H'), ('temp_min_x', 'H'), ('temp_min_y', 'H')]
+_THERMAL_PARAMS = [('Distance', 'h'), ('Target_emission_rate', 'h'), ('Humidity', 'h'),
+                   ('Atmospheric_Temperature', 'h'), ('Reflection_Temperature', 'h')]
+
+SCHEMAS.register(COMMAND.ACQUIRE_DEVICE_INF, 'device_info', request=[],
+                 response=[('code_board_ver', 'I'),
+                           ('gimbal_patch', 'B'), ('gimbal_minor', 'B'), ('gimbal_major', 'B'),
+                           ('hw_code', 'B'),
+                           ('zoom_patch', 'B'), ('zoom_minor', 'B'), ('zoom_major', 'B')])
+SCHEMAS.register(COMMAND.AUTO_FOCUS, 'auto_focus', request=[('auto_focus', 'B')], response=_STATUS)
+SCHEMAS.register(COMMAND.MANUAL_ZOOM, 'manual_zoom', request=[('zoom', 'b')],
+                 response=[('level', 'H', 10.)])
+SCHEMAS.register(COMMAND.GIMBAL_ROT, 'gimbal_rotation', request=[('yaw_speed', 'b'), ('pitch_speed', 'b')],
+                 response=_STATUS)
+SCHEMAS.register(COMMAND.CENTER, 'center', request=[('center_pos', 'B')], response=_STATUS)
+SCHEMAS.register(COMMAND.PHOTO_VIDEO_HDR, 'photo_video_hdr', request=[('func_type', 'B')])
+SCHEMAS.register(COMMAND.ACQUIRE_GIMBAL_ATT, 'gimbal_attitude', request=[],
+                 response=[('yaw', 'h', 10.), ('pitch', 'h', 10.), ('roll', 'h', 10.),
+                           ('yaw_speed', 'h', 10.), ('pitch_speed', 'h', 10.), ('roll_speed', 'h', 10.)])
+SCHEMAS.register(COMMAND.TargetAngle, 'target_angle', request=[('yaw', 'h', 10.), ('pitch', 'h', 10.)],
+                 response=[('yaw', 'h', 10.), ('pitch', 'h', 10.), ('roll', 'h', 10.)])
+SCHEMAS.register(COMMAND.IMAGE_MOD, 'image_mode', request=[], response=[('vdisp_mode', 'B')])
+SCHEMAS.register(COMMAND.IMAGE_MOD_CHANGE, 'image_mode_change', request=[('vdisp_mode', 'B')],
+                 response=[('vdisp_mode', 'B')])
+SCHEMAS.register(COMMAND.POINT_TEMP, 'point_temperature',
+                 request=[('x', 'H'), ('y', 'H'), ('get_temp_flag', 'B')],
+                 response=[('temprature', 'h', 100.), ('temp_point_x', 'H'), ('temp_point_y', 'H')])
+SCHEMAS.register(COMMAND.BOX_TEMP, 'box_temperature',
+                 request=[('startx', 'H'), ('starty', 'H'), ('endx', 'H'), ('endy', 'H'), ('get_temp_flag', 'B')],
+                 response=[('startx', 'H'), ('starty', 'H'), ('endx', 'H'), ('endy', 'H')]+_TEMP_REGION)
+SCHEMAS.register(COMMAND.Max_Min_Temp, 'max_min_temperature', request=[('get_temp_flag', 'B')],
+                 response=_TEMP_REGION)
+SCHEMAS.register(COMMAND.RANGE_FİNDER, 'range_finder', request=[], response=[('Range_value', 'H', 10.)])
+SCHEMAS.register(COMMAND.ACQUIRE_GIMBAL_MOUTION, 'gimbal_motion_mode', request=[],
+                 response=[('gimbal_moution_mode', 'B')])
+SCHEMAS.register(COMMAND.INF_COLOR_MAP, 'color_map', request=[], response=[('pseudo_color', 'B')])
+SCHEMAS.register(COMMAND.COLOR_MAP, 'color_map_change', request=[('pseudo_color', 'B')],
+                 response=[('pseudo_color', 'B')])
+SCHEMAS.register(COMMAND.Range_finder_params_get, 'range_finder_status', request=[],
+                 response=[('laser_state', 'B')])
+SCHEMAS.register(COMMAND.Range_finder_params_send, 'range_finder_status_change', request=[('laser_state', 'B')],
+                 response=[('ack', 'B')])
+SCHEMAS.register(COMMAND.Thermal_Raw_data, 'thermal_raw_data', request=[('mode', 'B')], response=[('mode', 'B')])
+SCHEMAS.register(COMMAND.Thermal_Map, 'thermal_map', request=[], response=[('ack', 'B')])
+SCHEMAS.register(COMMAND.Thermal_Gain_Get, 'thermal_gain', request=[], response=[('gain_status', 'B')])
+SCHEMAS.register(COMMAND.Thermal_Gain_Send, 'thermal_gain_change', request=[('gain_status', 'B')],
+                 response=[('gain_status', 'B')])
+SCHEMAS.register(COMMAND.Thermal_Params_Get, 'thermal_params', request=[], response=_THERMAL_PARAMS)
+SCHEMAS.register(COMMAND.Thermal_Params_Send, 'thermal_params_change', request=_THERMAL_PARAMS,
+                 response=[('ack', 'B')])
+SCHEMAS.register(COMMAND.DATA_STREAM, 'data_stream', request=[('data_type', 'B'), ('data_freq', 'B')],
+                 response=[('data_type', 'B')])
+SCHEMAS.register(COMMAND.MAGNETIC_ENCODER, 'magnetic_encoder', request=[],
+                 response=[('yaw', 'h', 10.), ('pitch', 'h', 10.), ('roll', 'h', 10.)])
+SCHEMAS.register(COMMAND.MOTOR_VOLTAGE, 'motor_voltage', request=[],
+                 response=[('yaw', 'h'), ('pitch', 'h'), ('roll', 'h')])
+
 
+#############################################
+# State records. Each reply replaces the whole record, so readers on other
+# threads never see a half updated message. stamp is the time.monotonic()
+# receive time, 0 until the first reply. The fields after seq and stamp
+# follow the response schema order
+class DeviceMsg(namedtuple('DeviceMsg', 'seq stamp code_board_ver gimbal_firmware_ver zoom_firmware_ver id',
+                           defaults=(0, 0.0, 0, '', '', ''))):
+    __slots__ = ()
+
+class AutoFocusMsg(namedtuple('AutoFocusMsg', 'seq stamp success', defaults=(0, 0.0, False))):
+    __slots__ = ()
+
+class CenterMsg(namedtuple('CenterMsg', 'seq stamp success', defaults=(0, 0.0, False))):
+    __slots__ = ()
+
+class MoutionMode(namedtuple('MoutionMode', 'seq stamp mode gimbal_moution_mode', defaults=(0, 0.0, 0, ''))):
+    __slots__ = ()
+
+class ManualZoomMsg(namedtuple('ManualZoomMsg', 'seq stamp level', defaults=(0, 0.0, 0.0))):
+    __slots__ = ()
+
+class GimbalSpeedMsg(namedtuple('GimbalSpeedMsg', 'seq stamp success', defaults=(0, 0.0, False))):
+    __slots__ = ()
+
+class AttitdueMsg(namedtuple('AttitdueMsg', 'seq stamp yaw pitch roll yaw_speed pitch_speed roll_speed',
+                             defaults=(0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0))):
+    """
+    Angles in degrees, speeds in deg/s
+    """
+    __slots__ = ()
 
-class DeviceMsg:
-    seq=0
-    code_board_ver=''
-    gimbal_firmware_ver=''
-    zoom_firmware_ver=''
-    id=''
-
-class AutoFocusMsg:
-    seq=0
-    success=False
-
-class CenterMsg:
-    seq=0
-    success=False
-
-class MoutionMode:
-    seq=0
-    gimbal_moution_mode=''
-
-class ManualZoomMsg:
-    seq=0
-    level=-1
-
-class GimbalSpeedMsg:
-    seq=0
-    success=False
-
-class AttitdueMsg:
-    seq=    0
-    stamp=  0 # seconds
-    yaw=    ''
-    pitch=  ''
-    roll=   ''
-    yaw_speed=  0.0 # deg/s
-    pitch_speed=0.0
-    roll_speed= 0.0
-
-class TarRotationmsg:
-    seq =0
-    yaw = ''
-    pitch = ''
-    roll = ''
-
-class TemperatureMsg:
-    seq = 0
-    temp_max = ''
-    temp_min = ''
-    temp_max_x = ''
-    temp_max_y = ''
-    temp_min_x = ''
-    temp_min_y = ''
-
-class RangeFinderMsg:
-    seq =0
-    Range_value = ''
-
-class BoxTemperatureMsg:
-    seq = 0
-    startx = ''
-    starty = ''
-    endx = ''
-    endy =''
-    temp_max = ''
-    temp_min = ''
-    temp_max_x = ''
-    temp_max_y = ''
-    temp_min_x = ''
-    temp_min_y = ''
-
-class PointTemperatureMsg:
-    seq = 0
-    temp_point_x = ''
-    temp_point_y = ''
-    temprature = ''
+class TarRotationmsg(namedtuple('TarRotationmsg', 'seq stamp yaw pitch roll', defaults=(0, 0.0, 0.0, 0.0, 0.0))):
+    __slots__ = ()
+
+class TemperatureMsg(namedtuple('TemperatureMsg',
+                                'seq stamp temp_max temp_min temp_max_x temp_max_y temp_min_x temp_min_y',
+                                defaults=(0, 0.0, 0.0, 0.0, 0, 0, 0, 0))):
+    __slots__ = ()
+
+class RangeFinderMsg(namedtuple('RangeFinderMsg', 'seq stamp Range_value', defaults=(0, 0.0, 0.0))):
+    __slots__ = ()
+
+class BoxTemperatureMsg(namedtuple('BoxTemperatureMsg',
+                                   'seq stamp startx starty endx endy temp_max temp_min '
+                                   'temp_max_x temp_max_y temp_min_x temp_min_y',
+                                   defaults=(0, 0.0, 0, 0, 0, 0, 0.0, 0.0, 0, 0, 0, 0))):
+    __slots__ = ()
+
+class PointTemperatureMsg(namedtuple('PointTemperatureMsg', 'seq stamp temprature temp_point_x temp_point_y',
+                                     defaults=(0, 0.0, 0.0, 0, 0))):
+    __slots__ = ()
     
-class ColorMapMSg:
-    seq = 0
-    pseudo_color = ''
-    target_pseudo_color = ''
-
-class ImageModMsg:
-    seq = 0
-    vdisp_mode =''
-    target_vdisp_mode= ''  
+class ColorMapMSg(namedtuple('ColorMapMSg', 'seq stamp pseudo_color', defaults=(0, 0.0, 0))):
+    __slots__ = ()
+
+class ImageModMsg(namedtuple('ImageModMsg', 'seq stamp vdisp_mode', defaults=(0, 0.0, 0))):
+    __slots__ = ()
     
-class ThermalRawData:
-    seq = 0
-    mode =''   
+class ThermalRawData(namedtuple('ThermalRawData', 'seq stamp mode', defaults=(0, 0.0, 0))):
+    __slots__ = ()
        
-class ThermalTempMAP:
-    seq = 0
-    ack =''
+class ThermalTempMAP(namedtuple('ThermalTempMAP', 'seq stamp ack', defaults=(0, 0.0, 0))):
+    __slots__ = ()
    
-class ThermalGain:
-    seq = 0
-    gain_status ='' 
+class ThermalGain(namedtuple('ThermalGain', 'seq stamp gain_status', defaults=(0, 0.0, 0))):
+    __slots__ = ()
        
-class ThermalParams:
-    seq = 0
-    Distance = ''
-    Target_emission_rate = ''
-    Humidity = ''
-    Atmospheric_Temperature = ''
-    Reflection_Temperature = ''
-    ack = ''
+class ThermalParams(namedtuple('ThermalParams',
+                               'seq stamp Distance Target_emission_rate Humidity '
+                               'Atmospheric_Temperature Reflection_Temperature ack',
+                               defaults=(0, 0.0, 0, 0, 0, 0, 0, 0))):
+    __slots__ = ()
     
-class RangeFinderParams:
-    seq = 0
-    laser_state =''
-    ack = ''
+class RangeFinderParams(namedtuple('RangeFinderParams', 'seq stamp laser_state ack', defaults=(0, 0.0, 0, 0))):
+    __slots__ = ()
+
+class DataStreamMsg(namedtuple('DataStreamMsg', 'seq stamp data_type', defaults=(0, 0.0, 0))):
+    __slots__ = ()
     
+#############################################
+# Payload cache. The encoded fields of requests are cached, the frame around them is
+# packed with its sequence number on use, see SIYIMESSAGE.encodeCommand()
+def buildFrame(cmd_id, data, seq=0):
+    """
+    Encodes one frame
+
+    Params
+    --
+    - cmd_id [int] Command ID
+    - data [bytes] Payload
+    - seq [int] Sequence number
+
+    Returns
+    --
+    [bytes] STX+CTRL+Data_len+SEQ+CMD_ID+DATA+CRC16
+    """
+    front = _FRAME_HEAD.pack(STX, CTRL, len(data), seq, cmd_id)+data
+    return front+crc16_bytes(front)
+
+def _encodeRequest(cmd_id, values):
+    """
+    Returns (integer command ID, request payload)
+    """
+    cmd_id = cmdId(cmd_id)
+    return cmd_id, SCHEMAS[cmd_id].request.encode(*values)
+
+_constPayload = lru_cache(maxsize=None)(_encodeRequest)
+_cachedPayload = lru_cache(maxsize=FRAME_CACHE_SIZE)(_encodeRequest)
+
+def clearFrameCache():
+    _constPayload.cache_clear()
+    _cachedPayload.cache_clear()
+
+# Requests without parameters are encoded once
+for _schema in SCHEMAS.values():
+    if _schema.request is not None and not _schema.request.names:
+        _constPayload(_schema.cmd_id, ())
+
 #############################################
 class SIYIMESSAGE:
     
     """
     Structure of SIYI camera messages
     """
-    def __init__(self, debug=False) -> None:
+    def __init__(self, debug=False, use_seq=False) -> None:
+        """
+        Params
+        --
+        - use_seq [bool] Write the sequence number into the frames. Otherwise it is always 0
+        """
         self._debug= debug # print debug messages
         if self._debug:
             d_level = logging.DEBUG
@@ -166,6 +287,8 @@ class SIYIMESSAGE:
         self._ctr ='01'        
 
         self._seq= 0
+        self._use_seq = use_seq
+        self._seq_counter = count(1) # next() is atomic, so threads never share a seq
 
         self._cmd_id='00' # 1 byte
         
@@ -232,270 +355,273 @@ class SIYIMESSAGE:
         len_str = low_b + high_b
         return len_str
 
-    def decodeMsg(self, msg):
-        data = None
-        
-        if not isinstance(msg, str):
-            self._logger.error("Input message is not a string")
-            return data
+    def decodeFrame(self, buf, offset=0):
+        """
+        Decodes one frame from a bytes-like object, starting at offset
 
-        # 10 bytes: STX+CTRL+Data_len+SEQ+CMD_ID+CRC16
-        #            2 + 1  +    2   + 2 +   1  + 2
-        MINIMUM_DATA_LENGTH=10*2
-        if len(msg)<MINIMUM_DATA_LENGTH:
+        Returns
+        --
+        [tuple] (data [bytes], data_len [int], cmd_id [int], seq [int]). None if the frame is not valid
+        """
+        mv = memoryview(buf)
+        if len(mv)-offset < MINIMUM_FRAME_LEN:
             self._logger.error("No data to decode")
-            return data
+            return None
 
-        
-        # Now we got minimum amount of data. Check if we have enough
-        # Data length, bytes are reversed, according to SIYI SDK
-        low_b = msg[6:8] # low byte
-        high_b = msg[8:10] # high byte
-        data_len = high_b+low_b
-        data_len = int('0x'+data_len, base=16)
-        char_len = data_len*2 # number of characters. Each byte is represented by two characters in hex, e.g. '0A'= 2 chars
+        stx, ctrl, data_len, seq, cmd_id = _FRAME_HEAD.unpack_from(mv, offset)
+        if stx != STX:
+            self._logger.error("Frame does not start with the header")
+            return None
+
+        end = offset+HEADER_LEN+data_len
+        if len(mv) < end+CRC_LEN:
+            self._logger.error("Frame is truncated. Expected %s data bytes", data_len)
+            return None
 
         # check crc16, if msg is OK!
-        msg_crc=msg[-4:] # last 4 characters
-        payload=msg[:-4]
-        expected_crc=crc16_str_swap(payload)
+        msg_crc, = _CRC.unpack_from(mv, end)
+        expected_crc = crc16(mv[offset:end])
         if expected_crc!=msg_crc:
-            self._logger.error("CRC16 is not valid. Got %s. Expected %s. Message might be corrupted!", msg_crc, expected_crc)
-            return data
-        
-        # Sequence
-        low_b = msg[10:12] # low byte
-        high_b = msg[12:14] # high byte
-        seq_hex = high_b+low_b
-        seq = int('0x'+seq_hex, base=16)
-        
-        # CMD ID
-        cmd_id = msg[14:16]
-        
-        # DATA
-        if data_len>0:
-            data = msg[16:16+char_len]
-        else:
-            data=''
-        
+            self._logger.error("CRC16 is not valid. Got %04x. Expected %04x. Message might be corrupted!", msg_crc, expected_crc)
+            return None
+
+        data = bytes(mv[offset+HEADER_LEN:end])
+
         self._data = data
         self._data_len = data_len
         self._cmd_id = cmd_id
-        
+
         return data, data_len, cmd_id, seq
 
+    def encodeFrame(self, data, cmd_id):
+        """
+        Encodes a msg according to SDK protocol, directly as bytes
+
+        Params
+        --
+        - data [bytes] Payload
+        - cmd_id [int] Command ID. Hex strings from COMMAND are accepted too
+
+        Returns
+        --
+        [bytes] Encoded frame
+        """
+        return buildFrame(cmdId(cmd_id), data, self.nextSeq())
+
+    def nextSeq(self):
+        """
+        Advances the sequence number. Returns the value to write in the next frame,
+        always 0 without use_seq
+        """
+        self._seq = seq = next(self._seq_counter) & 0xffff
+        return seq if self._use_seq else 0
+
+    def encodeCommand(self, cmd_id, *values):
+        """
+        Encodes a request from the field values of its schema in SCHEMAS.
+        Payloads are cached by arguments, see FRAME_CACHE_SIZE
+
+        Returns
+        --
+        [bytes] Encoded frame
+        """
+        try:
+            cmd_id, data = _cachedPayload(cmd_id, values)
+        except TypeError:
+            # Unhashable arguments
+            cmd_id, data = _encodeRequest(cmd_id, values)
+        return buildFrame(cmd_id, data, self.nextSeq())
+
+    def _constCommand(self, cmd_id, *values):
+        """
+        encodeCommand for requests that are always sent with the same values. Never evicted
+        """
+        cmd_id, data = _constPayload(cmd_id, values)
+        return buildFrame(cmd_id, data, self.nextSeq())
+
+    @staticmethod
+    def frameSeq(frame):
+        """
+        Returns the sequence number written in an encoded frame
+        """
+        return frame[5] | (frame[6]<<8)
+
+    def decodeMsg(self, msg):
+        """
+        Hex string wrapper around decodeFrame
+
+        Returns
+        --
+        [tuple] (data [str], data_len [int], cmd_id [str], seq [int]). None if the message is not valid
+        """
+        if not isinstance(msg, str):
+            self._logger.error("Input message is not a string")
+            return None
+
+        try:
+            buf = bytes.fromhex(msg)
+        except ValueError:
+            self._logger.error("Input message is not a hex string")
+            return None
+
+        val = self.decodeFrame(buf)
+        if val is None:
+            return None
+        data, data_len, cmd_id, seq = val
+        return data.hex(), data_len, format(cmd_id, '02x'), seq
+
     def encodeMsg(self, data, cmd_id):
         """
-        Encodes a msg according to SDK protocol
+        Encodes a msg according to SDK protocol. Hex string wrapper around encodeFrame
 
         Returns
         --
-        [str] Encoded msg. Empty string if crc16 is not successful
+        [str] Encoded msg. Empty string if data is not a valid hex string
         """
-        seq = self.incrementSEQ(self._seq)
-        data_len = self.computeDataLen(data)
-        
-        # msg_front = self.HEADER+self._ctr+data_len+seq+cmd_id+data
-        msg_front = self.HEADER+self._ctr+data_len+'0000'+cmd_id+data
-        crc = crc16_str_swap(msg_front)
-        if crc is not None:
-            msg = msg_front+crc
-            self._logger.debug("Encoded msg: %s", msg)
-            return msg
-        else:
-            self._logger.error("Could not encode message. crc16 is None")
+        # We expect number of chartacters to be even (each byte is represented by two cahrs e.g. '0A')
+        if (len(data)%2) != 0:
+            data = '0'+data # Pad 0 from the left, as sometimes it's ignored!
+        try:
+            msg = self.encodeFrame(bytes.fromhex(data), cmd_id).hex()
+        except ValueError:
+            self._logger.error("Could not encode message. Data is not a hex string")
             return ''
+        self._logger.debug("Encoded msg: %s", msg)
+        return msg
 
     ########################################################
     #               Message definitions                    #
     ########################################################
+    # The *Frame builders return the encoded frame as bytes, ready to send.
+    # The *Msg builders, e.g. gimbalAttMsg(), return it as a hex string like
+    # they always did, see _hexBuilder() below the class
     
-    def firmwareVerMsg(self):
+    def firmwareVerFrame(self):
         """
-        Returns message string of the Acqsuire Firmware Version msg
+        Returns message bytes of the Acqsuire Firmware Version msg
         """
-        data=""
-        cmd_id = COMMAND.ACQUIRE_DEVICE_INF
-        return self.encodeMsg(data, cmd_id)
+        return self._constCommand(COMMAND.ACQUIRE_DEVICE_INF)
     
-    def hwIdMsg(self):
+    def hwIdFrame(self):
         """
-        Returns message string for the Acquire Hardware ID
+        Returns message bytes for the Acquire Hardware ID
         """
-        data=""
-        cmd_id = COMMAND.ACQUIRE_DEVICE_INF
-        return self.encodeMsg(data, cmd_id)
+        return self._constCommand(COMMAND.ACQUIRE_DEVICE_INF)
 
-    def MoutionMsg(self):
+    def MoutionFrame(self):
         """
         Gimbal moiton mode information
         """
-        data=""
-        cmd_id = COMMAND.ACQUIRE_GIMBAL_MOUTION
-        return self.encodeMsg(data, cmd_id)
+        return self._constCommand(COMMAND.ACQUIRE_GIMBAL_MOUTION)
 
-    def autoFocusMsg(self):
+    def autoFocusFrame(self):
         """
         Auto focus msg
         """
-        data="01"
-        cmd_id = COMMAND.AUTO_FOCUS
-        return self.encodeMsg(data, cmd_id)
+        return self._constCommand(COMMAND.AUTO_FOCUS, 1)
 
-    def centerMsg(self):
+    def centerFrame(self):
         """
         Center gimbal msg
         """
-        data="01"
-        cmd_id = COMMAND.CENTER
-        return self.encodeMsg(data, cmd_id)
+        return self._constCommand(COMMAND.CENTER, 1)
 
-    def zoomInMsg(self):
+    def zoomInFrame(self):
         """
         Zoom in Msg
         """
-        data="01"
-        cmd_id = COMMAND.MANUAL_ZOOM
-        return self.encodeMsg(data, cmd_id)
+        return self._constCommand(COMMAND.MANUAL_ZOOM, 1)
 
-    def zoomOutMsg(self):
+    def zoomOutFrame(self):
         """
         Zoom out Msg
         """
-        data="ff"
-        cmd_id = COMMAND.MANUAL_ZOOM
-        return self.encodeMsg(data, cmd_id)
+        return self._constCommand(COMMAND.MANUAL_ZOOM, -1)
 
-    def stopZoomMsg(self):
+    def stopZoomFrame(self):
         """
         Stop Zoom Msg
         """
-        data="00"
-        cmd_id = COMMAND.MANUAL_ZOOM
-        return self.encodeMsg(data, cmd_id)
-
-    def takePhotoMsg(self):
-        data="00"
-        cmd_id = COMMAND.PHOTO_VIDEO_HDR
-        return self.encodeMsg(data, cmd_id)
-
-    def recordMsg(self):
-        data="02"
-        cmd_id = COMMAND.PHOTO_VIDEO_HDR
-        return self.encodeMsg(data, cmd_id)
-
-    def lockModeMsg(self):
-        data="03"
-        cmd_id = COMMAND.PHOTO_VIDEO_HDR
-        return self.encodeMsg(data, cmd_id)
-
-    def followModeMsg(self):
-        data="04"
-        cmd_id = COMMAND.PHOTO_VIDEO_HDR
-        return self.encodeMsg(data, cmd_id)
+        return self._constCommand(COMMAND.MANUAL_ZOOM, 0)
+
+    def takePhotoFrame(self):
+        return self._constCommand(COMMAND.PHOTO_VIDEO_HDR, 0)
+
+    def recordFrame(self):
+        return self._constCommand(COMMAND.PHOTO_VIDEO_HDR, 2)
+
+    def lockModeFrame(self):
+        return self._constCommand(COMMAND.PHOTO_VIDEO_HDR, 3)
+
+    def followModeFrame(self):
+        return self._constCommand(COMMAND.PHOTO_VIDEO_HDR, 4)
     
-    def fpvModeMsg(self):
-        data="05"
-        cmd_id = COMMAND.PHOTO_VIDEO_HDR
-        return self.encodeMsg(data, cmd_id)
+    def fpvModeFrame(self):
+        return self._constCommand(COMMAND.PHOTO_VIDEO_HDR, 5)
 
-    def gimbalAttMsg(self):
+    def gimbalAttFrame(self):
         """
         Acquire Gimbal Attiude msg
         """
-        data=""
-        cmd_id = COMMAND.ACQUIRE_GIMBAL_ATT
-        return self.encodeMsg(data, cmd_id)
-
-    def AllTempMsg(self):
+        return self._constCommand(COMMAND.ACQUIRE_GIMBAL_ATT)
 
-        data="01"
-        cmd_id = COMMAND.Max_Min_Temp
-        return self.encodeMsg(data, cmd_id)
+    def AllTempFrame(self):
+        return self._constCommand(COMMAND.Max_Min_Temp, 1)
 
-    def RangeFinderMsg(self):
-        data=""
-        cmd_id = COMMAND.RANGE_FİNDER
-        return self.encodeMsg(data, cmd_id)
+    def RangeFinderFrame(self):
+        return self._constCommand(COMMAND.RANGE_FİNDER)
 
-    def PointTempMsg(self,pointx,pointy):
-        data = Hexcon(pointx)+ Hexcon(pointy)+"01"
-        cmd_id = COMMAND.POINT_TEMP
-        return self.encodeMsg(data, cmd_id)
+    def PointTempFrame(self,pointx,pointy):
+        return self.encodeCommand(COMMAND.POINT_TEMP, pointx, pointy, 1)
 
-    def BoxTempMsg(self,startx,starty,endx,endy):
-        data = Hexcon(startx)+ Hexcon(starty)+ Hexcon(endx)+ Hexcon(endy) +"01"
-        cmd_id = COMMAND.BOX_TEMP
-        return self.encodeMsg(data, cmd_id)
+    def BoxTempFrame(self,startx,starty,endx,endy):
+        return self.encodeCommand(COMMAND.BOX_TEMP, startx, starty, endx, endy, 1)
 
-    def InfColorMapMsg(self):
-        data = ""
-        cmd_id = COMMAND.INF_COLOR_MAP
-        return self.encodeMsg(data, cmd_id)
+    def InfColorMapFrame(self):
+        return self._constCommand(COMMAND.INF_COLOR_MAP)
       
-    def ColorMapMsg(self,color):
-        data = toHex(color,8)
-        cmd_id = COMMAND.COLOR_MAP
-        return self.encodeMsg(data, cmd_id)
-
-    def InfImageModMsg(self):
-        data = ""
-        cmd_id = COMMAND.IMAGE_MOD
-        return self.encodeMsg(data, cmd_id)
-
-    def ImageModMsg(self,mode):
-        data = toHex(mode,8)
-        cmd_id = COMMAND.IMAGE_MOD_CHANGE
-        return self.encodeMsg(data, cmd_id)
+    def ColorMapFrame(self,color):
+        return self.encodeCommand(COMMAND.COLOR_MAP, color)
+
+    def InfImageModFrame(self):
+        return self._constCommand(COMMAND.IMAGE_MOD)
+
+    def ImageModFrame(self,mode):
+        return self.encodeCommand(COMMAND.IMAGE_MOD_CHANGE, mode)
     
-    def gimbalTargetMsg(self,yaw,pitch):
-        data = Hexcon(yaw)+ Hexcon(pitch)
-        cmd_id = COMMAND.TargetAngle
-        return self.encodeMsg(data,cmd_id)
+    def gimbalTargetFrame(self,yaw,pitch):
+        """
+        Target angle msg. yaw and pitch are in degrees, like the target_angle schema, sent
+        with a resolution of 0.1 degree. Angles the frame cannot hold are clipped to it
+        """
+        low, high = _TARGET_ANGLE_LIMITS
+        return self.encodeCommand(COMMAND.TargetAngle, min(max(yaw, low), high), min(max(pitch, low), high))
    
-    def RangefinderStatusMsg(self):
-        data = ""
-        cmd_id = COMMAND.Range_finder_params_get
-        return self.encodeMsg(data, cmd_id)
-
-    def RangefinderStatusSendMsg(self,state):
-        data = toHex(state,8)
-        cmd_id = COMMAND.Range_finder_params_send
-        return self.encodeMsg(data, cmd_id)   
+    def RangefinderStatusFrame(self):
+        return self._constCommand(COMMAND.Range_finder_params_get)
+
+    def RangefinderStatusSendFrame(self,state):
+        return self.encodeCommand(COMMAND.Range_finder_params_send, state)
    
-    def ThermalGainMsg(self):
-        data = ""
-        cmd_id = COMMAND.Thermal_Gain_Get
-        return self.encodeMsg(data, cmd_id)
+    def ThermalGainFrame(self):
+        return self._constCommand(COMMAND.Thermal_Gain_Get)
     
-    def ThermalGainSendMsg(self,gain):
-        data = toHex(gain,8)
-        cmd_id = COMMAND.Thermal_Gain_Send
-        return self.encodeMsg(data, cmd_id)
-
-    def ThermalRAWDataMsg(self,mode):
-        data = toHex(mode,8)
-        cmd_id = COMMAND.Thermal_Raw_data
-        return self.encodeMsg(data, cmd_id)   
-   
-    def ThermalMAPMsg(self):
-        data = ""
-        cmd_id = COMMAND.Thermal_Map
-        return self.encodeMsg(data, cmd_id)
-
-    def ThermalParamsGetMsg(self):
-        data = ""
-        cmd_id = COMMAND.Thermal_Params_Get
-        return self.encodeMsg(data, cmd_id)
-
-    def ThermalParamsSendMsg(self,Dist,Ems,Hum,Ta,Tu):
-        data = Hexcon(Dist)+Hexcon(Ems)+Hexcon(Hum)+Hexcon(Ta)+Hexcon(Tu)
-        cmd_id = COMMAND.Thermal_Params_Send
-        return self.encodeMsg(data, cmd_id)   
+    def ThermalGainSendFrame(self,gain):
+        return self.encodeCommand(COMMAND.Thermal_Gain_Send, gain)
+
+    def ThermalRAWDataFrame(self,mode):
+        return self.encodeCommand(COMMAND.Thermal_Raw_data, mode)
    
-      
+    def ThermalMAPFrame(self):
+        return self._constCommand(COMMAND.Thermal_Map)
+
+    def ThermalParamsGetFrame(self):
+        return self._constCommand(COMMAND.Thermal_Params_Get)
+
+    def ThermalParamsSendFrame(self,Dist,Ems,Hum,Ta,Tu):
+        return self.encodeCommand(COMMAND.Thermal_Params_Send, Dist, Ems, Hum, Ta, Tu)
         
-    def gimbalSpeedMsg(self, yaw_speed, pitch_speed):
+    def gimbalSpeedFrame(self, yaw_speed, pitch_speed):
         if yaw_speed>100:
             yaw_speed=100
         if yaw_speed<-100:
@@ -506,11 +632,136 @@ class SIYIMESSAGE:
         if pitch_speed<-100:
             pitch_speed=-100
 
-        data1=toHex(yaw_speed, 8)
-        data2=toHex(pitch_speed, 8)
-        data=data1+data2
-        cmd_id = COMMAND.GIMBAL_ROT
-        return self.encodeMsg(data, cmd_id)
+        return self.encodeCommand(COMMAND.GIMBAL_ROT, yaw_speed, pitch_speed)
 
-    
+    def dataStreamFrame(self, data_type, freq):
+        """
+        Asks the gimbal to push data_type every 1/freq seconds
+
+        Params
+        --
+        - data_type [int] DATA_STREAM_TYPE value
+        - freq [int] Rate in Hz, one of DATA_STREAM_FREQS. 0 stops the stream
+        """
+        if freq not in DATA_STREAM_FREQS:
+            raise ValueError("Unsupported data stream rate %s Hz, use one of %s" %
+                             (freq, sorted(DATA_STREAM_FREQS)))
+        return self.encodeCommand(COMMAND.DATA_STREAM, data_type, DATA_STREAM_FREQS[freq])
+
+def _hexBuilder(frame_builder):
+    """
+    Returns a builder returning the frame of frame_builder as a hex string
+    """
+    def builder(self, *args):
+        return frame_builder(self, *args).hex()
+    builder.__name__ = frame_builder.__name__[:-len('Frame')]+'Msg'
+    builder.__qualname__ = frame_builder.__qualname__[:-len('Frame')]+'Msg'
+    builder.__doc__ = "Hex string of %s()" % frame_builder.__name__
+    return builder
+
+for _name, _builder in list(vars(SIYIMESSAGE).items()):
+    if _name.endswith('Frame') and _name not in ('encodeFrame', 'decodeFrame'):
+        setattr(SIYIMESSAGE, _name[:-len('Frame')]+'Msg', _hexBuilder(_builder))
+
+
+#############################################
+class FrameReassembler:
+    """
+    Incremental frame reassembler for datagram and stream transports.
 
+    Corrupted data is skipped by jumping to the next header, frames are validated in place
+    and only their payload is copied. On streams, bytes that do not complete a frame are
+    kept for the next feed(). Datagrams carry whole frames, so a header whose frame does not
+    fit in the datagram is corrupted and skipped, and nothing is kept
+    """
+    def __init__(self, max_data_len=MAX_DATA_LEN, datagram=False) -> None:
+        """
+        Params
+        --
+        - max_data_len [int] Longer data lengths are treated as a corrupted header
+        - datagram [bool] Each feed() is one datagram, e.g. UDP. False for streams, e.g. TCP
+        """
+        self._buf = bytearray()
+        self._max_data_len = max_data_len
+        self.datagram = datagram
+
+        self.frames = 0 # valid frames
+        self.crc_errors = 0
+        self.skipped_bytes = 0 # bytes dropped while looking for a header
+
+    def pending(self):
+        """
+        Number of buffered bytes waiting for the rest of a frame
+        """
+        return len(self._buf)
+
+    def reset(self):
+        self._buf.clear()
+
+    def feed(self, data):
+        """
+        Adds received bytes and extracts the complete frames
+
+        Returns
+        --
+        [list] (cmd_id [int], seq [int], data [bytes]) of each valid frame, in order
+        """
+        buf = self._buf
+        if buf:
+            buf += data
+            data = buf
+        frames = []
+        n = len(data)
+        pos = 0
+        mv = memoryview(data)
+        try:
+            while True:
+                # Jump to the next header
+                start = data.find(STX, pos)
+                if start<0:
+                    # Keep a trailing half header
+                    keep = 1 if n>pos and data[n-1]==0x55 and not self.datagram else 0
+                    self.skipped_bytes += n-keep-pos
+                    pos = n-keep
+                    break
+                self.skipped_bytes += start-pos
+                pos = start
+                if n-pos < MINIMUM_FRAME_LEN:
+                    if self.datagram:
+                        self.skipped_bytes += n-pos
+                        pos = n
+                    break
+
+                # Data length, bytes are reversed, according to SIYI SDK
+                data_len = data[pos+3] | (data[pos+4]<<8)
+                if data_len > self._max_data_len:
+                    self.skipped_bytes += 1
+                    pos += 1
+                    continue
+                end = pos+HEADER_LEN+data_len
+                if n < end+CRC_LEN:
+                    if self.datagram:
+                        # The frame cannot be in this datagram: corrupted length
+                        self.skipped_bytes += 1
+                        pos += 1
+                        continue
+                    # Wait for the rest of the frame
+                    break
+
+                if crc16(mv[pos:end]) != data[end] | (data[end+1]<<8):
+                    self.crc_errors += 1
+                    self.skipped_bytes += 1
+                    pos += 1
+                    continue
+
+                frames.append((data[pos+7], data[pos+5] | (data[pos+6]<<8), bytes(mv[pos+HEADER_LEN:end])))
+                pos = end+CRC_LEN
+        finally:
+            mv.release()
+
+        self.frames += len(frames)
+        if data is buf:
+            del buf[:pos]
+        elif pos<n:
+            buf += data[pos:]
+        return frames
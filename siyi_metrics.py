@@ -0,0 +1,203 @@
+"""
+Codec and transport metrics of the SIYI SDK
+
+Counters are plain integers incremented on the receive and send paths. Everything else
+(reassembler counters, queue depths, connection state, round trip times) is read when a
+snapshot is taken, so collecting costs nothing until someone looks.
+
+    cam.metrics()                    # snapshot dict
+    server = cam.serveMetrics(9108)  # http://127.0.0.1:9108/metrics in Prometheus text format
+    ...
+    server.close()
+"""
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from siyi_message import SCHEMAS
+
+
+def _commandName(cmd_id):
+    schema = SCHEMAS.get(cmd_id)
+    return schema.name if schema is not None else "%02x" % cmd_id
+
+
+class SDKMetrics:
+    """
+    Counters of one SIYISDK. The receive counters are written without locking by the one
+    thread that feeds the SDK. Any thread can send, so the send counters (frames_out,
+    bytes_out, send_errors) are incremented under send_lock
+    """
+    __slots__ = ('frames_in', 'frames_out', 'bytes_in', 'bytes_out', 'datagrams_in',
+                 'unknown_ids', 'parse_errors', 'send_errors', 'recv_errors', 'send_lock')
+
+    def __init__(self) -> None:
+        self.send_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.frames_in = [0]*256 # by CMD ID
+        self.frames_out = [0]*256
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.datagrams_in = 0
+        self.unknown_ids = 0 # frames without handler nor schema
+        self.parse_errors = 0 # handlers that failed
+        self.send_errors = 0
+        self.recv_errors = 0 # receive socket errors and receive thread exceptions, timeouts aside
+
+
+def snapshot(cam):
+    """
+    Returns
+    --
+    [dict] Counters and gauges of a SIYISDK
+    """
+    m = cam._metrics
+    reassembler = cam._reassembler
+    rtt = cam.stats()
+    hub = cam._hub
+    return {
+        'connected': bool(cam.isConnected()),
+        'frames_in': {_commandName(i): n for i, n in enumerate(m.frames_in) if n},
+        'frames_out': {_commandName(i): n for i, n in enumerate(m.frames_out) if n},
+        'datagrams_in': m.datagrams_in,
+        'bytes_in': m.bytes_in,
+        'bytes_out': m.bytes_out,
+        'crc_errors': reassembler.crc_errors,
+        'resync_skipped_bytes': reassembler.skipped_bytes,
+        'reassembler_pending_bytes': reassembler.pending(),
+        'unknown_ids': m.unknown_ids,
+        'parse_errors': m.parse_errors,
+        'send_errors': m.send_errors,
+        'recv_errors': m.recv_errors,
+        'recv_timeouts': rtt['total']['recv_timeouts'],
+        'requests_in_flight': len(cam._inflight),
+        'request_timeouts': rtt['total']['timeouts'],
+        'subscriber_inbox': hub.stats()['inbox'] if hub is not None else 0,
+        'subscriber_dropped': (hub.dropped+sum(sub.dropped for sub in hub.subscriptions())
+                               if hub is not None else 0),
+        'rtt': rtt['commands'],
+    }
+
+
+def _labels(**labels):
+    return "{%s}" % ",".join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                             for k, v in labels.items())
+
+# Prometheus name, type, help, snapshot key
+_SCALARS = (
+    ('siyi_connected', 'gauge', 'Camera answered the last connection check', 'connected'),
+    ('siyi_datagrams_received_total', 'counter', 'Datagrams received', 'datagrams_in'),
+    ('siyi_bytes_received_total', 'counter', 'Bytes received', 'bytes_in'),
+    ('siyi_bytes_sent_total', 'counter', 'Bytes sent', 'bytes_out'),
+    ('siyi_crc_errors_total', 'counter', 'Frames dropped on CRC mismatch', 'crc_errors'),
+    ('siyi_resync_skipped_bytes_total', 'counter', 'Bytes skipped looking for a frame header',
+     'resync_skipped_bytes'),
+    ('siyi_reassembler_pending_bytes', 'gauge', 'Bytes waiting for the rest of a frame',
+     'reassembler_pending_bytes'),
+    ('siyi_unknown_ids_total', 'counter', 'Frames of unknown command IDs', 'unknown_ids'),
+    ('siyi_parse_errors_total', 'counter', 'Frames whose handler failed', 'parse_errors'),
+    ('siyi_send_errors_total', 'counter', 'Failed sends', 'send_errors'),
+    ('siyi_recv_errors_total', 'counter', 'Receive thread errors', 'recv_errors'),
+    ('siyi_recv_timeouts_total', 'counter', 'Receive timeouts', 'recv_timeouts'),
+    ('siyi_requests_in_flight', 'gauge', 'Submitted requests waiting for a reply', 'requests_in_flight'),
+    ('siyi_request_timeouts_total', 'counter', 'Requests without reply', 'request_timeouts'),
+    ('siyi_subscriber_inbox', 'gauge', 'Messages waiting for the subscriber dispatcher', 'subscriber_inbox'),
+    ('siyi_subscriber_dropped_total', 'counter', 'Messages dropped for subscribers', 'subscriber_dropped'),
+)
+
+def prometheusText(cameras):
+    """
+    Renders the metrics of cameras in the Prometheus text exposition format
+
+    Params
+    --
+    - cameras: Iterable of SIYISDK
+
+    Returns
+    --
+    [str]
+    """
+    snapshots = [("%s:%s" % (cam._server_ip, cam._port), snapshot(cam)) for cam in cameras]
+    lines = []
+    for name, kind, text, key in _SCALARS:
+        lines.append("# HELP %s %s" % (name, text))
+        lines.append("# TYPE %s %s" % (name, kind))
+        for camera, snap in snapshots:
+            lines.append("%s%s %d" % (name, _labels(camera=camera), snap[key]))
+    for name, key, text in (('siyi_frames_received_total', 'frames_in', 'Frames received'),
+                            ('siyi_frames_sent_total', 'frames_out', 'Frames sent')):
+        lines.append("# HELP %s %s" % (name, text))
+        lines.append("# TYPE %s counter" % name)
+        for camera, snap in snapshots:
+            for command, n in snap[key].items():
+                lines.append("%s%s %d" % (name, _labels(camera=camera, command=command), n))
+    lines.append("# HELP siyi_rtt_seconds Request round trip time")
+    lines.append("# TYPE siyi_rtt_seconds summary")
+    for camera, snap in snapshots:
+        for command, entry in snap['rtt'].items():
+            rtt = entry['rtt_ms']
+            if not rtt['count']:
+                continue
+            for quantile, key in (('0.5', 'p50'), ('0.95', 'p95'), ('0.99', 'p99')):
+                lines.append("siyi_rtt_seconds%s %.6f" % (
+                    _labels(camera=camera, command=command, quantile=quantile), rtt[key]/1e3))
+            lines.append("siyi_rtt_seconds_sum%s %.6f" % (_labels(camera=camera, command=command),
+                                                         rtt['mean']*rtt['count']/1e3))
+            lines.append("siyi_rtt_seconds_count%s %d" % (_labels(camera=camera, command=command),
+                                                         rtt['count']))
+    return "\n".join(lines)+"\n"
+
+
+class MetricsServer:
+    def __init__(self, cameras, port=9108, host='127.0.0.1') -> None:
+        """
+        Serves GET /metrics on a daemon thread
+
+        Params
+        --
+        - cameras: SIYISDK, list of SIYISDK, or anything with cameras(), e.g. a SIYIFleet
+        - port [int] TCP port. 0 picks a free one, see address
+        - host [str] Interface to listen on. Local only by default
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._cameras = cameras
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                try:
+                    body = prometheusText(server.cameras()).encode()
+                except Exception as e:
+                    server._logger.error("Could not collect metrics: %s", e)
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                server._logger.debug(format, *args)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.address = self._httpd.server_address
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="SIYIMetrics", daemon=True)
+        self._thread.start()
+
+    def cameras(self):
+        cameras = self._cameras
+        if hasattr(cameras, 'cameras'):
+            return cameras.cameras()
+        if hasattr(cameras, '_metrics'):
+            return [cameras]
+        return list(cameras)
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,257 @@
+"""
+Subscriptions to received SIYI messages
+
+The receive thread only puts each message on one inbox queue, whatever the number of subscribers.
+A dispatcher thread copies it to the queue of every subscriber of its command ID, and a small
+worker pool runs the callbacks. A slow callback only fills its own queue.
+
+    def onAttitude(cmd_id, att):
+        print(att.yaw, att.pitch, att.roll)
+
+    sub = cam.subscribe(COMMAND.ACQUIRE_GIMBAL_ATT, onAttitude, policy=POLICY_LATEST)
+    ...
+    print(sub.delivered, sub.dropped)
+    sub.cancel()
+"""
+import logging
+import threading
+from collections import deque
+from queue import SimpleQueue
+from siyi_message import SCHEMAS, cmdId
+
+# What happens when a message arrives and the queue of a subscriber is full
+POLICY_LATEST = 'latest' # only the newest message is kept, older ones are dropped
+POLICY_DROP = 'drop' # the new message is dropped
+POLICY_BLOCK = 'block' # the dispatcher waits for room. Nothing is lost, but delivery to all
+                       # subscribers waits too. The receive thread never waits
+POLICIES = (POLICY_LATEST, POLICY_DROP, POLICY_BLOCK)
+
+TOPIC_ALL = '*'
+
+# Topic names are the schema names, e.g. 'gimbal_attitude'
+_TOPICS = {schema.name: cmd_id for cmd_id, schema in SCHEMAS.items()}
+
+
+def topicId(topic):
+    """
+    Returns the command ID of a topic: a command ID, a COMMAND hex string or a schema name.
+    None for TOPIC_ALL
+    """
+    if topic==TOPIC_ALL:
+        return None
+    if isinstance(topic, str) and topic in _TOPICS:
+        return _TOPICS[topic]
+    cmd_id = cmdId(topic)
+    if not 0 <= cmd_id < 256:
+        raise ValueError("CMD ID %s is out of range" % cmd_id)
+    return cmd_id
+
+
+class Subscription:
+    """
+    Queue and counters of one subscriber. Returned by SubscriptionHub.subscribe()
+    """
+    def __init__(self, hub, cmd_id, callback, queue_size, policy) -> None:
+        if policy not in POLICIES:
+            raise ValueError("Unknown policy %r, use one of %s" % (policy, ", ".join(POLICIES)))
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        self.cmd_id = cmd_id # None for all messages
+        self.callback = callback
+        self.policy = policy
+        self.queue_size = 1 if policy==POLICY_LATEST else queue_size
+
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0 # callbacks that raised
+
+        self._hub = hub
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._scheduled = False # queued for a worker or being run by one
+        self.active = True
+
+    def pending(self):
+        return len(self._queue)
+
+    def cancel(self):
+        self._hub.unsubscribe(self)
+
+    def _offer(self, item):
+        """
+        Adds a message to the queue, applying the policy. Returns True if the subscription
+        must be handed to a worker
+        """
+        with self._cond:
+            if len(self._queue) >= self.queue_size:
+                if self.policy==POLICY_LATEST:
+                    self._queue.popleft()
+                    self.dropped += 1
+                elif self.policy==POLICY_DROP:
+                    self.dropped += 1
+                    return False
+                else:
+                    while len(self._queue) >= self.queue_size and self.active:
+                        self._cond.wait()
+                    if not self.active:
+                        return False
+            self._queue.append(item)
+            if self._scheduled:
+                return False
+            self._scheduled = True
+            return True
+
+    def _run(self, batch):
+        """
+        Delivers up to batch messages. Returns True if messages are left
+        """
+        for _ in range(batch):
+            with self._cond:
+                if not self._queue or not self.active:
+                    self._scheduled = False
+                    return False
+                cmd_id, record = self._queue.popleft()
+                self._cond.notify()
+            try:
+                self.callback(cmd_id, record)
+            except Exception as e:
+                self.errors += 1
+                self._hub._logger.error("Subscriber %s failed: %s", self.callback, e)
+            else:
+                self.delivered += 1
+        return True
+
+    def __repr__(self) -> str:
+        return "Subscription(cmd_id=%s, policy=%r, delivered=%d, dropped=%d)" % (
+            self.cmd_id, self.policy, self.delivered, self.dropped)
+
+
+class SubscriptionHub:
+    def __init__(self, workers=2, inbox_size=4096, batch=32) -> None:
+        """
+
+        Params
+        --
+        - workers [int] Threads running the callbacks
+        - inbox_size [int] Messages waiting for the dispatcher. Newer ones are dropped and counted
+          in dropped when it is full, e.g. while a POLICY_BLOCK subscriber is stuck
+        - batch [int] Messages delivered to one subscriber before a worker moves to the next one
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._lock = threading.Lock()
+
+        # Subscriptions by CMD ID. Tuples are replaced, never modified, so publish()
+        # and the dispatcher read them without locking
+        self._subs = [()]*256
+        self._subs_all = ()
+
+        self._inbox = SimpleQueue()
+        self._inbox_size = inbox_size
+        self._ready = SimpleQueue()
+        self._batch = batch
+        self.dropped = 0
+
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatchLoop, name="SIYIDispatcher", daemon=True)
+        self._dispatcher.start()
+        self._workers = [threading.Thread(target=self._workerLoop, name="SIYISubscriber-%d" % i, daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def hasSubscribers(self, cmd_id):
+        return bool(self._subs[cmd_id] or self._subs_all)
+
+    def subscribe(self, topic, callback, queue_size=16, policy=POLICY_LATEST):
+        """
+        Calls callback(cmd_id, record) on a worker thread for every message of topic
+
+        Params
+        --
+        - topic: Command ID, COMMAND hex string, schema name such as 'gimbal_attitude',
+          or TOPIC_ALL for every message
+        - callback [callable] Receives the command ID and the state record of the message,
+          the decoded dict for generic messages, or the payload bytes for custom handlers
+        - queue_size [int] Messages kept for this subscriber. Always 1 with POLICY_LATEST
+        - policy [str] POLICY_LATEST, POLICY_DROP or POLICY_BLOCK
+
+        Returns
+        --
+        [Subscription]
+        """
+        cmd_id = topicId(topic)
+        sub = Subscription(self, cmd_id, callback, queue_size, policy)
+        with self._lock:
+            if cmd_id is None:
+                self._subs_all = self._subs_all+(sub,)
+            else:
+                self._subs[cmd_id] = self._subs[cmd_id]+(sub,)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            if sub.cmd_id is None:
+                self._subs_all = tuple(s for s in self._subs_all if s is not sub)
+            else:
+                self._subs[sub.cmd_id] = tuple(s for s in self._subs[sub.cmd_id] if s is not sub)
+        with sub._cond:
+            sub.active = False
+            sub._queue.clear()
+            sub._cond.notify_all()
+
+    def subscriptions(self):
+        with self._lock:
+            return [sub for subs in self._subs for sub in subs]+list(self._subs_all)
+
+    def publish(self, cmd_id, record):
+        """
+        Queues a message for its subscribers. Never blocks
+        """
+        if self._inbox.qsize() >= self._inbox_size:
+            self.dropped += 1
+            return False
+        self._inbox.put((cmd_id, record))
+        return True
+
+    def _dispatchLoop(self):
+        while True:
+            item = self._inbox.get()
+            if item is None:
+                break
+            for sub in self._subs[item[0]]+self._subs_all:
+                if sub._offer(item):
+                    self._ready.put(sub)
+
+    def _workerLoop(self):
+        while True:
+            sub = self._ready.get()
+            if sub is None:
+                break
+            if sub._run(self._batch):
+                self._ready.put(sub) # more messages, let other subscribers run first
+
+    def stats(self):
+        """
+        Returns
+        --
+        [dict] inbox size, messages dropped at the inbox, and per subscription:
+        cmd_id, policy, delivered, dropped, errors, pending
+        """
+        return {'inbox': self._inbox.qsize(),
+                'dropped': self.dropped,
+                'subscriptions': [{'cmd_id': sub.cmd_id, 'policy': sub.policy, 'delivered': sub.delivered,
+                                   'dropped': sub.dropped, 'errors': sub.errors, 'pending': sub.pending()}
+                                  for sub in self.subscriptions()]}
+
+    def close(self, timeout=1.0):
+        if self._closed:
+            return
+        self._closed = True
+        for sub in self.subscriptions():
+            self.unsubscribe(sub)
+        self._inbox.put(None)
+        for _ in self._workers:
+            self._ready.put(None)
+        self._dispatcher.join(timeout)
+        for worker in self._workers:
+            worker.join(timeout)
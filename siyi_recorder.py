@@ -0,0 +1,266 @@
+"""
+Binary recorder and replay of SIYI camera traffic
+
+Received datagrams and sent frames are appended to a file with their time.monotonic() stamp,
+by a background thread, so recording never waits for the disk on the receive path.
+
+    cam.startRecording("flight.siyirec")
+    ...
+    cam.stopRecording()
+
+    # Later, e.g. to reproduce an incident or benchmark the parsers
+    cam = SIYISDK()
+    cam.replay("flight.siyirec", speed=None)  # as fast as possible, 1.0 for real time
+
+File layout, little endian:
+    header: magic b'SIYIREC\\0', version u16, reserved u16, wall clock start f64, monotonic start f64
+    record: monotonic stamp f64, direction u8 (RX or TX), length u16, raw bytes
+
+A file cut short by a crash is read up to its last complete record.
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+from queue import SimpleQueue, Empty
+from time import monotonic, time, sleep
+
+MAGIC = b'SIYIREC\0'
+VERSION = 1
+_HEADER = struct.Struct('<8sHHdd')
+_RECORD = struct.Struct('<dBH')
+HEADER_LEN = _HEADER.size
+RECORD_HEADER_LEN = _RECORD.size
+
+# Directions of the recorded bytes
+RX = 0 # received datagram
+TX = 1 # sent frame
+
+
+class FrameRecorder:
+    def __init__(self, path, max_pending=64*1024*1024, flush_interval=1.0) -> None:
+        """
+        Creates or replaces path. Records are only ever appended after its header
+
+        Params
+        --
+        - path [str] Recording file
+        - max_pending [int] Bytes waiting for the writer thread. Newer records are dropped
+          and counted in dropped when the disk cannot keep up
+        - flush_interval [float] Seconds between flushes to the operating system
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.path = path
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.records = 0
+        self.bytes = 0
+        self.dropped = 0
+        self.error = None # OSError that stopped the writer thread, e.g. a full disk
+
+        self._file = open(path, 'wb', buffering=1 << 20)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, 0, time(), monotonic()))
+
+        self._queue = SimpleQueue()
+        self._lock = threading.Lock()
+        self._pending = 0 # bytes queued, not written yet
+        self._closed = False
+        self._thread = threading.Thread(target=self._writeLoop, name="SIYIRecorder", daemon=True)
+        self._thread.start()
+
+    def record(self, direction, data, stamp=None):
+        """
+        Queues bytes for writing. Never blocks
+
+        Params
+        --
+        - direction [int] RX or TX
+        - data [bytes] Raw datagram or frame
+        - stamp [float] time.monotonic() time, now if None
+
+        Returns
+        --
+        [bool] False if the record was dropped
+        """
+        if self._closed or self.error is not None:
+            return False
+        n = len(data)
+        with self._lock:
+            if n > 0xffff or self._pending+n > self.max_pending:
+                self.dropped += 1
+                return False
+            self._pending += n
+        self._queue.put(_RECORD.pack(monotonic() if stamp is None else stamp, direction, n)+bytes(data))
+        return True
+
+    def _writeLoop(self):
+        write = self._file.write
+        next_flush = monotonic()+self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except Empty:
+                item = b''
+            # Write everything that is waiting in one go
+            items = [item]
+            try:
+                while True:
+                    items.append(self._queue.get_nowait())
+            except Empty:
+                pass
+            stop = None in items
+            size = 0
+            try:
+                for item in items:
+                    if item:
+                        write(item)
+                        size += len(item)-RECORD_HEADER_LEN
+                        self.records += 1
+                if stop or monotonic() >= next_flush:
+                    self._file.flush()
+                    next_flush = monotonic()+self.flush_interval
+            except (OSError, ValueError) as e:
+                self.error = e
+                self._logger.error("Recording to %s stopped: %s", self.path, e)
+                stop = True
+            self.bytes += size
+            with self._lock:
+                self._pending = 0 if self.error is not None else self._pending-size
+            if stop:
+                break
+        # The file is only closed here, after the last write, even if close() stopped waiting
+        try:
+            self._file.close()
+        except OSError as e:
+            if self.error is None:
+                self.error = e
+
+    def close(self, timeout=5.0):
+        """
+        Writes what is queued and closes the file. If the writer thread is still busy after
+        timeout seconds, it finishes and closes the file in the background
+
+        Raises
+        --
+        OSError if the recording could not be written completely, see error
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            self._logger.warning("Recording to %s still has %d bytes to write, finishing in the background",
+                                 self.path, self._pending)
+            return
+        if self.error is not None:
+            raise self.error
+
+    def stats(self):
+        return {'records': self.records, 'bytes': self.bytes, 'dropped': self.dropped,
+                'pending_bytes': self._pending, 'error': None if self.error is None else str(self.error)}
+
+
+class RecordingReader:
+    def __init__(self, path) -> None:
+        """
+        Memory-maps a recording. Records are read on iteration, so files of hours of traffic
+        do not need to fit in memory
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < HEADER_LEN:
+            self._file.close()
+            raise ValueError("%s is not a SIYI recording" % path)
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, _, self.wall_start, self.mono_start = _HEADER.unpack_from(self._mm, 0)
+        if magic!=MAGIC:
+            self.close()
+            raise ValueError("%s is not a SIYI recording" % path)
+        if self.version > VERSION:
+            self.close()
+            raise ValueError("Recording version %d is not supported" % self.version)
+
+    def __iter__(self):
+        """
+        Yields (monotonic stamp, direction, bytes) of each record, in file order
+        """
+        mm = self._mm
+        size = len(mm)
+        offset = HEADER_LEN
+        unpack = _RECORD.unpack_from
+        while offset+RECORD_HEADER_LEN <= size:
+            stamp, direction, n = unpack(mm, offset)
+            start = offset+RECORD_HEADER_LEN
+            if start+n > size:
+                break # cut short
+            yield stamp, direction, mm[start:start+n]
+            offset = start+n
+
+    def records(self, direction=None):
+        """
+        Like iteration, keeping only one direction if given
+        """
+        for record in self:
+            if direction is None or record[1]==direction:
+                yield record
+
+    def data(self, direction=RX):
+        """
+        Returns the bytes of all records of direction concatenated, e.g. the received byte
+        stream for batch decoding
+        """
+        return b''.join(record[2] for record in self.records(direction))
+
+    def wallTime(self, stamp):
+        """
+        Converts a record stamp to wall clock time
+        """
+        return self.wall_start+(stamp-self.mono_start)
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def replay(cam, path, speed=1.0, direction=RX):
+    """
+    Pushes recorded datagrams through cam.feedBuffer(), the decode and dispatch path of live
+    traffic. State records, subscribers and the attitude history see them as if they were
+    received now, so their stamps are replay times
+
+    Params
+    --
+    - cam [SIYISDK] Camera to feed. It does not need to be connected
+    - path [str] Recording file
+    - speed [float] 1.0 keeps the recorded timing, 2.0 is twice as fast.
+      None or 0 feeds as fast as possible
+    - direction [int] Records to feed, RX by default
+
+    Returns
+    --
+    [int] Number of records fed
+    """
+    fed = 0
+    with RecordingReader(path) as reader:
+        t0 = first = None
+        for stamp, rec_direction, data in reader:
+            if rec_direction!=direction:
+                continue
+            if speed:
+                if first is None:
+                    first, t0 = stamp, monotonic()
+                delay = t0+(stamp-first)/speed-monotonic()
+                if delay > 0.:
+                    sleep(delay)
+            cam.feedBuffer(data)
+            fed += 1
+    return fed
@@ -0,0 +1,133 @@
+"""
+Declarative payload schemas of SIYI messages
+
+A schema is a list of fields, each one (name, struct format) or (name, struct format, scale).
+Scale is the divisor used by the SDK, e.g. 10. for angles sent as tenths of degrees:
+    decoded value = raw/scale
+    raw = round(value*scale)
+Multi-byte fields are little endian, according to SIYI SDK
+"""
+import struct
+
+def _makeScaler(scales):
+    """
+    Returns a function applying the scale factors to an unpacked tuple.
+    None if there is nothing to scale
+    """
+    if all(s==1 for s in scales):
+        return None
+    scales = tuple(float(s) if s!=1 else None for s in scales)
+
+    def scale(raw):
+        return tuple(r if s is None else r/s for r, s in zip(raw, scales))
+    return scale
+
+def _makeRawer(scales):
+    """
+    Returns a function converting engineering values to raw integers.
+    None if there is nothing to scale
+    """
+    if all(s==1 for s in scales):
+        return None
+    scales = tuple(float(s) if s!=1 else None for s in scales)
+
+    def rawer(values):
+        return tuple(v if s is None else int(round(v*s)) for v, s in zip(values, scales))
+    return rawer
+
+
+class MessageSchema:
+    """
+    Payload layout of one message direction, with precompiled struct encoder and decoder
+    """
+    def __init__(self, name, fields) -> None:
+        self.name = name
+        self.fields = tuple(tuple(f) for f in fields)
+        self.names = tuple(f[0] for f in self.fields)
+        self.formats = tuple(f[1] for f in self.fields)
+        self.scales = tuple(f[2] if len(f)>2 else 1 for f in self.fields)
+
+        self._struct = struct.Struct('<'+''.join(self.formats))
+        self.size = self._struct.size
+
+        self._scaler = _makeScaler(self.scales)
+        self._rawer = _makeRawer(self.scales)
+
+    def decode(self, buf, offset=0):
+        """
+        Decodes the payload with a single unpack_from. Extra trailing bytes are ignored
+
+        Returns
+        --
+        [tuple] Field values, scaled. Raises struct.error if buf is too short
+        """
+        raw = self._struct.unpack_from(buf, offset)
+        if self._scaler is None:
+            return raw
+        return self._scaler(raw)
+
+    def decodeDict(self, buf, offset=0):
+        return dict(zip(self.names, self.decode(buf, offset)))
+
+    def encode(self, *values):
+        """
+        Encodes field values, in engineering units, into payload bytes.
+        Raises struct.error if a value does not fit its field, instead of wrapping it
+        """
+        if len(values)!=len(self.names):
+            raise ValueError("%s expects %d values (%s), got %d" %
+                             (self.name, len(self.names), ", ".join(self.names), len(values)))
+        if self._rawer is not None:
+            values = self._rawer(values)
+        try:
+            return self._struct.pack(*values)
+        except struct.error:
+            # Name the offending field
+            for name, fmt, value in zip(self.names, self.formats, values):
+                try:
+                    struct.pack('<'+fmt, value)
+                except struct.error as e:
+                    raise struct.error("%s.%s=%r: %s" % (self.name, name, value, e)) from None
+            raise
+
+    def __repr__(self) -> str:
+        return "MessageSchema(%r, %r)" % (self.name, self.fields)
+
+
+class CommandSchema:
+    """
+    Request and response schemas of one command ID. None if the direction does not exist
+    """
+    __slots__ = ('cmd_id', 'name', 'request', 'response')
+
+    def __init__(self, cmd_id, name, request=None, response=None) -> None:
+        self.cmd_id = cmd_id
+        self.name = name
+        self.request = MessageSchema(name+'_request', request) if request is not None else None
+        self.response = MessageSchema(name+'_response', response) if response is not None else None
+
+
+class SchemaRegistry(dict):
+    """
+    Command schemas indexed by integer command ID
+    """
+    def register(self, cmd_id, name, request=None, response=None):
+        """
+        Adds or replaces the schema of a command ID
+
+        Params
+        --
+        - cmd_id [int] Command ID. Hex strings are accepted too
+        - name [str] Name of the command
+        - request [list] Request fields. None if the SDK never sends this command
+        - response [list] Response fields. None if the camera does not reply
+
+        Returns
+        --
+        [CommandSchema]
+        """
+        if isinstance(cmd_id, str):
+            cmd_id = int(cmd_id, 16)
+        schema = CommandSchema(cmd_id, name, request, response)
+        self[cmd_id] = schema
+        return schema
@@ -1,19 +1,189 @@
 import socket
 from siyi_message import *
-from time import sleep, time
+from time import sleep, time, monotonic
 import logging
-from utils import  toInt
 import threading
+import heapq
+from collections import deque
+from itertools import count
+from siyi_stats import RTTTracker, enableKernelTimestamps, recvWithTimestamp
+from siyi_metrics import SDKMetrics, MetricsServer, snapshot as metricsSnapshot
+from siyi_pubsub import SubscriptionHub, POLICY_LATEST, POLICY_DROP, POLICY_BLOCK, TOPIC_ALL
+from siyi_trace import traced
+from siyi_recorder import FrameRecorder, replay as replayRecording, RX, TX
+from siyi_shm import TelemetryPublisher
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+
+# Default reply waiting policy of the get functions
+REPLY_TIMEOUT = 1.0 # seconds per attempt
+REPLY_RETRIES = 2
+# Seconds the receive thread waits after a socket error, so a failing socket does not spin it
+RECV_ERROR_BACKOFF = 0.1
+
+
+def _response(cmd_id):
+    return SCHEMAS[cmdId(cmd_id)].response
+
+_DEVICE = _response(COMMAND.ACQUIRE_DEVICE_INF)
+_AUTO_FOCUS = _response(COMMAND.AUTO_FOCUS)
+_MOTION_MODE = _response(COMMAND.ACQUIRE_GIMBAL_MOUTION)
+_CENTER = _response(COMMAND.CENTER)
+_ZOOM = _response(COMMAND.MANUAL_ZOOM)
+_ATTITUDE = _response(COMMAND.ACQUIRE_GIMBAL_ATT)
+_GIMBAL_SPEED = _response(COMMAND.GIMBAL_ROT)
+_MAX_MIN_TEMP = _response(COMMAND.Max_Min_Temp)
+_RANGE_FINDER = _response(COMMAND.RANGE_FİNDER)
+_BOX_TEMP = _response(COMMAND.BOX_TEMP)
+_POINT_TEMP = _response(COMMAND.POINT_TEMP)
+_COLOR_MAP = _response(COMMAND.INF_COLOR_MAP)
+_IMAGE_MODE = _response(COMMAND.IMAGE_MOD)
+_TARGET_ANGLE = _response(COMMAND.TargetAngle)
+_THERMAL_RAW_DATA = _response(COMMAND.Thermal_Raw_data)
+_THERMAL_MAP = _response(COMMAND.Thermal_Map)
+_THERMAL_GAIN = _response(COMMAND.Thermal_Gain_Get)
+_THERMAL_GAIN_SEND = _response(COMMAND.Thermal_Gain_Send)
+_THERMAL_PARAMS = _response(COMMAND.Thermal_Params_Get)
+_THERMAL_PARAMS_SEND = _response(COMMAND.Thermal_Params_Send)
+_RANGE_FINDER_STATUS = _response(COMMAND.Range_finder_params_get)
+_RANGE_FINDER_STATUS_SEND = _response(COMMAND.Range_finder_params_send)
+_DATA_STREAM = _response(COMMAND.DATA_STREAM)
+
+
+class _Pending:
+    __slots__ = ('seq', 'cmd_id', 'future', 'sent', 'deadline')
+
+    def __init__(self, seq, cmd_id, future, sent, deadline) -> None:
+        self.seq = seq
+        self.cmd_id = cmd_id
+        self.future = future
+        self.sent = sent
+        self.deadline = deadline
+
+class InFlightRequests:
+    """
+    Requests waiting for their reply, indexed by sequence number.
+    A reply is matched by its seq when the camera echoes it, otherwise it goes to
+    the oldest request of the same command ID
+    """
+    def __init__(self, timeout=REPLY_TIMEOUT) -> None:
+        self.timeout = timeout
+        self.timeouts = 0 # number of requests expired without reply
+
+        self._lock = threading.Lock()
+        self._by_seq = {}
+        self._by_cmd = {} # cmd_id: deque of _Pending, in send order
+        # (deadline, order, _Pending) of all requests. Timeouts differ per request, so the
+        # oldest request of a command is not always the first to expire. Entries of
+        # answered requests are skipped when they come out
+        self._deadlines = []
+        self._order = count()
+
+    def __len__(self):
+        return len(self._by_seq)
+
+    def add(self, seq, cmd_id, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        now = monotonic()
+        pending = _Pending(seq, cmd_id, Future(), now, now+timeout)
+        with self._lock:
+            old = self._by_seq.get(seq)
+            if old is not None:
+                # Sequence numbers wrapped around while a request was still waiting
+                self._remove(old)
+            self._by_seq[seq] = pending
+            self._by_cmd.setdefault(cmd_id, deque()).append(pending)
+            heapq.heappush(self._deadlines, (pending.deadline, next(self._order), pending))
+        if old is not None:
+            self._complete(old, exception=TimeoutError("Sequence number %d reused" % seq))
+        return pending.future
+
+    def _remove(self, pending):
+        del self._by_seq[pending.seq]
+        self._by_cmd[pending.cmd_id].remove(pending)
+        if not self._by_seq:
+            self._deadlines.clear()
+
+    def _complete(self, pending, result=None, exception=None):
+        try:
+            if exception is None:
+                pending.future.set_result(result)
+            else:
+                pending.future.set_exception(exception)
+        except InvalidStateError:
+            # Cancelled by the caller
+            pass
+
+    def resolve(self, cmd_id, seq, result):
+        """
+        Completes the request answered by a reply
+
+        Returns
+        --
+        [_Pending] The matched request. None if nothing was waiting for this reply
+        """
+        with self._lock:
+            pending = self._by_seq.get(seq)
+            if pending is None or pending.cmd_id != cmd_id:
+                queue = self._by_cmd.get(cmd_id)
+                if not queue:
+                    return None
+                pending = queue[0]
+            self._remove(pending)
+        self._complete(pending, result)
+        return pending
+
+    def fail(self, seq, exception):
+        with self._lock:
+            pending = self._by_seq.get(seq)
+            if pending is None:
+                return
+            self._remove(pending)
+        self._complete(pending, exception=exception)
+
+    def expire(self, now=None):
+        """
+        Fails the requests whose deadline has passed with TimeoutError
+        """
+        if not self._by_seq:
+            return 0
+        if now is None:
+            now = monotonic()
+        expired = []
+        with self._lock:
+            deadlines = self._deadlines
+            while deadlines and deadlines[0][0] <= now:
+                pending = heapq.heappop(deadlines)[2]
+                if self._by_seq.get(pending.seq) is pending:
+                    self._remove(pending)
+                    expired.append(pending)
+        self.timeouts += len(expired)
+        for pending in expired:
+            self._complete(pending, exception=TimeoutError("No reply to CMD ID %02x" % pending.cmd_id))
+        return len(expired)
+
+    def cancelAll(self):
+        with self._lock:
+            pendings = list(self._by_seq.values())
+            self._by_seq.clear()
+            self._by_cmd.clear()
+            self._deadlines.clear()
+        for pending in pendings:
+            pending.future.cancel()
 
 
 class SIYISDK:
-    def __init__(self, server_ip="192.168.144.25", port=37260, debug=False):
+    def __init__(self, server_ip="192.168.144.25", port=37260, debug=False, sock=None):
         """
         
         Params
         --
         - server_ip [str] IP address of the camera
         - port: [int] UDP port of the camera
+        - sock: Transport used instead of a new UDP socket. Anything with
+          sendto(data, addr), e.g. a shared socket, an asyncio DatagramTransport or
+          a siyi_gateway.GatewaySocket to share the camera with other processes.
+          Received data is then passed to feedBuffer() by the owner of the transport
         """
         self._debug= debug # print debug messages
         if self._debug:
@@ -25,19 +195,25 @@ class SIYISDK:
         self._logger = logging.getLogger(self.__class__.__name__)
 
         # Message sent to the camera
-        self._out_msg = SIYIMESSAGE(debug=self._debug)
+        self._out_msg = SIYIMESSAGE(debug=self._debug, use_seq=True)
         
         # Message received from the camera
         self._in_msg = SIYIMESSAGE(debug=self._debug)        
+        self._reassembler = FrameReassembler()
 
         self._server_ip = server_ip
         self._port = port
 
         self._BUFF_SIZE=1024
 
-        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self._rcv_wait_t = 5 # Receiving wait time
-        self._socket.settimeout(self._rcv_wait_t)
+        if sock is None:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.settimeout(self._rcv_wait_t)
+        else:
+            self._socket = sock
+        # Only stream transports split frames across reads
+        self._reassembler.datagram = getattr(self._socket, 'type', None)!=socket.SOCK_STREAM
 
         self._connected = False
 
@@ -61,17 +237,94 @@ class SIYISDK:
         self._thermal_gain_msg = ThermalGain()
         self._thermal_params_msg= ThermalParams()
         self._rangefinder_params_msg = RangeFinderParams()
+        self._data_stream_msg = DataStreamMsg()
+
+        # Rates in Hz of the data streams acknowledged by the gimbal, by DATA_STREAM_TYPE
+        self._streams = {}
+
+        # Sequence number of the last request sent, by CMD ID, and whether a reply
+        # carried it back. Only then replies can be told from pushed frames
+        self._sent_seqs = [None]*256
+        self._seq_echoed = False
+
+        # Conditions notified on replies, indexed by CMD ID. Created on first wait
+        self._reply_conds = [None]*256
+        self._reply_conds_lock = threading.Lock()
+
+        # Decoded messages of commands without a handler, see getMsg()
+        self._generic_msgs = {}
+
+        # Handlers of the received messages, indexed by CMD ID, and the
+        # state record each one updates
+        self._handlers = [None]*256
+        self._reply_attrs = [None]*256
+        for cmd_id, parser, attr in (
+                (COMMAND.ACQUIRE_DEVICE_INF, self.parseDevicemsg, '_fw_msg'),
+                (COMMAND.AUTO_FOCUS, self.parseAutoFocusMsg, '_autoFocus_msg'),
+                (COMMAND.CENTER, self.parseGimbalCenterMsg, '_center_msg'),
+                (COMMAND.ACQUIRE_GIMBAL_MOUTION, self.parseMoutionModeMsg, '_gmm_msg'),
+                (COMMAND.MANUAL_ZOOM, self.parseZoomMsg, '_manualZoom_msg'),
+                (COMMAND.ACQUIRE_GIMBAL_ATT, self.parseAttitudeMsg, '_att_msg'),
+                (COMMAND.Max_Min_Temp, self.parsTempratureMsg, '_temp_msg'),
+                (COMMAND.BOX_TEMP, self.parseBoxTempratureMsg, '_box_temp_msg'),
+                (COMMAND.RANGE_FİNDER, self.parseRangeFinderMsg, '_rangefinder_msg'),
+                (COMMAND.GIMBAL_ROT, self.parseGimbalSpeedMsg, '_gimbalSpeed_msg'),
+                (COMMAND.POINT_TEMP, self.parsePointTempratureMsg, '_point_temp_msg'),
+                (COMMAND.INF_COLOR_MAP, self.parseColorMapMsg, '_color_map_msg'),
+                (COMMAND.COLOR_MAP, self.parseColorMapMsg, '_color_map_msg'),
+                (COMMAND.IMAGE_MOD, self.parseImageModMsg, '_image_mod_msg'),
+                (COMMAND.IMAGE_MOD_CHANGE, self.parseImageModMsg, '_image_mod_msg'),
+                (COMMAND.TargetAngle, self.parseTargetAngleMsg, '_target_rotation_msg'),
+                (COMMAND.Thermal_Raw_data, self.parseThermalRawdataMsg, '_thermal_rawdata_msg'),
+                (COMMAND.Thermal_Map, self.parseThermalMapMsg, '_thermal_tempmap_msg'),
+                (COMMAND.Thermal_Gain_Get, self.parseThermalGainGetMsg, '_thermal_gain_msg'),
+                (COMMAND.Thermal_Gain_Send, self.parseThermalGainSendMsg, '_thermal_gain_msg'),
+                (COMMAND.Thermal_Params_Get, self.parseThermalParamsGetMsg, '_thermal_params_msg'),
+                (COMMAND.Thermal_Params_Send, self.parseThermalParamsSendMsg, '_thermal_params_msg'),
+                (COMMAND.Range_finder_params_get, self.parseRangefinderparamsgetMsg, '_rangefinder_params_msg'),
+                (COMMAND.Range_finder_params_send, self.parseRangefinderparamssendMsg, '_rangefinder_params_msg'),
+                (COMMAND.DATA_STREAM, self.parseDataStreamMsg, '_data_stream_msg')):
+            self.registerHandler(cmd_id, parser)
+            self._reply_attrs[cmdId(cmd_id)] = attr
+
+        # Attitude samples kept for interpolation, see enableAttitudeHistory()
+        self._att_history = None
+
+        # Subscribers of received messages, created on first subscribe()
+        self._hub = None
+        self._subscriber_workers = 2
+
+        # Round trip times of all requests, see stats()
+        self._rtt = RTTTracker(REPLY_TIMEOUT)
+        self._kernel_stamps = False
+        self._recv_timeouts = 0 # recvfrom() timeouts of the receive thread
+        # Codec and transport counters, see metrics()
+        self._metrics = SDKMetrics()
+        # Recorder of the raw traffic, see startRecording()
+        self._recorder = None
+        # Shared memory snapshot of the latest telemetry, see publishTelemetry()
+        self._telemetry = None
+        # Tracer of the hot path and the handlers it replaced, see setTracer()
+        self._tracer = None
+        self._traced_handlers = None
+
+        # Requests waiting for their reply, see submit()
+        self._inflight = InFlightRequests(REPLY_TIMEOUT)
+        self._submit_lock = threading.Lock()
 
-        
         self._last_att_seq=-1
 
+        # Engine driving this camera instead of the threads below, see connect()
+        self._engine = None
+        self._engine_timers = []
+
         # Stop threads
         self._stop = False # used to stop the above thread
         
         self._recv_thread = threading.Thread(target=self.recvLoop)
 
         # Connection thread
-        self._last_fw_seq=0 # used to check on connection liveness
+        self._last_fw_stamp=0.0 # used to check on connection liveness
         self._conn_loop_rate = 1 # seconds
         self._conn_thread = threading.Thread(target=self.connectionLoop, args=(self._conn_loop_rate,))
 
@@ -110,10 +363,30 @@ class SIYISDK:
         self._thermal_gain_msg = ThermalGain()
         self._thermal_params_msg= ThermalParams()
         self._rangefinder_params_msg = RangeFinderParams()    
+        self._data_stream_msg = DataStreamMsg()
+        self._streams = {}
+        self._reassembler.reset()
+        self._inflight.cancelAll()
 
         return True
 
-    def connect(self, maxWaitTime=3.0):
+    def connect(self, maxWaitTime=3.0, engine=None):
+        """
+        Starts receiving and polling the camera, then waits until it answers
+
+        Params
+        --
+        - maxWaitTime [float] Seconds to wait for the camera
+        - engine [SelectorEngine] If given, the socket and the periodic requests are driven by
+          this engine instead of four threads. The engine is started if it is not running.
+          Many cameras can share one engine
+
+        Returns
+        --
+        [bool] True if the camera answered
+        """
+        if engine is not None:
+            return self._connectEngine(maxWaitTime, engine)
         self._recv_thread.start()
         self._conn_thread.start()
         t0 = time()
@@ -127,18 +400,51 @@ class SIYISDK:
                 self._logger.error("Failed to connect to camera")
                 return False
 
+    def _connectEngine(self, maxWaitTime, engine):
+        self._engine = engine
+        self._stop = False
+        engine.addReader(self._socket, self.bufferCallback)
+        self._engine_timers = [
+            engine.callEvery(self._conn_loop_rate, self._connectionTick),
+            engine.callEvery(self._gimbal_info_loop_rate, self._gimbalInfoTick),
+            engine.callEvery(self._gimbal_att_loop_rate, self._gimbalAttTick)]
+        engine.start()
+        t0 = monotonic()
+        while not self._connected:
+            if monotonic()-t0 > maxWaitTime:
+                self.disconnect()
+                self._logger.error("Failed to connect to camera")
+                return False
+            sleep(0.01)
+        return True
+
     def disconnect(self):
         self._logger.info("Stopping all threads")
         self._stop = True # stop the connection checking thread
+        if self._engine is not None:
+            for timer in self._engine_timers:
+                timer.cancel()
+            self._engine.removeReader(self._socket)
+            self._engine_timers = []
+            self._engine = None
         self.resetVars()
 
     def checkConnection(self):
 
+        self._inflight.expire()
         self.requestFirmwareVersion()
         sleep(0.1)
-        if self._fw_msg.seq!=self._last_fw_seq and len(self._fw_msg.gimbal_firmware_ver)>0:
+        self._updateConnection()
+
+    def _updateConnection(self):
+        """
+        Connected if a firmware reply arrived since the previous check
+        """
+        if self._stop:
+            return
+        if self._fw_msg.stamp!=self._last_fw_stamp:
             self._connected = True
-            self._last_fw_seq=self._fw_msg.seq
+            self._last_fw_stamp=self._fw_msg.stamp
         else:
             self._connected = False
 
@@ -152,6 +458,31 @@ class SIYISDK:
             self.checkConnection()
             sleep(t)
 
+    def _connectionTick(self):
+        """
+        checkConnection() for the engine. The reply is checked by a timer instead of sleep()
+        """
+        self._inflight.expire()
+        self.requestFirmwareVersion()
+        self._engine.callLater(0.1, self._updateConnection)
+
+    def _gimbalInfoTick(self):
+        if self._connected:
+            self.requestFirmwareVersion()
+
+    def _gimbalAttTick(self):
+        if self._connected:
+            self._pollAttitude()
+
+    def _pollAttitude(self):
+        """
+        Requests the attitude, unless the gimbal pushes it and pushed frames keep arriving
+        """
+        freq = self._streams.get(DATA_STREAM_TYPE.ATTITUDE)
+        if freq and monotonic()-self._att_msg.stamp < max(0.5, 5./freq):
+            return True
+        return self.requestGimbalAttitude()
+
     def isConnected(self):
         return self._connected
 
@@ -168,23 +499,114 @@ class SIYISDK:
             if not self._connected:
                 self._logger.warning("Gimbal attitude thread is stopped. Check connection")
                 break
-            self.requestGimbalAttitude()
+            self._pollAttitude()
             sleep(t)
 
     def sendMsg(self, msg):
-        b = bytes.fromhex(msg)
+        """
+        Sends an encoded frame to the camera
+
+        Params
+        --
+        - msg [bytes] Encoded frame. Hex strings are accepted too
+        """
+        if isinstance(msg, str):
+            b = bytes.fromhex(msg)
+        else:
+            b = msg
+        metrics = self._metrics
+        if len(b) >= MINIMUM_FRAME_LEN:
+            # Stamped before sending, the reply can be faster than the return of sendto
+            seq = b[5] | b[6] << 8
+            self._sent_seqs[b[7]] = seq
+            self._rtt.sent(b[7], seq, monotonic(), time() if self._kernel_stamps else None)
+            with metrics.send_lock:
+                metrics.frames_out[b[7]] += 1
         try:
             self._socket.sendto(b, (self._server_ip, self._port))
+            with metrics.send_lock:
+                metrics.bytes_out += len(b)
+            recorder = self._recorder
+            if recorder is not None:
+                recorder.record(TX, b)
             return True
         except Exception as e:
-            self._logger.error("Could not send bytes")
+            with metrics.send_lock:
+                metrics.send_errors += 1
+            self._logger.error("Could not send bytes: %s", e)
             return False
 
+    def _replyCond(self, cmd_id):
+        """
+        Returns the condition notified when a reply of cmd_id is handled
+        """
+        cond = self._reply_conds[cmd_id]
+        if cond is None:
+            with self._reply_conds_lock:
+                cond = self._reply_conds[cmd_id]
+                if cond is None:
+                    cond = self._reply_conds[cmd_id] = threading.Condition()
+        return cond
+
+    def _requestReply(self, attr, cmd_id, request, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        """
+        Sends a request once and blocks until the receive thread stores a reply to it in attr.
+        The request is sent again on timeout, up to retries times. Records received before
+        the request was sent are not replies to it. Once the camera is known to echo sequence
+        numbers, records of other seqs, e.g. pushed data streams, are not either
+
+        Params
+        --
+        - attr [str] Name of the state record updated by the reply, e.g. '_att_msg'
+        - cmd_id: Command ID of the reply
+        - request [callable] Sends the request, returns False on failure
+        - timeout [float] Seconds to wait for each attempt
+        - retries [int] Number of resends after the first attempt
+        - max_age [float] If the current record is younger than max_age seconds, it is
+          returned without sending anything
+
+        Returns
+        --
+        The new record. None if there was no reply
+        """
+        record = getattr(self, attr)
+        if max_age is not None and record.stamp and monotonic()-record.stamp <= max_age:
+            return record
+
+        cmd_id = cmdId(cmd_id)
+        cond = self._replyCond(cmd_id)
+        sent = monotonic()
+        seqs = set() # of all attempts, a late reply to an earlier one is as good
+
+        def answers(new_record):
+            return (new_record is not record and new_record.stamp >= sent
+                    and (new_record.seq in seqs or not self._seq_echoed))
+
+        for attempt in range(retries+1):
+            if request() is False:
+                self._logger.error("Could not send request of CMD ID %02x", cmd_id)
+                return None
+            seqs.add(self._sent_seqs[cmd_id])
+            deadline = monotonic()+timeout
+            with cond:
+                while not answers(getattr(self, attr)):
+                    remaining = deadline-monotonic()
+                    if remaining <= 0:
+                        break
+                    cond.wait(remaining)
+            new_record = getattr(self, attr)
+            if answers(new_record):
+                return new_record
+            self._logger.warning("No reply to CMD ID %02x within %s second(s) (attempt %d of %d)",
+                                 cmd_id, timeout, attempt+1, retries+1)
+        return None
+
     def rcvMsg(self):
         data=None
         try:
             data,addr = self._socket.recvfrom(self._BUFF_SIZE)
         except Exception as e:
+            self._recv_timeouts += 1
             self._logger.warning("%s. Did not receive message within %s second(s)", e, self._rcv_wait_t)
         return data
 
@@ -192,134 +614,373 @@ class SIYISDK:
         self._logger.debug("Started data receiving thread")
         while( not self._stop):
             try:
-                self.bufferCallback()
-            except:
-                exit
+                if self.bufferCallback() is False:
+                    if self._socketClosed():
+                        self._logger.warning("Socket is closed")
+                        break
+                    sleep(RECV_ERROR_BACKOFF)
+            except Exception as e:
+                self._metrics.recv_errors += 1
+                self._logger.error("Error %s", e)
         self._logger.debug("Exiting data receiving thread")
 
     def bufferCallback(self):
         """
         Receives messages and parses its content
+
+        Returns
+        --
+        False if the socket failed
         """
         try:
-            buff,addr = self._socket.recvfrom(self._BUFF_SIZE)
-        except:
-            exit
-        buff_str = buff.hex()
-        self._logger.debug("Buffer: %s", buff_str)
-
-        # 10 bytes: STX+CTRL+Data_len+SEQ+CMD_ID+CRC16
-        #            2 + 1  +    2   + 2 +   1  + 2
-        MINIMUM_DATA_LENGTH=10*2
-
-        HEADER='5566'
-        # Go through the buffer
-        while(len(buff_str)>=MINIMUM_DATA_LENGTH):
-            if buff_str[0:4]!=HEADER:
-                # Remove the 1st element and continue 
-                tmp=buff_str[1:]
-                buff_str=tmp
-                continue
+            if self._kernel_stamps:
+                buff, addr, kernel_stamp = recvWithTimestamp(self._socket, self._BUFF_SIZE)
+            else:
+                buff,addr = self._socket.recvfrom(self._BUFF_SIZE)
+                kernel_stamp = None
+        except socket.timeout:
+            self._recv_timeouts += 1
+            return
+        except OSError as e:
+            self._metrics.recv_errors += 1
+            self._logger.error("Could not receive bytes: %s", e)
+            if self._engine is not None and self._socketClosed():
+                # Readable forever once closed
+                self._engine.removeReader(self._socket)
+            return False
+        self.feedBuffer(buff, kernel_stamp)
 
-            # Now we got minimum amount of data. Check if we have enough
-            # Data length, bytes are reversed, according to SIYI SDK
-            low_b = buff_str[6:8] # low byte
-            high_b = buff_str[8:10] # high byte
-            data_len = high_b+low_b
-            data_len = int('0x'+data_len, base=16)
-            char_len = data_len*2
-
-            # Check if there is enough data (including payload)
-            if(len(buff_str) < (MINIMUM_DATA_LENGTH+char_len)):
-                # No useful data
-                buff_str=''
-                break
-            
-            packet = buff_str[0:MINIMUM_DATA_LENGTH+char_len]
-            buff_str = buff_str[MINIMUM_DATA_LENGTH+char_len:]
+    def _socketClosed(self):
+        fileno = getattr(self._socket, 'fileno', None)
+        return fileno is not None and fileno()==-1
+
+    def feedBuffer(self, buff, kernel_stamp=None):
+        """
+        Parses received bytes. Frames split across calls are reassembled
+
+        Params
+        --
+        - buff [bytes] Received bytes
+        - kernel_stamp [float] Wall clock receive time given by the kernel, if known
+        """
+        if self._debug:
+            self._logger.debug("Buffer: %s", buff.hex())
+
+        metrics = self._metrics
+        metrics.datagrams_in += 1
+        metrics.bytes_in += len(buff)
+        now = monotonic()
+        recorder = self._recorder
+        if recorder is not None:
+            recorder.record(RX, buff, now)
+        for cmd_id, seq, data in self._reassembler.feed(buff):
+            metrics.frames_in[cmd_id] += 1
+            self._rtt.received(cmd_id, seq, now, kernel_stamp)
+            if seq==self._sent_seqs[cmd_id]:
+                self._seq_echoed = True
+            handler = self._handlers[cmd_id]
+            try:
+                if handler is not None:
+                    ok = handler(data, seq)
+                elif cmd_id in SCHEMAS and SCHEMAS[cmd_id].response is not None:
+                    ok = self.parseGenericMsg(cmd_id, data, seq)
+                else:
+                    metrics.unknown_ids += 1
+                    self._logger.warning("CMD ID %02x is not recognized", cmd_id)
+                    continue
+            except Exception as e:
+                ok = False
+                self._logger.error("Handler of CMD ID %02x failed: %s", cmd_id, e)
+            if ok is False:
+                # The state record is still the previous one, nothing to deliver
+                metrics.parse_errors += 1
+            telemetry = self._telemetry
+            if telemetry is not None and telemetry.watch[cmd_id]:
+                telemetry.publish(self)
+
+            # Wake up the getters waiting for this reply
+            cond = self._reply_conds[cmd_id]
+            if cond is not None:
+                with cond:
+                    cond.notify_all()
+            if self._inflight:
+                if ok is not False:
+                    self._inflight.resolve(cmd_id, seq, self._replyResult(cmd_id, data))
+                self._inflight.expire()
+            hub = self._hub
+            if ok is not False and hub is not None and hub.hasSubscribers(cmd_id):
+                hub.publish(cmd_id, self._replyResult(cmd_id, data))
+
+    def _replyResult(self, cmd_id, data):
+        """
+        Returns what a reply is delivered as: the state record updated by the reply,
+        the decoded dict of generic messages, or the payload bytes for custom handlers
+        """
+        attr = self._reply_attrs[cmd_id]
+        if attr is not None:
+            return getattr(self, attr)
+        if cmd_id in self._generic_msgs:
+            return self._generic_msgs[cmd_id][2]
+        return data
+
+    def stats(self):
+        """
+        Link statistics since the SDK was created or resetStats() was called
+
+        Returns
+        --
+        [dict] 'commands': per command name, sent requests, replies, timeouts, in_flight, loss ratio
+        and round trip time summary in ms (count, mean, min, max, p50, p95, p99). kernel_rtt_ms
+        is the same measured to the kernel receive time, see useKernelTimestamps().
+        'total': sums over all commands, unsolicited replies and recv_timeouts of the receive thread
+        """
+        stats = self._rtt.stats()
+        stats['total']['recv_timeouts'] = self._recv_timeouts
+        return stats
+
+    def resetStats(self):
+        self._rtt.reset()
+        self._recv_timeouts = 0
+        self._metrics.reset()
+
+    def metrics(self):
+        """
+        Snapshot of the codec and transport counters and gauges: frames in and out per command,
+        bytes, CRC errors, resync bytes skipped, unknown command IDs, handler and socket errors,
+        queue depths, connection state and round trip times. See siyi_metrics.snapshot()
+
+        Returns
+        --
+        [dict]
+        """
+        return metricsSnapshot(self)
+
+    def serveMetrics(self, port=9108, host='127.0.0.1'):
+        """
+        Serves metrics() at http://host:port/metrics in the Prometheus text format
+
+        Returns
+        --
+        [MetricsServer] close() stops it
+        """
+        return MetricsServer(self, port, host)
+
+    def useKernelTimestamps(self, enable=True):
+        """
+        Measures round trip times up to the kernel receive time of replies too, which leaves out
+        the scheduling delay of the receive thread. Linux only
+
+        Returns
+        --
+        [bool] True if kernel timestamps are in use
+        """
+        if enable and not self._kernel_stamps:
+            self._kernel_stamps = enableKernelTimestamps(self._socket)
+            if not self._kernel_stamps:
+                self._logger.warning("Kernel timestamps are not supported on this socket")
+        elif not enable:
+            self._kernel_stamps = False
+        return self._kernel_stamps
+
+    def startRecording(self, path):
+        """
+        Records the received datagrams and sent frames to a binary file, see siyi_recorder.
+        A background thread writes it, the receive path only queues the bytes.
+        Recording goes on across reconnections until stopRecording()
+
+        Returns
+        --
+        [FrameRecorder] Its stats() has the records written and dropped
+        """
+        try:
+            self.stopRecording()
+        except OSError:
+            pass # logged by the recorder when it happened
+        self._recorder = FrameRecorder(path)
+        return self._recorder
+
+    def stopRecording(self):
+        """
+        Writes what is left and closes the recording file
+
+        Raises
+        --
+        OSError if the recording could not be written completely
+        """
+        recorder = self._recorder
+        if recorder is None:
+            return
+        self._recorder = None
+        recorder.close()
+
+    def replay(self, path, speed=1.0):
+        """
+        Feeds the datagrams of a recording through feedBuffer(), like received traffic.
+        The camera does not need to be connected
+
+        Params
+        --
+        - path [str] File written by startRecording()
+        - speed [float] 1.0 keeps the recorded timing. None feeds as fast as possible
+
+        Returns
+        --
+        [int] Number of datagrams fed
+        """
+        return replayRecording(self, path, speed)
+
+    def publishTelemetry(self, name=None):
+        """
+        Publishes the latest attitude, zoom level and rangefinder value to a shared memory
+        block, updated on every such reply. Other processes read it with
+        siyi_shm.TelemetryReader(name), without syscalls or pickling
+
+        Params
+        --
+        - name [str] Block name. A random one if None, see the returned publisher's name
+
+        Returns
+        --
+        [TelemetryPublisher]
+        """
+        self.stopTelemetry()
+        self._telemetry = TelemetryPublisher(name)
+        self._telemetry.publish(self)
+        return self._telemetry
+
+    def stopTelemetry(self):
+        """
+        Stops publishing and removes the shared memory block
+        """
+        telemetry = self._telemetry
+        if telemetry is None:
+            return
+        self._telemetry = None
+        telemetry.close()
+
+    # Stage names and the methods they wrap, see siyi_trace
+    _TRACED_METHODS = (('send', 'sendMsg'), ('receive', 'bufferCallback'),
+                       ('dispatch', 'feedBuffer'), ('parse:generic', 'parseGenericMsg'))
+
+    def setTracer(self, tracer):
+        """
+        Wraps the stages of the hot path wanted by tracer with its hooks: encode, send, receive,
+        dispatch, reassemble and parse:<schema name>. See siyi_trace.
+        Nothing is wrapped, and nothing is paid, while no tracer is set.
+        Handlers registered afterwards are not traced
 
-            # Finally decode the packet!
-            val = self._in_msg.decodeMsg(packet)
-            if val is None:
+        Params
+        --
+        - tracer [Tracer] e.g. StageTimer(), ChromeTracer() or ProfilerTracer(['parse:']).
+          None is the same as clearTracer()
+        """
+        self.clearTracer()
+        if tracer is None:
+            return
+        self._tracer = tracer
+        for stage, name in self._TRACED_METHODS:
+            if tracer.wants(stage):
+                setattr(self, name, traced(tracer, stage, getattr(self, name)))
+        if tracer.wants('encode'):
+            for name in ('encodeCommand', '_constCommand'):
+                setattr(self._out_msg, name, traced(tracer, 'encode', getattr(self._out_msg, name)))
+        if tracer.wants('reassemble'):
+            self._reassembler.feed = traced(tracer, 'reassemble', self._reassembler.feed)
+        self._traced_handlers = list(self._handlers)
+        for cmd_id, handler in enumerate(self._handlers):
+            if handler is None:
                 continue
-            
-            data, data_len, cmd_id, seq = val[0], val[1], val[2], val[3]
-            # print (data, "cmdidddiii", cmd_id, "siyi")
-            if cmd_id==COMMAND.ACQUIRE_DEVICE_INF:
-                self.parseDevicemsg(data, seq)
-            elif cmd_id==COMMAND.AUTO_FOCUS:
-                self.parseAutoFocusMsg(data, seq)
-            elif cmd_id==COMMAND.CENTER:
-                self.parseGimbalCenterMsg(data, seq) 
-            elif cmd_id==COMMAND.ACQUIRE_GIMBAL_MOUTION:
-                self.parseMoutionModeMsg(data,seq)
-            elif cmd_id==COMMAND.MANUAL_ZOOM:
-                self.parseZoomMsg(data, seq)
-            elif cmd_id==COMMAND.ACQUIRE_GIMBAL_ATT:
-                self.parseAttitudeMsg(data, seq)
-            elif cmd_id==COMMAND.Max_Min_Temp:
-                self.parsTempratureMsg(data, seq)
-            elif cmd_id==COMMAND.BOX_TEMP:
-                self.parseBoxTempratureMsg(data, seq)
-            elif cmd_id==COMMAND.RANGE_FİNDER:
-                self.parseRangeFinderMsg(data, seq)
-            elif cmd_id==COMMAND.GIMBAL_ROT:
-                self.parseGimbalSpeedMsg(data, seq)
-            elif cmd_id==COMMAND.POINT_TEMP:
-                self.parsePointTempratureMsg(data, seq)    
-            elif cmd_id==COMMAND.INF_COLOR_MAP:
-                self.parseColorMapMsg(data, seq)
-            elif cmd_id==COMMAND.COLOR_MAP:
-                self.parseColorMapMsg(data, seq)   
-            elif cmd_id==COMMAND.IMAGE_MOD:
-                self.parseImageModMsg(data, seq) 
-            elif cmd_id==COMMAND.IMAGE_MOD_CHANGE:
-                self.parseImageModMsg(data, seq)  
-            elif cmd_id==COMMAND.TargetAngle:
-                self.parseTargetAngleMsg(data, seq)   
-            elif cmd_id==COMMAND.Thermal_Raw_data:
-                self.parseThermalRawdataMsg(data, seq)               
-            elif cmd_id==COMMAND.Thermal_Map:
-                self.parseThermalMapMsg(data, seq) 
-            elif cmd_id==COMMAND.Thermal_Gain_Get:
-                self.parseThermalGainGetMsg(data, seq) 
-            elif cmd_id==COMMAND.Thermal_Gain_Send:
-                self.parseThermalGainSendMsg(data, seq) 
-            elif cmd_id==COMMAND.Thermal_Params_Get:
-                self.parseThermalParamsGetMsg(data, seq) 
-            elif cmd_id==COMMAND.Thermal_Params_Send:
-                self.parseThermalParamsSendMsg(data, seq) 
-            elif cmd_id==COMMAND.Range_finder_params_get:
-                self.parseRangefinderparamsgetMsg(data, seq)            
-            elif cmd_id==COMMAND.Range_finder_params_send:
-                self.parseRangefinderparamssendMsg(data, seq) 
-         
-            else:
-                self._logger.warning("CMD ID is not recognized")
-        
-        return
-    
+            stage = "parse:%s" % (SCHEMAS[cmd_id].name if cmd_id in SCHEMAS else "%02x" % cmd_id)
+            if tracer.wants(stage):
+                self._handlers[cmd_id] = traced(tracer, stage, handler)
+        self._rearmReader()
+
+    def clearTracer(self):
+        """
+        Removes the tracing wrappers of setTracer()
+        """
+        if self._tracer is None:
+            return
+        self._tracer = None
+        for _, name in self._TRACED_METHODS:
+            self.__dict__.pop(name, None)
+        for name in ('encodeCommand', '_constCommand'):
+            self._out_msg.__dict__.pop(name, None)
+        self._reassembler.__dict__.pop('feed', None)
+        for cmd_id, handler in enumerate(self._traced_handlers):
+            # Handlers replaced since setTracer() are kept
+            if getattr(self._handlers[cmd_id], '__wrapped__', None) is handler:
+                self._handlers[cmd_id] = handler
+        self._traced_handlers = None
+        self._rearmReader()
+
+    def _rearmReader(self):
+        """
+        The engine keeps the bufferCallback it was given, hand it the current one
+        """
+        if self._engine is not None and not self._stop:
+            self._engine.removeReader(self._socket)
+            self._engine.addReader(self._socket, self.bufferCallback)
+
+    def subscribe(self, topic, callback, queue_size=16, policy=POLICY_LATEST):
+        """
+        Calls callback(cmd_id, record) for every received message of topic. Callbacks run on
+        a small worker pool, so a slow subscriber never delays the receive thread.
+        See SubscriptionHub.subscribe()
+
+        Params
+        --
+        - topic: Command ID, COMMAND hex string, schema name such as 'gimbal_attitude',
+          or TOPIC_ALL for every message
+        - callback [callable] Receives the command ID and the state record of the message
+        - queue_size [int] Messages kept for this subscriber. Always 1 with POLICY_LATEST
+        - policy [str] POLICY_LATEST, POLICY_DROP or POLICY_BLOCK
+
+        Returns
+        --
+        [Subscription] Has the delivered and dropped counters, cancel() unsubscribes
+        """
+        if self._hub is None:
+            with self._reply_conds_lock:
+                if self._hub is None:
+                    self._hub = SubscriptionHub(self._subscriber_workers)
+        return self._hub.subscribe(topic, callback, queue_size, policy)
+
+    def unsubscribe(self, sub):
+        if self._hub is not None:
+            self._hub.unsubscribe(sub)
+
+    def registerHandler(self, cmd_id, handler):
+        """
+        Sets the function that handles received messages of a command ID.
+        Can be used for command IDs that are not modelled by the SDK
+
+        Params
+        --
+        - cmd_id [int] Command ID. Hex strings from COMMAND are accepted too
+        - handler [callable] Called as handler(data, seq) with the payload bytes and
+          the sequence number of the message. None removes the handler
+        """
+        cmd_id = cmdId(cmd_id)
+        if not 0 <= cmd_id < 256:
+            self._logger.error("CMD ID %s is out of range", cmd_id)
+            return False
+        self._handlers[cmd_id] = handler
+        return True
 
     ####################################################
     #                Parsing functions                 #
     ####################################################
-    def parseDevicemsg(self, msg:str, seq:int):
+    def parseDevicemsg(self, msg:bytes, seq:int):
         try:
-            self._fw_msg.gimbal_firmware_ver= str(toInt(msg[12:14]))+"."+str(toInt(msg[10:12]))+"."+str(toInt(msg[8:10]))
-            self._fw_msg.zoom_firmware_ver= str(toInt(msg[20:22]))+"."+str(toInt(msg[18:20]))+"."+str(toInt(msg[16:18]))
-            if msg[14:16]=="6b":
-                self._hw_msg.id="ZR10"
-            elif msg[14:16]=="73":
-                self._hw_msg.id="A8 Mini"
-            elif msg[14:16]=="75":
-                self._hw_msg.id="A2 Mini"            
-            elif msg[14:16]=="78":
-                self._hw_msg.id="ZR30" 
-            elif msg[14:16]=="7a":
-                self._hw_msg.id="ZT30"
-
-            self._fw_msg.seq=seq
-            self._hw_msg.seq=seq
+            (code_board_ver, gimbal_patch, gimbal_minor, gimbal_major, hw_code,
+             zoom_patch, zoom_minor, zoom_major) = _DEVICE.decode(msg)
+            stamp = monotonic()
+            self._fw_msg = DeviceMsg(seq, stamp, code_board_ver,
+                                     "%d.%d.%d" % (gimbal_major, gimbal_minor, gimbal_patch),
+                                     "%d.%d.%d" % (zoom_major, zoom_minor, zoom_patch))
+            if hw_code in HARDWARE_IDS:
+                self._hw_msg = DeviceMsg(seq, stamp, id=HARDWARE_IDS[hw_code])
             
             self._logger.debug("Firmware version: %s", self._fw_msg.gimbal_firmware_ver)
 
@@ -328,11 +989,10 @@ class SIYISDK:
             self._logger.error("Error %s", e)
             return False
 
-    def parseAutoFocusMsg(self, msg:str, seq:int):
+    def parseAutoFocusMsg(self, msg:bytes, seq:int):
         
         try:
-            self._autoFocus_msg.seq=seq
-            self._autoFocus_msg.success = bool(int('0x'+msg, base=16))
+            self._autoFocus_msg = AutoFocusMsg(seq, monotonic(), bool(_AUTO_FOCUS.decode(msg)[0]))
             self._logger.debug("Auto focus success: %s", self._autoFocus_msg.success)
 
             return True
@@ -340,16 +1000,10 @@ class SIYISDK:
             self._logger.error("Error %s", e)
             return False
 
-    def parseMoutionModeMsg(self, msg:str, seq:int):
+    def parseMoutionModeMsg(self, msg:bytes, seq:int):
         try:
-            self._gmm_msg.seq=seq
-            mode =str(int('0x'+msg, base=16))
-            if mode=="0":
-                self._gmm_msg.gimbal_moution_mode = "lock mode"
-            elif mode=="1":
-                self._gmm_msg.gimbal_moution_mode = "follow mode"            
-            elif mode=="2":
-                self._gmm_msg.gimbal_moution_mode = "fpv mode"
+            mode, = _MOTION_MODE.decode(msg)
+            self._gmm_msg = MoutionMode(seq, monotonic(), mode, MOTION_MODES.get(mode, ''))
 
             self._logger.debug("Moution Mode: %s", self._gmm_msg.gimbal_moution_mode)
 
@@ -359,52 +1013,43 @@ class SIYISDK:
             self._logger.error("Error %s", e)
             return False
 
-    def parseGimbalCenterMsg(self, msg:str, seq:int):  
+    def parseGimbalCenterMsg(self, msg:bytes, seq:int):  
             try:
-                self._center_msg.seq=seq
-                self._center_msg.success = bool(int('0x'+msg, base=16))
+                self._center_msg = CenterMsg(seq, monotonic(), bool(_CENTER.decode(msg)[0]))
                 self._logger.debug("Gimbal center success: %s", self._center_msg.success)
                 return True
             except Exception as e:
                 self._logger.error("Error %s", e)
                 return False
 
-    def parseZoomMsg(self, msg:str, seq:int):
+    def parseZoomMsg(self, msg:bytes, seq:int):
         try:
-            self._manualZoom_msg.seq=seq
-            self._manualZoom_msg.level = int('0x'+msg[2:4]+msg[0:2], base=16) /10.
+            self._manualZoom_msg = ManualZoomMsg(seq, monotonic(), *_ZOOM.decode(msg))
             self._logger.debug("Zoom level %s", self._manualZoom_msg.level)
             return True
         except Exception as e:
             self._logger.error("Error %s", e)
             return False
 
-    def parseAttitudeMsg(self, msg:str, seq:int):
+    def parseAttitudeMsg(self, msg:bytes, seq:int):
         
         try:
-            self._att_msg.seq=seq
-            self._att_msg.yaw = toInt(msg[2:4]+msg[0:2]) /10.
-            self._att_msg.pitch = toInt(msg[6:8]+msg[4:6]) /10.
-            self._att_msg.roll = toInt(msg[10:12]+msg[8:10]) /10.
-            self._att_msg.yaw_speed = toInt(msg[14:16]+msg[12:14]) /10.
-            self._att_msg.pitch_speed = toInt(msg[18:20]+msg[16:18]) /10.
-            self._att_msg.roll_speed = toInt(msg[22:24]+msg[20:22]) /10.
-
-            self._logger.debug("(yaw, pitch, roll= (%s, %s, %s)", 
-                                    self._att_msg.yaw, self._att_msg.pitch, self._att_msg.roll)
+            self._att_msg = att = AttitdueMsg(seq, monotonic(), *_ATTITUDE.decode(msg))
+            if self._att_history is not None:
+                self._att_history.appendMsg(att)
+
+            self._logger.debug("(yaw, pitch, roll= (%s, %s, %s)", att.yaw, att.pitch, att.roll)
             self._logger.debug("(yaw_speed, pitch_speed, roll_speed= (%s, %s, %s)", 
-                                    self._att_msg.yaw_speed, self._att_msg.pitch_speed, self._att_msg.roll_speed)
+                                    att.yaw_speed, att.pitch_speed, att.roll_speed)
             return True
         except Exception as e:
             self._logger.error("Error %s", e)
             return False
 
-    def parseGimbalSpeedMsg(self, msg:str, seq:int):
+    def parseGimbalSpeedMsg(self, msg:bytes, seq:int):
         
         try:
-            self._gimbalSpeed_msg.seq=seq
-            self._gimbalSpeed_msg.success = bool(int('0x'+msg, base=16))
-
+            self._gimbalSpeed_msg = GimbalSpeedMsg(seq, monotonic(), bool(_GIMBAL_SPEED.decode(msg)[0]))
             
             self._logger.debug("Gimbal speed success: %s", self._gimbalSpeed_msg.success)
 
@@ -413,79 +1058,56 @@ class SIYISDK:
             self._logger.error("Error %s", e)
             return False
 
-    def parsTempratureMsg(self, msg:str, seq:int):
+    def parsTempratureMsg(self, msg:bytes, seq:int):
         try:
-            self._temp_msg.seq=seq
-            self._temp_msg.temp_max = toInt(msg[2:4]+msg[0:2]) /100.
-            self._temp_msg.temp_min = toInt(msg[6:8]+msg[4:6])/100.
-            self._temp_msg.temp_max_x =  toInt(msg[10:12]+msg[8:10])
-            self._temp_msg.temp_max_y = toInt(msg[14:16]+msg[12:14]) 
-            self._temp_msg.temp_min_x = toInt(msg[18:20]+msg[16:18])
-            self._temp_msg.temp_min_y = toInt(msg[22:24]+msg[20:22])
+            self._temp_msg = temp = TemperatureMsg(seq, monotonic(), *_MAX_MIN_TEMP.decode(msg))
             self._logger.debug("(max_temp, max_temp_x, max_temp_y= (%s, %s, %s)", 
-                                    self._temp_msg.temp_max, self._temp_msg.temp_max_x, self._temp_msg.temp_max_y)
+                                    temp.temp_max, temp.temp_max_x, temp.temp_max_y)
             self._logger.debug("(min_temp, min_temp_x, min_temp_y= (%s, %s, %s)", 
-                                    self._temp_msg.temp_min, self._temp_msg.temp_min_x, self._temp_msg.temp_min_y)            
+                                    temp.temp_min, temp.temp_min_x, temp.temp_min_y)            
             return True
         except Exception as e:
             self._logger.error("Error %s", e)
             return False
 
-    def parseRangeFinderMsg(self, msg:str, seq:int):
+    def parseRangeFinderMsg(self, msg:bytes, seq:int):
         try:
-            self._rangefinder_msg.seq=seq
-            self._rangefinder_msg.Range_value= toInt(msg[2:4]+msg[0:2]) /10.
+            self._rangefinder_msg = RangeFinderMsg(seq, monotonic(), *_RANGE_FINDER.decode(msg))
             self._logger.debug("Range_value %s m",self._rangefinder_msg.Range_value)
             return True
         except Exception as e:
             self._logger.error("Error %s", e)
             return False
 
-    def parseBoxTempratureMsg(self, msg:str, seq:int):
+    def parseBoxTempratureMsg(self, msg:bytes, seq:int):
         try:
-            self._box_temp_msg.seq=seq
-            self._box_temp_msg.startx = toInt(msg[2:4]+msg[0:2]) 
-            self._box_temp_msg.starty = toInt(msg[6:8]+msg[4:6])
-            self._box_temp_msg.endx =  toInt(msg[10:12]+msg[8:10])
-            self._box_temp_msg.endy = toInt(msg[14:16]+msg[12:14]) 
-
-            self._box_temp_msg.temp_max = toInt(msg[18:20]+msg[16:18])/100.
-            self._box_temp_msg.temp_min = toInt(msg[22:24]+msg[20:22])/100.
-
-            self._box_temp_msg.temp_max_x = toInt(msg[26:28]+msg[24:26])
-            self._box_temp_msg.temp_max_y = toInt(msg[30:32]+msg[28:30])
-            self._box_temp_msg.temp_min_x = toInt(msg[34:36]+msg[32:34])
-            self._box_temp_msg.temp_min_y = toInt(msg[38:40]+msg[36:38])
+            self._box_temp_msg = box = BoxTemperatureMsg(seq, monotonic(), *_BOX_TEMP.decode(msg))
 
             self._logger.debug("startx,starty,endx,endy= (%s, %s, %s, %s)",
-                               self._box_temp_msg.startx,self._box_temp_msg.starty,self._box_temp_msg.endx,self._box_temp_msg.endy)
+                               box.startx, box.starty, box.endx, box.endy)
             self._logger.debug("(max_temp, max_temp_x, max_temp_y= (%s, %s, %s)", 
-                                    self._box_temp_msg.temp_max, self._box_temp_msg.temp_max_x, self._box_temp_msg.temp_max_y)
+                                    box.temp_max, box.temp_max_x, box.temp_max_y)
             self._logger.debug("(min_temp, min_temp_x, min_temp_y= (%s, %s, %s)", 
-                                    self._box_temp_msg.temp_min, self._box_temp_msg.temp_min_x, self._box_temp_msg.temp_min_y)           
+                                    box.temp_min, box.temp_min_x, box.temp_min_y)           
             return True
         except Exception as e:
             self._logger.error("Error %s", e)
             return False
 
-    def parsePointTempratureMsg(self, msg:str, seq:int):
+    def parsePointTempratureMsg(self, msg:bytes, seq:int):
         try:
-            self._point_temp_msg.seq=seq
-            self._point_temp_msg.temprature = toInt(msg[2:4]+msg[0:2])/100.
-            self._point_temp_msg.temp_point_x = toInt(msg[6:8]+msg[4:6]) 
-            self._point_temp_msg.temp_point_y = toInt(msg[10:12]+msg[8:10])
+            self._point_temp_msg = point = PointTemperatureMsg(seq, monotonic(), *_POINT_TEMP.decode(msg))
 
             self._logger.debug("temprature,pointx,pointy= (%s, %s, %s)",
-                                self._point_temp_msg.temprature,self._point_temp_msg.temp_point_x,self._point_temp_msg.temp_point_y)           
+                                point.temprature, point.temp_point_x, point.temp_point_y)           
             return True
         except Exception as e:
             self._logger.error("Error %s", e)
             return False
     
-    def parseColorMapMsg(self, msg:str, seq:int):
+    def parseColorMapMsg(self, msg:bytes, seq:int):
         try:
-            self._color_map_msg.seq=seq
-            self._color_map_msg.pseudo_color = toInt(msg[2:4]+msg[0:2])
+            self._color_map_msg = ColorMapMSg(seq, monotonic(), *_COLOR_MAP.decode(msg))
 
             self._logger.debug("pseudo_color= (%s)",
                                 self._color_map_msg.pseudo_color)           
@@ -494,10 +1116,9 @@ class SIYISDK:
             self._logger.error("Error %s", e)
             return False
         
-    def parseImageModMsg(self, msg:str, seq:int):
+    def parseImageModMsg(self, msg:bytes, seq:int):
         try:
-            self._image_mod_msg.seq=seq
-            self._image_mod_msg.vdisp_mode = toInt(msg[2:4]+msg[0:2])
+            self._image_mod_msg = ImageModMsg(seq, monotonic(), *_IMAGE_MODE.decode(msg))
 
             self._logger.debug("vdisp_mode= (%s)",
                                 self._image_mod_msg.vdisp_mode)           
@@ -506,24 +1127,19 @@ class SIYISDK:
             self._logger.error("Error %s", e)
             return False
     
-    def parseTargetAngleMsg(self, msg:str, seq:int):
+    def parseTargetAngleMsg(self, msg:bytes, seq:int):
         try:
-            self._att_msg.seq=seq
-            self._att_msg.yaw = toInt(msg[2:4]+msg[0:2])
-            self._att_msg.pitch = toInt(msg[6:8]+msg[4:6])
-            self._att_msg.roll = toInt(msg[10:12]+msg[8:10])
+            self._target_rotation_msg = rot = TarRotationmsg(seq, monotonic(), *_TARGET_ANGLE.decode(msg))
 
-            self._logger.debug("(yaw, pitch, roll= (%s, %s, %s)", 
-                                    self._att_msg.yaw, self._att_msg.pitch, self._att_msg.roll)         
+            self._logger.debug("(yaw, pitch, roll= (%s, %s, %s)", rot.yaw, rot.pitch, rot.roll)
             return True
         except Exception as e:
             self._logger.error("Error %s", e)
             return False
    
-    def parseThermalRawdataMsg(self, msg:str, seq:int):
+    def parseThermalRawdataMsg(self, msg:bytes, seq:int):
         try:
-            self._thermal_rawdata_msg.seq=seq
-            self._thermal_rawdata_msg.mode = toInt(msg[2:4]+msg[0:2])
+            self._thermal_rawdata_msg = ThermalRawData(seq, monotonic(), *_THERMAL_RAW_DATA.decode(msg))
 
             self._logger.debug("rawdata_mode= (%s)",
                                 self._thermal_rawdata_msg.mode)           
@@ -532,10 +1148,9 @@ class SIYISDK:
             self._logger.error("Error %s", e)
             return False
    
-    def parseThermalMapMsg(self, msg:str, seq:int):
+    def parseThermalMapMsg(self, msg:bytes, seq:int):
         try:
-            self._thermal_tempmap_msg.seq=seq
-            self._thermal_tempmap_msg.ack = toInt(msg[2:4]+msg[0:2])
+            self._thermal_tempmap_msg = ThermalTempMAP(seq, monotonic(), *_THERMAL_MAP.decode(msg))
 
             self._logger.debug("ThermalMap_ack= (%s)",
                                 self._thermal_tempmap_msg.ack)           
@@ -544,10 +1159,9 @@ class SIYISDK:
             self._logger.error("Error %s", e)
             return False
    
-    def parseThermalGainGetMsg(self, msg:str, seq:int):
+    def parseThermalGainGetMsg(self, msg:bytes, seq:int):
         try:
-            self._thermal_gain_msg.seq=seq
-            self._thermal_gain_msg.gain_status = toInt(msg[2:4]+msg[0:2])
+            self._thermal_gain_msg = ThermalGain(seq, monotonic(), *_THERMAL_GAIN.decode(msg))
 
             self._logger.debug("gain_status= (%s)",
                                 self._thermal_gain_msg.gain_status)           
@@ -556,10 +1170,9 @@ class SIYISDK:
             self._logger.error("Error %s", e)
             return False
     
-    def parseThermalGainSendMsg(self, msg:str, seq:int):
+    def parseThermalGainSendMsg(self, msg:bytes, seq:int):
         try:
-            self._thermal_gain_msg.seq=seq
-            self._thermal_gain_msg.gain_status = toInt(msg[2:4]+msg[0:2])
+            self._thermal_gain_msg = ThermalGain(seq, monotonic(), *_THERMAL_GAIN_SEND.decode(msg))
 
             self._logger.debug("gain_status= (%s)",
                                 self._thermal_gain_msg.gain_status)           
@@ -568,30 +1181,26 @@ class SIYISDK:
             self._logger.error("Error %s", e)
             return False
    
-    def parseThermalParamsGetMsg(self, msg:str, seq:int):
+    def parseThermalParamsGetMsg(self, msg:bytes, seq:int):
         try:
-            self._thermal_params_msg.seq=seq
-            self._thermal_params_msg.Distance = toInt(msg[2:4]+msg[0:2]) 
-            self._thermal_params_msg.Target_emission_rate = toInt(msg[6:8]+msg[4:6])
-            self._thermal_params_msg.Humidity =  toInt(msg[10:12]+msg[8:10])
-            self._thermal_params_msg.Atmospheric_Temperature = toInt(msg[14:16]+msg[12:14]) 
-            self._thermal_params_msg.Reflection_Temperature = toInt(msg[18:20]+msg[16:18])
+            self._thermal_params_msg = params = ThermalParams(seq, monotonic(), *_THERMAL_PARAMS.decode(msg))
 
             self._logger.debug("Dist,Ems,Hum,Ta,Tu= (%s,%s,%s,%s,%s)",
-                                self._thermal_params_msg.Distance,
-                                self._thermal_params_msg.Target_emission_rate,
-                                self._thermal_params_msg.Humidity,
-                                self._thermal_params_msg.Atmospheric_Temperature,
-                                self._thermal_params_msg.Reflection_Temperature)           
+                                params.Distance,
+                                params.Target_emission_rate,
+                                params.Humidity,
+                                params.Atmospheric_Temperature,
+                                params.Reflection_Temperature)           
             return True
         except Exception as e:
             self._logger.error("Error %s", e)
             return False    
     
-    def parseThermalParamsSendMsg(self, msg:str, seq:int):
+    def parseThermalParamsSendMsg(self, msg:bytes, seq:int):
         try:
-            self._thermal_params_msg.seq=seq
-            self._thermal_params_msg.ack = toInt(msg[2:4]+msg[0:2])
+            # The ack does not carry the parameters, keep the last ones
+            self._thermal_params_msg = self._thermal_params_msg._replace(
+                seq=seq, stamp=monotonic(), ack=_THERMAL_PARAMS_SEND.decode(msg)[0])
 
             self._logger.debug("Thermalsparamsack= (%s)",
                                 self._thermal_params_msg.ack)           
@@ -600,10 +1209,10 @@ class SIYISDK:
             self._logger.error("Error %s", e)
             return False
     
-    def parseRangefinderparamsgetMsg(self, msg:str, seq:int):
+    def parseRangefinderparamsgetMsg(self, msg:bytes, seq:int):
         try:
-            self._rangefinder_params_msg.seq=seq
-            self._rangefinder_params_msg.laser_state = toInt(msg[2:4]+msg[0:2])
+            self._rangefinder_params_msg = RangeFinderParams(seq, monotonic(), *_RANGE_FINDER_STATUS.decode(msg),
+                                                             ack=self._rangefinder_params_msg.ack)
 
             self._logger.debug("laser_state= (%s)",
                                 self._rangefinder_params_msg.laser_state)           
@@ -612,10 +1221,11 @@ class SIYISDK:
             self._logger.error("Error %s", e)
             return False
         
-    def parseRangefinderparamssendMsg(self, msg:str, seq:int):
+    def parseRangefinderparamssendMsg(self, msg:bytes, seq:int):
         try:
-            self._rangefinder_params_msg.seq=seq
-            self._rangefinder_params_msg.ack = toInt(msg[2:4]+msg[0:2])
+            # The ack does not carry the laser state, keep the last one
+            self._rangefinder_params_msg = self._rangefinder_params_msg._replace(
+                seq=seq, stamp=monotonic(), ack=_RANGE_FINDER_STATUS_SEND.decode(msg)[0])
 
             self._logger.debug("laser_state_ack= (%s)",
                                 self._rangefinder_params_msg.ack)           
@@ -623,23 +1233,44 @@ class SIYISDK:
         except Exception as e:
             self._logger.error("Error %s", e)
             return False
+
+    def parseDataStreamMsg(self, msg:bytes, seq:int):
+        try:
+            self._data_stream_msg = DataStreamMsg(seq, monotonic(), *_DATA_STREAM.decode(msg))
+            self._logger.debug("data_stream_ack= (%s)", self._data_stream_msg.data_type)
+            return True
+        except Exception as e:
+            self._logger.error("Error %s", e)
+            return False
+
+    def parseGenericMsg(self, cmd_id:int, msg:bytes, seq:int):
+        """
+        Decodes messages that have a schema in SCHEMAS but no handler. See getMsg()
+        """
+        try:
+            self._generic_msgs[cmd_id] = (seq, monotonic(), SCHEMAS[cmd_id].response.decodeDict(msg))
+            return True
+        except Exception as e:
+            self._logger.error("Error %s", e)
+            return False
               
     ##################################################
     #           Backand Request functions            #
     ##################################################    
     def requestFirmwareVersion(self):
-        msg = self._out_msg.firmwareVerMsg()
+        msg = self._out_msg.firmwareVerFrame()
         if not self.sendMsg(msg):
             return False
         return True
     
     def requestMoiton(self):
-        msg = self._out_msg.MoutionMsg()
+        msg = self._out_msg.MoutionFrame()
         if not self.sendMsg(msg):
             return False
+        return True
 
     def requestZoomIn(self):
-        msg = self._out_msg.zoomInMsg()
+        msg = self._out_msg.zoomInFrame()
         if not self.sendMsg(msg):
             return False
         return True
@@ -652,7 +1283,7 @@ class SIYISDK:
         --
         [bool] True: success. False: fail
         """
-        msg = self._out_msg.zoomOutMsg()
+        msg = self._out_msg.zoomOutFrame()
         if not self.sendMsg(msg):
             return False
         return True
@@ -665,72 +1296,91 @@ class SIYISDK:
         --
         [bool] True: success. False: fail
         """
-        msg = self._out_msg.stopZoomMsg()
+        msg = self._out_msg.stopZoomFrame()
         if not self.sendMsg(msg):
             return False
         return True
 
-    def getAttitude(self):
-        while True:
-            self.requestGimbalAttitude()
-            if len(str(self._att_msg.yaw)) :
-                break
-            sleep(0.2)
-        return(self._att_msg.yaw, self._att_msg.pitch, self._att_msg.roll)
+    def getAttitude(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        att = self._requestReply('_att_msg', COMMAND.ACQUIRE_GIMBAL_ATT, self.requestGimbalAttitude,
+                                 timeout, retries, max_age)
+        if att is None:
+            return None
+        return(att.yaw, att.pitch, att.roll)
+
+    def enableAttitudeHistory(self, capacity=65536):
+        """
+        Keeps the last capacity attitude replies in an AttitudeHistory, to get the attitude at
+        any time with interpolate(). Requires numpy
+
+        Returns
+        --
+        [AttitudeHistory]
+        """
+        from siyi_history import AttitudeHistory
+        if self._att_history is None or self._att_history.capacity!=capacity:
+            self._att_history = AttitudeHistory(capacity)
+        return self._att_history
+
+    def getAttitudeHistory(self):
+        """
+        Returns the AttitudeHistory, None if enableAttitudeHistory() was not called
+        """
+        return self._att_history
 
     def getAttitudeSpeed(self):
         return(self._att_msg.yaw_speed, self._att_msg.pitch_speed, self._att_msg.roll_speed)
 
     def requestGimbalAttitude(self):
-        msg = self._out_msg.gimbalAttMsg()
+        msg = self._out_msg.gimbalAttFrame()
         if not self.sendMsg(msg):
             return False
         return True
      
     def requestMaxMinTemp(self):
-        msg = self._out_msg.AllTempMsg()
+        msg = self._out_msg.AllTempFrame()
         if not self.sendMsg(msg):
             return False
         return True
     
     def requestRangeFinder(self):
-        msg = self._out_msg.RangeFinderMsg()
+        msg = self._out_msg.RangeFinderFrame()
         if not self.sendMsg(msg):
             return False
         return True
     
     def requestInfCMap(self):
-        msg = self._out_msg.InfColorMapMsg()
+        msg = self._out_msg.InfColorMapFrame()
         if not self.sendMsg(msg):
             return False
         return True   
       
     def requestInfImageMode(self):
-        msg = self._out_msg.InfImageModMsg()
+        msg = self._out_msg.InfImageModFrame()
         if not self.sendMsg(msg):
             return False
         return True 
          
     def requestbackand_RangefinderStatus(self):
-        msg = self._out_msg.RangefinderStatusMsg()
+        msg = self._out_msg.RangefinderStatusFrame()
         if not self.sendMsg(msg):
             return False
         return True 
     
     def requestbackand_ThermalGain(self):
-        msg = self._out_msg.ThermalGainMsg()
+        msg = self._out_msg.ThermalGainFrame()
         if not self.sendMsg(msg):
             return False
         return True 
     
     def requestbackand_ThermalMAP(self):
-        msg = self._out_msg.ThermalMAPMsg()
+        msg = self._out_msg.ThermalMAPFrame()
         if not self.sendMsg(msg):
             return False
         return True 
     
     def requestbackand_ThermalParams(self):
-        msg = self._out_msg.ThermalParamsGetMsg()
+        msg = self._out_msg.ThermalParamsGetFrame()
         if not self.sendMsg(msg):
             return False
         return True 
@@ -740,19 +1390,22 @@ class SIYISDK:
     ################################################## 
     
     def requestAutoFocus(self):
-        msg = self._out_msg.autoFocusMsg()
+        msg = self._out_msg.autoFocusFrame()
         if not self.sendMsg(msg):
             return False
         return True
     
     def requestCenterGimbal(self):
-        msg = self._out_msg.centerMsg()
+        msg = self._out_msg.centerFrame()
         if not self.sendMsg(msg):
             return False
         return True
 
     def requestZoomSet(self, target_zoom, tolerance=0.5):
         current_zoom = self.getZoomLevel()
+        if current_zoom is None:
+            self._logger.error("Could not read the zoom level")
+            return False
         zoom_step_delay = 0.5  # Başlangıçta her zoom adımı arasında bekleme süresi (saniye cinsinden)
 
         while abs(current_zoom - target_zoom) > tolerance:
@@ -768,102 +1421,246 @@ class SIYISDK:
 
             # Durumu tekrar kontrol et
             current_zoom = self.getZoomLevel()
+            if current_zoom is None:
+                self._logger.error("Could not read the zoom level")
+                return False
 
             # Hedefe yaklaştıkça bekleme süresini azalt
             if abs(current_zoom - target_zoom) < 5:
                 zoom_step_delay = 0.1
         self.requestZoomHold()
         self.requestAutoFocus()
+        return True
 
     def requestPhoto(self):
-        msg = self._out_msg.takePhotoMsg()
+        msg = self._out_msg.takePhotoFrame()
         if not self.sendMsg(msg):
             return False
         return True
 
     def requestRecording(self):
-        msg = self._out_msg.recordMsg()
+        msg = self._out_msg.recordFrame()
         if not self.sendMsg(msg):
             return False
         return True
 
     def requestFPVMode(self):
-        msg = self._out_msg.fpvModeMsg()
+        msg = self._out_msg.fpvModeFrame()
         if not self.sendMsg(msg):
             return False
         return True
 
     def requestLockMode(self):
-        msg = self._out_msg.lockModeMsg()
+        msg = self._out_msg.lockModeFrame()
         if not self.sendMsg(msg):
             return False
         return True
 
     def requestFollowMode(self):
-        msg = self._out_msg.followModeMsg()
+        msg = self._out_msg.followModeFrame()
         if not self.sendMsg(msg):
             return False
         return True
 
     def requestColorMap(self,color):
-        msg = self._out_msg.ColorMapMsg(color)
+        msg = self._out_msg.ColorMapFrame(color)
         if not self.sendMsg(msg):
             return False
         return True        
     
     def requestImageModChange(self,mode):
-        msg = self._out_msg.ImageModMsg(mode)
+        msg = self._out_msg.ImageModFrame(mode)
         if not self.sendMsg(msg):
             return False
         return True    
     
     def requestPointTemp(self,pointx,pointy):
-        msg = self._out_msg.PointTempMsg(pointx,pointy)
+        msg = self._out_msg.PointTempFrame(pointx,pointy)
         if not self.sendMsg(msg):
             return False
         return True
     
     def requestBoxTemp(self,startx,starty,endx,endy):
-        msg = self._out_msg.BoxTempMsg(startx,starty,endx,endy)
+        msg = self._out_msg.BoxTempFrame(startx,starty,endx,endy)
         if not self.sendMsg(msg):
             return False
         return True
     
     def requestGimbalAngle(self,yaw_angle:int,pitch_angle:int):
-        msg = self._out_msg.gimbalTargetMsg(yaw_angle*10, pitch_angle*10)
+        msg = self._out_msg.gimbalTargetFrame(yaw_angle, pitch_angle)
         if not self.sendMsg(msg):
             return False
         return True
    
     def requestRangefinderStatus(self,state):
-        msg = self._out_msg.RangefinderStatusSendMsg(state)
+        msg = self._out_msg.RangefinderStatusSendFrame(state)
         if not self.sendMsg(msg):
             return False
         return True 
     
     def requestThermalGain(self,gain):
-        msg = self._out_msg.ThermalGainSendMsg(gain)
+        msg = self._out_msg.ThermalGainSendFrame(gain)
         if not self.sendMsg(msg):
             return False
         return True
     
     def requestThermalRAWData(self,mode):
-        msg = self._out_msg.ThermalRAWDataMsg(mode)
-        if not self.sendMsg(msg):
-            return False
-        sleep(0.5)
-        if self._thermal_rawdata_msg.mode !='':             
-            return self._thermal_rawdata_msg.mode
+        raw = self._requestReply('_thermal_rawdata_msg', COMMAND.Thermal_Raw_data,
+                                 lambda: self.sendMsg(self._out_msg.ThermalRAWDataFrame(mode)))
+        if raw is None:
+            return None
+        return raw.mode
     
     def requestThermalParams(self,Distance,Target_emission_rate,Humidity,Atmospheric_Temperature,Reflection_Temperature):
-        msg = self._out_msg.ThermalParamsSendMsg(Distance,Target_emission_rate,Humidity,Atmospheric_Temperature,Reflection_Temperature)
+        msg = self._out_msg.ThermalParamsSendFrame(Distance,Target_emission_rate,Humidity,Atmospheric_Temperature,Reflection_Temperature)
         if not self.sendMsg(msg):
             return False
         return True 
    
+    def requestDataStream(self, data_type, freq, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES):
+        """
+        Makes the gimbal push data_type at freq Hz. Pushed frames are handled like replies,
+        e.g. an attitude stream updates getAttitude(max_age=...) and the attitude poll stops
+        while pushed frames keep arriving. Without an acknowledgement, e.g. on firmware without
+        data streams, the SDK keeps polling
+
+        Params
+        --
+        - data_type [int] DATA_STREAM_TYPE value
+        - freq [int] Rate in Hz, one of DATA_STREAM_FREQS. 0 stops the stream
+
+        Returns
+        --
+        [bool] True if the gimbal acknowledged the request
+        """
+        msg = self._out_msg.dataStreamFrame(data_type, freq)
+        ack = self._requestReply('_data_stream_msg', COMMAND.DATA_STREAM, lambda: self.sendMsg(msg),
+                                 timeout, retries)
+        return self._setStream(data_type, freq, ack)
+
+    def _setStream(self, data_type, freq, ack):
+        if ack is None or ack.data_type!=data_type:
+            self._logger.warning("Data stream %s not acknowledged, polling is used instead", data_type)
+            self._streams.pop(data_type, None)
+            return False
+        if freq:
+            self._streams[data_type] = freq
+        else:
+            self._streams.pop(data_type, None)
+        return True
+
+    def stopDataStream(self, data_type, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES):
+        return self.requestDataStream(data_type, 0, timeout, retries)
+
+    def getDataStreams(self):
+        """
+        Returns
+        --
+        [dict] Rate in Hz of each acknowledged data stream, by DATA_STREAM_TYPE value
+        """
+        return dict(self._streams)
+
+    def submit(self, cmd_id, *values, timeout=None):
+        """
+        Sends a request with its own sequence number and returns without waiting.
+        Many requests can be in flight at once, each reply completes the future of its request
+
+        Params
+        --
+        - cmd_id [int] Command ID. Hex strings from COMMAND are accepted too
+        - values: Request field values, in the order of the schema in SCHEMAS
+        - timeout [float] Seconds until the future fails with TimeoutError. Default REPLY_TIMEOUT
+
+        Returns
+        --
+        [concurrent.futures.Future] Resolved with the reply record, see _replyResult()
+        """
+        cmd_id = cmdId(cmd_id)
+        msg = self._out_msg.encodeCommand(cmd_id, *values)
+        seq = self._out_msg.frameSeq(msg)
+        # Register before sending, the reply can be faster than the return of sendto.
+        # The lock keeps the send order equal to the registration order, which is
+        # what replies without an echoed seq are matched against
+        with self._submit_lock:
+            future = self._inflight.add(seq, cmd_id, timeout)
+            sent = self.sendMsg(msg)
+        if not sent:
+            self._inflight.fail(seq, OSError("Could not send request of CMD ID %02x" % cmd_id))
+        self._inflight.expire()
+        return future
+
+    def pipeline(self, requests, window=16, timeout=None):
+        """
+        Sends many requests while keeping up to window of them in flight
+
+        Params
+        --
+        - requests: Iterable of (cmd_id, value, ...) tuples
+        - window [int] Maximum number of requests in flight
+        - timeout [float] Seconds to wait for each reply. Default REPLY_TIMEOUT
+
+        Returns
+        --
+        [list] Reply of each request, in order. None for requests that failed or timed out
+        """
+        if timeout is None:
+            timeout = self._inflight.timeout
+        futures = []
+        results = []
+        for request in requests:
+            if len(futures)-len(results) >= window:
+                results.append(self._futureResult(futures[len(results)], timeout))
+            futures.append(self.submit(*request, timeout=timeout))
+        while len(results) < len(futures):
+            results.append(self._futureResult(futures[len(results)], timeout))
+        return results
+
+    def _futureResult(self, future, timeout):
+        try:
+            return future.result(timeout)
+        except (TimeoutError, FutureTimeoutError):
+            self._logger.warning("No reply within %s second(s)", timeout)
+        except Exception as e:
+            self._logger.error("Error %s", e)
+        return None
+
+    def _query(self, cmd_id, values, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES):
+        """
+        submit() with retries. Returns the reply record, None if there was no reply
+        """
+        for attempt in range(retries+1):
+            result = self._futureResult(self.submit(cmd_id, *values, timeout=timeout), timeout)
+            if result is not None:
+                return result
+        return None
+
+    def requestCommand(self, cmd_id, *values):
+        """
+        Sends any command that has a request schema in SCHEMAS
+
+        Params
+        --
+        - cmd_id [int] Command ID. Hex strings from COMMAND are accepted too
+        - values: Request field values, in the order of the schema
+        """
+        msg = self._out_msg.encodeCommand(cmd_id, *values)
+        if not self.sendMsg(msg):
+            return False
+        return True
+
     ##################################################
     #                   Get functions                #
     ##################################################
+    def getMsg(self, cmd_id):
+        """
+        Returns the last reply of a command that is decoded from its schema only
+
+        Returns
+        --
+        [tuple] (seq, stamp, {field name: value}). None if nothing is received yet
+        """
+        return self._generic_msgs.get(cmdId(cmd_id))
+
     def getGimbalFirmwareVersion(self):
         return(self._fw_msg.gimbal_firmware_ver)
     
@@ -873,92 +1670,91 @@ class SIYISDK:
     def getHardwareID(self):
         return(self._hw_msg.id)
 
-    def getMotionMode(self):
-        while True:
-            self.requestMoiton()
-            if len(self._gmm_msg.gimbal_moution_mode) :
-                break
-        return self._gmm_msg.gimbal_moution_mode
-
-    def getZoomLevel(self):  
-        while True:
-            self.requestZoomHold()
-            if self._manualZoom_msg.level != -1 :
-                break
-        return(self._manualZoom_msg.level)
-
-    def getMaxMinTemprature(self):
-        while True:
-            self.requestMaxMinTemp()
-            if self._temp_msg.temp_max:
-                break
-        return(self._temp_msg.temp_max, self._temp_msg.temp_max_x, self._temp_msg.temp_max_y,
-               self._temp_msg.temp_min, self._temp_msg.temp_min_x, self._temp_msg.temp_min_y)
-
-    def getRangeFinder(self):
-        self.requestRangeFinder()
-        while True:
-            self.requestRangeFinder()
-            if self._rangefinder_msg.Range_value != '':
-                break
-        return(self._rangefinder_msg.Range_value)
+    def getMotionMode(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        gmm = self._requestReply('_gmm_msg', COMMAND.ACQUIRE_GIMBAL_MOUTION, self.requestMoiton,
+                                 timeout, retries, max_age)
+        if gmm is None:
+            return None
+        return gmm.gimbal_moution_mode
+
+    def getZoomLevel(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        zoom = self._requestReply('_manualZoom_msg', COMMAND.MANUAL_ZOOM, self.requestZoomHold,
+                                  timeout, retries, max_age)
+        if zoom is None:
+            return None
+        return(zoom.level)
+
+    def getMaxMinTemprature(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        temp = self._requestReply('_temp_msg', COMMAND.Max_Min_Temp, self.requestMaxMinTemp,
+                                  timeout, retries, max_age)
+        if temp is None:
+            return None
+        return(temp.temp_max, temp.temp_max_x, temp.temp_max_y,
+               temp.temp_min, temp.temp_min_x, temp.temp_min_y)
+
+    def getRangeFinder(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        rf = self._requestReply('_rangefinder_msg', COMMAND.RANGE_FİNDER, self.requestRangeFinder,
+                                timeout, retries, max_age)
+        if rf is None:
+            return None
+        return(rf.Range_value)
     
-    def getBoxTemprature(self,startx,starty,endx,endy):
-        while True:
-            self.requestBoxTemp(startx,starty,endx,endy)
-            if self._box_temp_msg.temp_max !='':
-                break
-        return(   self._box_temp_msg.temp_max, self._box_temp_msg.temp_max_x, self._box_temp_msg.temp_max_y,
-                  self._box_temp_msg.temp_min, self._box_temp_msg.temp_min_x, self._box_temp_msg.temp_min_y)
-
-    def getPointTemprature(self,pointx,pointy):
-        while True:
-            self.requestPointTemp(pointx,pointy)
-            if self._point_temp_msg.temprature !='':
-                break
-        return (self._point_temp_msg.temprature,self._point_temp_msg.temp_point_x,self._point_temp_msg.temp_point_y)
+    def getBoxTemprature(self,startx,starty,endx,endy, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES):
+        # Matched by sequence number, so concurrent callers get their own box
+        box = self._query(COMMAND.BOX_TEMP, (startx, starty, endx, endy, 1), timeout, retries)
+        if box is None:
+            return None
+        return(   box.temp_max, box.temp_max_x, box.temp_max_y,
+                  box.temp_min, box.temp_min_x, box.temp_min_y)
+
+    def getPointTemprature(self,pointx,pointy, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES):
+        # Matched by sequence number, so concurrent callers get their own point
+        point = self._query(COMMAND.POINT_TEMP, (pointx, pointy, 1), timeout, retries)
+        if point is None:
+            return None
+        return (point.temprature, point.temp_point_x, point.temp_point_y)
    
-    def getColorMap(self):
-        while True:
-            self.requestInfCMap()
-            if self._color_map_msg.seq !=0:
-                break
-        return self._color_map_msg.pseudo_color
+    def getColorMap(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        cmap = self._requestReply('_color_map_msg', COMMAND.INF_COLOR_MAP, self.requestInfCMap,
+                                  timeout, retries, max_age)
+        if cmap is None:
+            return None
+        return cmap.pseudo_color
     
-    def getImageMod(self):
-        while True:
-            self.requestInfImageMode()
-            if self._image_mod_msg.vdisp_mode !='':
-                break
-        return self._image_mod_msg.vdisp_mode
-
-    def getRangefinderStatus(self):
-        while True:
-            self.requestbackand_RangefinderStatus()
-            if self._rangefinder_params_msg.laser_state !='':
-                break
-        return self._rangefinder_params_msg.laser_state
+    def getImageMod(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        mode = self._requestReply('_image_mod_msg', COMMAND.IMAGE_MOD, self.requestInfImageMode,
+                                  timeout, retries, max_age)
+        if mode is None:
+            return None
+        return mode.vdisp_mode
+
+    def getRangefinderStatus(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        status = self._requestReply('_rangefinder_params_msg', COMMAND.Range_finder_params_get,
+                                    self.requestbackand_RangefinderStatus, timeout, retries, max_age)
+        if status is None:
+            return None
+        return status.laser_state
     
-    def getThermalGain(self):
-        while True:
-            self.requestbackand_ThermalGain()
-            if self._thermal_gain_msg.gain_status !='':
-                break
-        return self._thermal_gain_msg.gain_status
+    def getThermalGain(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        gain = self._requestReply('_thermal_gain_msg', COMMAND.Thermal_Gain_Get,
+                                  self.requestbackand_ThermalGain, timeout, retries, max_age)
+        if gain is None:
+            return None
+        return gain.gain_status
     
-    def getThermalMAP(self):
-        while True:
-            self.requestbackand_ThermalMAP()
-            if self._thermal_tempmap_msg.ack !='':
-                break
-        return self._thermal_tempmap_msg.ack
+    def getThermalMAP(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        tmap = self._requestReply('_thermal_tempmap_msg', COMMAND.Thermal_Map,
+                                  self.requestbackand_ThermalMAP, timeout, retries, max_age)
+        if tmap is None:
+            return None
+        return tmap.ack
     
-    def getThermalParams(self):
-        while True:
-            self.requestbackand_ThermalParams()
-            if self._thermal_params_msg.Distance !='':
-                break
-        return self._thermal_params_msg.Distance,self._thermal_params_msg.Target_emission_rate,self._thermal_params_msg.Humidity,self._thermal_params_msg.Atmospheric_Temperature,self._thermal_params_msg.Reflection_Temperature 
+    def getThermalParams(self, timeout=REPLY_TIMEOUT, retries=REPLY_RETRIES, max_age=None):
+        params = self._requestReply('_thermal_params_msg', COMMAND.Thermal_Params_Get,
+                                    self.requestbackand_ThermalParams, timeout, retries, max_age)
+        if params is None:
+            return None
+        return params.Distance,params.Target_emission_rate,params.Humidity,params.Atmospheric_Temperature,params.Reflection_Temperature 
                   
 def test():
     cam=SIYISDK(debug=False)
@@ -0,0 +1,179 @@
+"""
+Latest telemetry of a SIYISDK in shared memory, for readers in other processes
+
+The SDK process writes the last attitude, zoom level and rangefinder value into a
+multiprocessing.shared_memory block whenever one of them is received. Readers attach to
+the block by name and copy a consistent snapshot without syscalls, locks or pickling:
+the block is guarded by a seqlock, a counter the writer makes odd while it writes, and
+each record carries a CRC-32 against torn reads on weakly ordered CPUs.
+
+    # SDK process
+    cam.publishTelemetry("siyi_cam0")
+
+    # Any other process
+    reader = TelemetryReader("siyi_cam0")
+    snap = reader.read()
+    print(snap.yaw, snap.pitch, snap.zoom_level, snap.range_value)
+
+Stamps are time.monotonic() receive times. The monotonic clock is shared by all processes
+of a machine, so monotonic()-snap.att_stamp is the age of the attitude in any process.
+"""
+import struct
+import threading
+from collections import namedtuple
+from multiprocessing import shared_memory, resource_tracker
+from time import time
+from zlib import crc32
+from siyi_message import COMMAND, cmdId
+
+MAGIC = b'SIYT'
+VERSION = 2
+_HEADER = struct.Struct('<4sHxx')
+_SEQ = struct.Struct('<Q')
+_SEQ_OFFSET = 8
+_PAYLOAD_OFFSET = 16
+
+TelemetrySnapshot = namedtuple('TelemetrySnapshot',
+                               'wall_time updates connected '
+                               'att_stamp yaw pitch roll yaw_speed pitch_speed roll_speed '
+                               'zoom_stamp zoom_level range_stamp range_value')
+_PAYLOAD = struct.Struct('<dQB7x'+'d'*11)
+_CRC = struct.Struct('<I')
+_CRC_OFFSET = _PAYLOAD_OFFSET+_PAYLOAD.size
+SIZE = _CRC_OFFSET+_CRC.size
+
+# Blocks created by this process. Processes forked from it share its resource tracker,
+# where the block is registered once for its owner
+_published = set()
+
+# Replies that update the snapshot
+TELEMETRY_CMDS = (cmdId(COMMAND.ACQUIRE_GIMBAL_ATT), cmdId(COMMAND.MANUAL_ZOOM), cmdId(COMMAND.RANGE_FİNDER))
+
+
+class TelemetryPublisher:
+    def __init__(self, name=None) -> None:
+        """
+        Creates the shared memory block. There must be a single writer per block
+
+        Params
+        --
+        - name [str] Block name readers attach to. A random one if None, see name
+        """
+        self._shm = shared_memory.SharedMemory(name, create=True, size=SIZE)
+        self.name = self._shm.name
+        # Held while writing, so close() on another thread never unmaps a block being written
+        self._lock = threading.Lock()
+        _published.add(self._shm._name)
+        self._buf = self._shm.buf
+        _HEADER.pack_into(self._buf, 0, MAGIC, VERSION)
+        self._seq = 0
+        self.updates = 0
+        _SEQ.pack_into(self._buf, _SEQ_OFFSET, 0)
+        _CRC.pack_into(self._buf, _CRC_OFFSET, crc32(self._buf[_PAYLOAD_OFFSET:_CRC_OFFSET]))
+        self.watch = [False]*256
+        for cmd_id in TELEMETRY_CMDS:
+            self.watch[cmd_id] = True
+
+    def publish(self, cam):
+        """
+        Writes the current state records of cam. Does nothing once closed
+        """
+        att = cam._att_msg
+        zoom = cam._manualZoom_msg
+        rng = cam._rangefinder_msg
+        with self._lock:
+            buf = self._buf
+            if buf is None:
+                return
+            self.updates += 1
+            seq = self._seq
+            _SEQ.pack_into(buf, _SEQ_OFFSET, seq+1) # odd: write in progress
+            _PAYLOAD.pack_into(buf, _PAYLOAD_OFFSET, time(), self.updates, bool(cam._connected),
+                               att.stamp, att.yaw, att.pitch, att.roll, att.yaw_speed, att.pitch_speed, att.roll_speed,
+                               zoom.stamp, zoom.level, rng.stamp, rng.Range_value)
+            _CRC.pack_into(buf, _CRC_OFFSET, crc32(buf[_PAYLOAD_OFFSET:_CRC_OFFSET]))
+            _SEQ.pack_into(buf, _SEQ_OFFSET, seq+2)
+            self._seq = seq+2
+
+    def close(self):
+        """
+        Removes the block. Attached readers keep their mapping until they close
+        """
+        with self._lock:
+            if self._shm is None:
+                return
+            self._buf = None
+            _published.discard(self._shm._name)
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+class TelemetryReader:
+    def __init__(self, name) -> None:
+        """
+        Attaches to the block of a TelemetryPublisher
+
+        Params
+        --
+        - name [str] Block name given to publishTelemetry()
+        """
+        try:
+            self._shm = shared_memory.SharedMemory(name, track=False)
+        except TypeError:
+            # Before Python 3.13 attaching registers the block with the resource tracker,
+            # which would remove it when this process exits. Unless the tracker is the
+            # one of the publisher, where the block must stay registered
+            self._shm = shared_memory.SharedMemory(name)
+            if self._shm._name not in _published:
+                resource_tracker.unregister(self._shm._name, "shared_memory")
+        self._buf = self._shm.buf
+        magic, version = _HEADER.unpack_from(self._buf, 0)
+        if magic!=MAGIC or version!=VERSION:
+            self.close()
+            raise ValueError("%s is not a SIYI telemetry block" % name)
+        self.retries = 0 # reads repeated because the writer was writing
+        self.torn = 0 # of which copies whose checksum did not match
+
+    def read(self, max_tries=10000):
+        """
+        Returns a consistent copy of the latest telemetry
+
+        Returns
+        --
+        [TelemetrySnapshot] None if the writer never let go within max_tries attempts
+        """
+        buf = self._buf
+        seq_unpack = _SEQ.unpack_from
+        for _ in range(max_tries):
+            seq0, = seq_unpack(buf, _SEQ_OFFSET)
+            if seq0 & 1:
+                self.retries += 1
+                continue
+            record = bytes(buf[_PAYLOAD_OFFSET:SIZE])
+            seq1, = seq_unpack(buf, _SEQ_OFFSET)
+            if seq0!=seq1:
+                self.retries += 1
+                continue
+            if crc32(record[:_PAYLOAD.size])!=_CRC.unpack_from(record, _PAYLOAD.size)[0]:
+                # Python has no memory barriers, so the seqlock relies on stores becoming
+                # visible in program order. x86 guarantees that, weakly ordered CPUs such as
+                # ARM do not: the final counter can be seen with part of the old record
+                self.retries += 1
+                self.torn += 1
+                continue
+            return TelemetrySnapshot._make(_PAYLOAD.unpack(record[:_PAYLOAD.size]))
+        return None
+
+    def close(self):
+        if self._shm is None:
+            return
+        self._buf = None
+        self._shm.close()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,641 @@
+"""
+Local SIYI camera simulator, for load and regression tests without hardware
+
+Answers the SIYI protocol over UDP, and TCP if a TCP port is given, with the frame format of
+SIYIMESSAGE and the payloads of SCHEMAS. A GimbalModel moves like a gimbal driven by speed,
+angle and center commands, and a link model adds latency, jitter, loss, duplication and
+corruption to everything the simulator sends.
+
+In-process:
+
+    with SIYISimulator(port=0, latency=0.01, loss=0.05) as sim:
+        cam = SIYISDK(*sim.address)
+        cam.connect()
+        ...
+        print(sim.stats())
+
+Standalone:
+
+    python siyi_simulator.py --port 37260 --tcp-port 37260 --latency 0.02 --jitter 0.005 --loss 0.01
+"""
+import argparse
+import logging
+import math
+import random
+import socket
+import struct
+from time import monotonic, sleep
+from siyi_engine import SelectorEngine
+from siyi_message import (SCHEMAS, COMMAND, DATA_STREAM_TYPE, DATA_STREAM_FREQS, FrameReassembler,
+                          cmdId, buildFrame)
+
+# Sensor size of the simulated thermal camera, in pixels
+THERMAL_WIDTH = 640
+THERMAL_HEIGHT = 512
+
+# Command ID of the frames pushed for each DATA_STREAM_TYPE
+_STREAM_CMDS = {DATA_STREAM_TYPE.ATTITUDE: cmdId(COMMAND.ACQUIRE_GIMBAL_ATT),
+                DATA_STREAM_TYPE.LASER_RANGE: cmdId(COMMAND.RANGE_FİNDER),
+                DATA_STREAM_TYPE.MAGNETIC_ENCODER: cmdId(COMMAND.MAGNETIC_ENCODER),
+                DATA_STREAM_TYPE.MOTOR_VOLTAGE: cmdId(COMMAND.MOTOR_VOLTAGE)}
+_STREAM_RATES = {code: freq for freq, code in DATA_STREAM_FREQS.items()}
+
+
+def _clip(value, low, high):
+    return low if value < low else high if value > high else value
+
+
+class GimbalModel:
+    """
+    State of the simulated camera. Angles move at the commanded speed, or towards the commanded
+    angle with a rate limited proportional controller. The state is advanced lazily to the time
+    of each request, so the model costs nothing between requests
+    """
+    YAW_LIMITS = (-135., 135.)
+    PITCH_LIMITS = (-90., 25.)
+    MAX_RATE = 90. # deg/s, at speed 100 and for angle commands
+    ANGLE_GAIN = 5. # 1/s, of the angle controller
+    ZOOM_RATE = 3. # x/s while zooming in or out
+    MAX_ZOOM = 30.
+    HEIGHT = 50. # m above flat ground, for the rangefinder
+    MAX_RANGE = 1200. # m
+    STEP = 0.005 # s, integration step
+
+    def __init__(self, hw_code=0x6b, clock=monotonic) -> None:
+        """
+
+        Params
+        --
+        - hw_code [int] Hardware ID reported by device_info, see HARDWARE_IDS. ZR10 by default
+        - clock [callable] Time source
+        """
+        self.hw_code = hw_code
+        self._clock = clock
+        self._t = clock()
+        self._t0 = self._t
+
+        self.yaw = self.pitch = self.roll = 0.
+        self.yaw_speed = self.pitch_speed = self.roll_speed = 0.
+        self.speed_cmd = (0., 0.) # deg/s
+        self.target = None # (yaw, pitch) of an angle command
+        self.zoom = 1.
+        self.zoom_dir = 0
+        self.motion_mode = 1 # follow
+        self.color_map = 0
+        self.image_mode = 0
+        self.thermal_gain = 1
+        self.thermal_raw = 0
+        self.thermal_params = (10, 95, 50, 25, 25)
+        self.laser_state = 1
+        self.photos = 0
+        self.recording = False
+
+        # Commands the model answers: cmd_id: function(request values) -> response values.
+        # None as response means the command is accepted without reply
+        c = cmdId
+        self._commands = {
+            c(COMMAND.ACQUIRE_DEVICE_INF): self._deviceInfo,
+            c(COMMAND.AUTO_FOCUS): lambda v: (1,),
+            c(COMMAND.MANUAL_ZOOM): self._manualZoom,
+            c(COMMAND.GIMBAL_ROT): self._gimbalSpeed,
+            c(COMMAND.CENTER): self._center,
+            c(COMMAND.PHOTO_VIDEO_HDR): self._photoVideo,
+            c(COMMAND.ACQUIRE_GIMBAL_ATT): lambda v: self.attitude(),
+            c(COMMAND.TargetAngle): self._targetAngle,
+            c(COMMAND.IMAGE_MOD): lambda v: (self.image_mode,),
+            c(COMMAND.IMAGE_MOD_CHANGE): self._imageMode,
+            c(COMMAND.POINT_TEMP): lambda v: (self.temperature(v[0], v[1]), v[0], v[1]),
+            c(COMMAND.BOX_TEMP): lambda v: tuple(v[:4])+self.temperatureRegion(*v[:4]),
+            c(COMMAND.Max_Min_Temp): lambda v: self.temperatureRegion(0, 0, THERMAL_WIDTH-1, THERMAL_HEIGHT-1),
+            c(COMMAND.RANGE_FİNDER): lambda v: (self.range(),),
+            c(COMMAND.ACQUIRE_GIMBAL_MOUTION): lambda v: (self.motion_mode,),
+            c(COMMAND.INF_COLOR_MAP): lambda v: (self.color_map,),
+            c(COMMAND.COLOR_MAP): self._colorMap,
+            c(COMMAND.Range_finder_params_get): lambda v: (self.laser_state,),
+            c(COMMAND.Range_finder_params_send): self._laserState,
+            c(COMMAND.Thermal_Raw_data): self._thermalRaw,
+            c(COMMAND.Thermal_Map): lambda v: (1,),
+            c(COMMAND.Thermal_Gain_Get): lambda v: (self.thermal_gain,),
+            c(COMMAND.Thermal_Gain_Send): self._thermalGain,
+            c(COMMAND.Thermal_Params_Get): lambda v: self.thermal_params,
+            c(COMMAND.Thermal_Params_Send): self._thermalParams,
+            c(COMMAND.MAGNETIC_ENCODER): lambda v: self.attitude()[:3],
+            c(COMMAND.MOTOR_VOLTAGE): lambda v: self.motorVoltage(),
+            c(COMMAND.DATA_STREAM): lambda v: (v[0],),
+        }
+
+    def answers(self, cmd_id):
+        return cmd_id in self._commands
+
+    def handle(self, cmd_id, values):
+        """
+        Applies a request and returns the values of its response, None if it has no response
+        """
+        self.advance()
+        return self._commands[cmd_id](values)
+
+    ##################################################
+    #                    Dynamics                    #
+    ##################################################
+    def advance(self, now=None):
+        """
+        Integrates the state up to now
+        """
+        if now is None:
+            now = self._clock()
+        dt = now-self._t
+        if dt <= 0.:
+            return
+        self._t = now
+        # Coarser steps after long idle times, at most 200 of them
+        step = max(self.STEP, dt/200.)
+        while dt > 0.:
+            h = min(dt, step)
+            self._step(h)
+            dt -= h
+        # Vibration of the roll axis
+        t = now-self._t0
+        self.roll = 0.2*math.sin(2.*math.pi*3.*t)
+        self.roll_speed = 0.2*2.*math.pi*3.*math.cos(2.*math.pi*3.*t)
+
+    def _step(self, h):
+        if self.target is not None:
+            # Never step past the target, whatever the step length
+            yaw_err = self.target[0]-self.yaw
+            pitch_err = self.target[1]-self.pitch
+            yaw_move = _clip(_clip(self.ANGLE_GAIN*yaw_err, -self.MAX_RATE, self.MAX_RATE)*h, -abs(yaw_err), abs(yaw_err))
+            pitch_move = _clip(_clip(self.ANGLE_GAIN*pitch_err, -self.MAX_RATE, self.MAX_RATE)*h, -abs(pitch_err), abs(pitch_err))
+        else:
+            yaw_move = self.speed_cmd[0]*h
+            pitch_move = self.speed_cmd[1]*h
+        yaw = _clip(self.yaw+yaw_move, *self.YAW_LIMITS)
+        pitch = _clip(self.pitch+pitch_move, *self.PITCH_LIMITS)
+        self.yaw_speed = (yaw-self.yaw)/h
+        self.pitch_speed = (pitch-self.pitch)/h
+        self.yaw, self.pitch = yaw, pitch
+        if self.zoom_dir:
+            self.zoom = _clip(self.zoom+self.zoom_dir*self.ZOOM_RATE*h, 1., self.MAX_ZOOM)
+
+    ##################################################
+    #                  Measurements                  #
+    ##################################################
+    def attitude(self):
+        return (self.yaw, self.pitch, self.roll, self.yaw_speed, self.pitch_speed, self.roll_speed)
+
+    def range(self):
+        """
+        Distance to flat ground along the line of sight, in m. 0 without return
+        """
+        if not self.laser_state or self.pitch > -1.:
+            return 0.
+        return min(self.MAX_RANGE, self.HEIGHT/math.sin(math.radians(-self.pitch)))
+
+    def motorVoltage(self):
+        return tuple(int(speed*10) for speed in (self.yaw_speed, self.pitch_speed, self.roll_speed))
+
+    def temperature(self, x, y):
+        """
+        Scene temperature in degC: 20 degC background with a 70 degC hot spot whose image
+        position follows the gimbal
+        """
+        cx, cy = self._hotSpot()
+        d2 = (x-cx)**2+(y-cy)**2
+        return 20.+50.*math.exp(-d2/(2.*60.**2))
+
+    def _hotSpot(self):
+        # 1 degree is 10 pixels at zoom 1
+        scale = 10.*self.zoom
+        return THERMAL_WIDTH/2.-self.yaw*scale, THERMAL_HEIGHT/2.+self.pitch*scale
+
+    def temperatureRegion(self, startx, starty, endx, endy):
+        """
+        Returns (temp_max, temp_min, temp_max_x, temp_max_y, temp_min_x, temp_min_y) of a box
+        """
+        x0, x1 = sorted((startx, endx))
+        y0, y1 = sorted((starty, endy))
+        cx, cy = self._hotSpot()
+        # The maximum is the point nearest to the hot spot, the minimum the farthest corner
+        max_x = int(_clip(round(cx), x0, x1))
+        max_y = int(_clip(round(cy), y0, y1))
+        min_x = x0 if abs(x0-cx) > abs(x1-cx) else x1
+        min_y = y0 if abs(y0-cy) > abs(y1-cy) else y1
+        return (self.temperature(max_x, max_y), self.temperature(min_x, min_y), max_x, max_y, min_x, min_y)
+
+    ##################################################
+    #                    Commands                    #
+    ##################################################
+    def _deviceInfo(self, values):
+        # code board 3.1.2, gimbal 0.3.2, zoom 1.4.2
+        return (0x030102, 2, 3, 0, self.hw_code, 2, 4, 1)
+
+    def _manualZoom(self, values):
+        self.zoom_dir = 1 if values[0] > 0 else -1 if values[0] < 0 else 0
+        return (round(self.zoom, 1),)
+
+    def _gimbalSpeed(self, values):
+        self.target = None
+        self.speed_cmd = (_clip(values[0], -100, 100)/100.*self.MAX_RATE,
+                          _clip(values[1], -100, 100)/100.*self.MAX_RATE)
+        return (1,)
+
+    def _center(self, values):
+        if values[0]==1:
+            self.target = (0., 0.)
+        return (1,)
+
+    def _photoVideo(self, values):
+        func = values[0]
+        if func==0:
+            self.photos += 1
+        elif func==2:
+            self.recording = not self.recording
+        elif func in (3, 4, 5):
+            self.motion_mode = func-3 # lock, follow, fpv
+        return None
+
+    def _targetAngle(self, values):
+        self.target = (_clip(values[0], *self.YAW_LIMITS), _clip(values[1], *self.PITCH_LIMITS))
+        return self.attitude()[:3]
+
+    def _imageMode(self, values):
+        self.image_mode = values[0]
+        return (self.image_mode,)
+
+    def _colorMap(self, values):
+        self.color_map = values[0]
+        return (self.color_map,)
+
+    def _laserState(self, values):
+        self.laser_state = values[0]
+        return (1,)
+
+    def _thermalRaw(self, values):
+        self.thermal_raw = values[0]
+        return (self.thermal_raw,)
+
+    def _thermalGain(self, values):
+        self.thermal_gain = values[0]
+        return (self.thermal_gain,)
+
+    def _thermalParams(self, values):
+        self.thermal_params = tuple(values)
+        return (1,)
+
+
+class LinkModel:
+    """
+    Impairments applied to every frame sent by the simulator
+    """
+    def __init__(self, latency=0., jitter=0., loss=0., duplicate=0., corrupt=0., seed=None) -> None:
+        """
+
+        Params
+        --
+        - latency [float] Seconds added to every frame
+        - jitter [float] Extra delay drawn uniformly from [0, jitter] seconds. Frames can be reordered
+        - loss [float] Probability of dropping a frame
+        - duplicate [float] Probability of sending a frame twice
+        - corrupt [float] Probability of flipping one bit of a frame, so its CRC check fails
+        - seed: Seed of the random generator, for reproducible runs
+        """
+        for name, p in (('loss', loss), ('duplicate', duplicate), ('corrupt', corrupt)):
+            if not 0. <= p <= 1.:
+                raise ValueError("%s must be a probability, got %s" % (name, p))
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.duplicate = duplicate
+        self.corrupt = corrupt
+        self._random = random.Random(seed)
+
+    def apply(self, frame):
+        """
+        Returns
+        --
+        [list] (delay, frame) to send, empty if the frame is lost
+        """
+        rnd = self._random
+        if self.loss and rnd.random() < self.loss:
+            return []
+        copies = 2 if self.duplicate and rnd.random() < self.duplicate else 1
+        out = []
+        for _ in range(copies):
+            data = frame
+            if self.corrupt and rnd.random() < self.corrupt:
+                data = bytearray(frame)
+                data[rnd.randrange(len(data))] ^= 1 << rnd.randrange(8)
+                data = bytes(data)
+            delay = self.latency+(rnd.uniform(0., self.jitter) if self.jitter else 0.)
+            out.append((delay, data))
+        return out
+
+
+class _Peer:
+    """
+    One client: an UDP address or a TCP connection, with its reassembler and data streams
+    """
+    __slots__ = ('addr', 'conn', 'reassembler', 'streams')
+
+    def __init__(self, addr, conn=None) -> None:
+        self.addr = addr
+        self.conn = conn
+        self.reassembler = FrameReassembler(datagram=conn is None)
+        self.streams = {} # DATA_STREAM_TYPE: Timer
+
+
+class SIYISimulator:
+    def __init__(self, host='127.0.0.1', port=37260, tcp_port=None, model=None,
+                 latency=0., jitter=0., loss=0., duplicate=0., corrupt=0.,
+                 echo_seq=True, seed=None, engine=None) -> None:
+        """
+        Params
+        --
+        - host [str] Interface to listen on
+        - port [int] UDP port. 0 picks a free one, see address
+        - tcp_port [int] TCP port, None for UDP only. 0 picks a free one, see tcp_address
+        - model [GimbalModel] Simulated camera. A ZR10 by default
+        - latency, jitter, loss, duplicate, corrupt: see LinkModel
+        - echo_seq [bool] Replies carry the sequence number of their request. Otherwise
+          the simulator numbers its frames itself
+        - seed: Seed of the link model
+        - engine [SelectorEngine] Engine to run on. The simulator creates and runs its own if None
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.model = GimbalModel() if model is None else model
+        self.link = LinkModel(latency, jitter, loss, duplicate, corrupt, seed)
+        self.echo_seq = echo_seq
+        self._seq = 0
+
+        self._own_engine = engine is None
+        self._engine = SelectorEngine() if engine is None else engine
+
+        # No SO_REUSEADDR on UDP: it lets the kernel give two simulators the same free port
+        self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._udp.bind((host, port))
+        self._udp.setblocking(False)
+        self.address = self._udp.getsockname()
+        self._udp_peers = {}
+
+        self._tcp = None
+        self.tcp_address = None
+        self._tcp_peers = {}
+        if tcp_port is not None:
+            self._tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._tcp.bind((host, tcp_port))
+            self._tcp.listen(16)
+            self._tcp.setblocking(False)
+            self.tcp_address = self._tcp.getsockname()
+
+        self.requests = 0
+        self.replies = 0 # frames handed to the link model, replies and pushed frames
+        self.pushed = 0
+        self.unknown = 0 # requests of commands the model does not answer
+        self.bad_requests = 0 # requests whose payload does not match the schema
+        self.lost = 0
+        self.duplicated = 0
+        self.corrupted = 0
+        self.send_errors = 0
+        self._started = False
+
+    ##################################################
+    #                   Lifecycle                    #
+    ##################################################
+    def start(self):
+        """
+        Starts answering. Runs the engine thread if the simulator owns the engine
+
+        Returns
+        --
+        [SIYISimulator] self
+        """
+        if self._started:
+            return self
+        self._started = True
+        self._engine.addReader(self._udp, self._onUdp)
+        if self._tcp is not None:
+            self._engine.addReader(self._tcp, self._onAccept)
+        self._engine.start()
+        self._logger.info("Simulating a SIYI camera on udp %s:%s%s", self.address[0], self.address[1],
+                          " and tcp %s:%s" % self.tcp_address if self._tcp is not None else "")
+        return self
+
+    def serveForever(self):
+        """
+        Starts the simulator and blocks the calling thread until stop() is called from another
+        thread or Ctrl+C, then closes it. Requests are answered on the engine thread
+        """
+        self.start()
+        try:
+            while self._started:
+                sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def stop(self):
+        if not self._started:
+            return
+        self._started = False
+        for peer in list(self._udp_peers.values())+list(self._tcp_peers.values()):
+            self._stopStreams(peer)
+        self._engine.removeReader(self._udp)
+        if self._tcp is not None:
+            self._engine.removeReader(self._tcp)
+        for conn in list(self._tcp_peers):
+            self._closeConnection(conn)
+        if self._own_engine:
+            self._engine.stop()
+
+    def close(self):
+        self.stop()
+        self._udp.close()
+        if self._tcp is not None:
+            self._tcp.close()
+        if self._own_engine:
+            self._engine.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self):
+        """
+        Returns
+        --
+        [dict] Counters of requests, sent frames and impairments, and the number of clients
+        """
+        peers = list(self._udp_peers.values())+list(self._tcp_peers.values())
+        return {'requests': self.requests,
+                'replies': self.replies,
+                'pushed': self.pushed,
+                'unknown': self.unknown,
+                'bad_requests': self.bad_requests,
+                'crc_errors': sum(peer.reassembler.crc_errors for peer in peers),
+                'lost': self.lost,
+                'duplicated': self.duplicated,
+                'corrupted': self.corrupted,
+                'send_errors': self.send_errors,
+                'clients': len(peers)}
+
+    ##################################################
+    #                   Transports                   #
+    ##################################################
+    def _onUdp(self):
+        # Drain the socket, many requests can be waiting
+        while True:
+            try:
+                buff, addr = self._udp.recvfrom(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                self._logger.error("Receive failed: %s", e)
+                return
+            peer = self._udp_peers.get(addr)
+            if peer is None:
+                peer = self._udp_peers[addr] = _Peer(addr)
+            self._feed(peer, buff)
+
+    def _onAccept(self):
+        try:
+            conn, addr = self._tcp.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        # Blocking with a timeout: reads only happen when the socket is readable,
+        # and sends of a few bytes do not wait unless the client stopped reading
+        conn.settimeout(1.0)
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        peer = self._tcp_peers[conn] = _Peer(addr, conn)
+        self._engine.addReader(conn, lambda: self._onTcp(peer))
+        self._logger.debug("TCP client %s:%s connected", *addr)
+
+    def _onTcp(self, peer):
+        try:
+            buff = peer.conn.recv(4096)
+        except (socket.timeout, BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            buff = b''
+        if not buff:
+            self._closeConnection(peer.conn)
+            return
+        self._feed(peer, buff)
+
+    def _closeConnection(self, conn):
+        peer = self._tcp_peers.pop(conn, None)
+        if peer is None:
+            return
+        self._stopStreams(peer)
+        self._engine.removeReader(conn)
+        conn.close()
+        self._logger.debug("TCP client %s:%s disconnected", *peer.addr)
+
+    def _send(self, peer, frame):
+        self.replies += 1
+        copies = self.link.apply(frame)
+        if not copies:
+            self.lost += 1
+            return
+        if len(copies) > 1:
+            self.duplicated += 1
+        for delay, data in copies:
+            if data is not frame:
+                self.corrupted += 1
+            if delay > 0.:
+                self._engine.callLater(delay, lambda data=data: self._write(peer, data))
+            else:
+                self._write(peer, data)
+
+    def _write(self, peer, data):
+        try:
+            if peer.conn is None:
+                self._udp.sendto(data, peer.addr)
+            elif peer.conn in self._tcp_peers:
+                peer.conn.sendall(data)
+        except OSError as e:
+            self.send_errors += 1
+            self._logger.debug("Send to %s failed: %s", peer.addr, e)
+            if peer.conn is not None:
+                self._closeConnection(peer.conn)
+
+    ##################################################
+    #                    Protocol                    #
+    ##################################################
+    def _frame(self, cmd_id, data, seq=None):
+        if seq is None:
+            self._seq = seq = (self._seq+1) & 0xffff
+        return buildFrame(cmd_id, data, seq)
+
+    def _feed(self, peer, buff):
+        for cmd_id, seq, data in peer.reassembler.feed(buff):
+            self.requests += 1
+            if not self.model.answers(cmd_id):
+                self.unknown += 1
+                self._logger.debug("CMD ID %02x is not simulated", cmd_id)
+                continue
+            schema = SCHEMAS.get(cmd_id)
+            try:
+                values = schema.request.decode(data) if schema is not None and schema.request else ()
+                response = self.model.handle(cmd_id, values)
+                if response is not None:
+                    payload = schema.response.encode(*response)
+            except (struct.error, ValueError, IndexError) as e:
+                self.bad_requests += 1
+                self._logger.debug("Bad request for CMD ID %02x: %s", cmd_id, e)
+                continue
+            if cmd_id==cmdId(COMMAND.DATA_STREAM):
+                self._setStream(peer, values[0], values[1])
+            if response is not None:
+                self._send(peer, self._frame(cmd_id, payload, seq if self.echo_seq else None))
+
+    def _setStream(self, peer, data_type, freq_code):
+        timer = peer.streams.pop(data_type, None)
+        if timer is not None:
+            timer.cancel()
+        freq = _STREAM_RATES.get(freq_code, 0)
+        cmd_id = _STREAM_CMDS.get(data_type)
+        if not freq or cmd_id is None:
+            return
+        peer.streams[data_type] = self._engine.callEvery(1./freq, lambda: self._push(peer, cmd_id))
+
+    def _stopStreams(self, peer):
+        for timer in peer.streams.values():
+            timer.cancel()
+        peer.streams.clear()
+
+    def _push(self, peer, cmd_id):
+        response = self.model.handle(cmd_id, ())
+        self.pushed += 1
+        self._send(peer, self._frame(cmd_id, SCHEMAS[cmd_id].response.encode(*response)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated SIYI camera")
+    parser.add_argument('--host', default='127.0.0.1', help="interface to listen on")
+    parser.add_argument('--port', type=int, default=37260, help="UDP port")
+    parser.add_argument('--tcp-port', type=int, default=None, help="TCP port, UDP only if not given")
+    parser.add_argument('--latency', type=float, default=0., help="seconds added to every frame")
+    parser.add_argument('--jitter', type=float, default=0., help="random extra delay up to this, in seconds")
+    parser.add_argument('--loss', type=float, default=0., help="probability of dropping a frame")
+    parser.add_argument('--duplicate', type=float, default=0., help="probability of sending a frame twice")
+    parser.add_argument('--corrupt', type=float, default=0., help="probability of corrupting a frame")
+    parser.add_argument('--no-echo-seq', action='store_true', help="do not echo request sequence numbers")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--hw-id', type=lambda s: int(s, 16), default=0x6b,
+                        help="hardware ID in hex, e.g. 73 for an A8 mini")
+    parser.add_argument('--stats', type=float, default=0., help="print counters every this many seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(format=' [%(levelname)s] %(asctime)s [%(name)s] :\t%(message)s', level=logging.INFO)
+    sim = SIYISimulator(args.host, args.port, args.tcp_port, GimbalModel(args.hw_id),
+                        args.latency, args.jitter, args.loss, args.duplicate, args.corrupt,
+                        not args.no_echo_seq, args.seed)
+    if args.stats > 0.:
+        sim._engine.callEvery(args.stats, lambda: print(sim.stats(), flush=True), args.stats)
+    sim.serveForever()
+
+if __name__=="__main__":
+    main()
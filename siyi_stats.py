@@ -0,0 +1,278 @@
+"""
+Round trip time statistics of SIYI requests
+
+Every request that expects a reply is timestamped when it is sent. Its reply is matched by
+sequence number when the camera echoes it, otherwise with the oldest request of the same
+command ID. Requests without reply after the timeout are counted as lost.
+"""
+import math
+import socket
+import struct
+import sys
+import threading
+from collections import deque
+from time import monotonic
+from siyi_message import SCHEMAS
+
+# Kernel receive timestamps. The socket module does not export these on every version
+if sys.platform.startswith('linux'):
+    SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35)
+else:
+    SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', None)
+_TIMESPEC = struct.Struct('@qq')
+
+
+def enableKernelTimestamps(sock):
+    """
+    Asks the kernel to stamp received datagrams, see recvWithTimestamp()
+
+    Returns
+    --
+    [bool] False if the platform or the socket does not support it
+    """
+    if SO_TIMESTAMPNS is None or not hasattr(sock, 'recvmsg'):
+        return False
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+    except OSError:
+        return False
+    return True
+
+def recvWithTimestamp(sock, bufsize):
+    """
+    recvfrom() that also returns the kernel receive time
+
+    Returns
+    --
+    [tuple] (data, addr, wall clock receive time). The time is None if the kernel did not stamp it
+    """
+    data, ancdata, flags, addr = sock.recvmsg(bufsize, socket.CMSG_SPACE(_TIMESPEC.size))
+    for level, kind, cmsg in ancdata:
+        if level==socket.SOL_SOCKET and kind==SO_TIMESTAMPNS and len(cmsg) >= _TIMESPEC.size:
+            sec, nsec = _TIMESPEC.unpack_from(cmsg)
+            return data, addr, sec+nsec*1e-9
+    return data, addr, None
+
+
+class LatencyHistogram:
+    """
+    Fixed memory histogram with logarithmic buckets. Percentiles are accurate to the
+    bucket width, about 6% with the default 40 buckets per decade
+    """
+    def __init__(self, lowest=1e-5, highest=100., per_decade=40) -> None:
+        """
+
+        Params
+        --
+        - lowest [float] Upper bound of the first bucket, in seconds
+        - highest [float] Values above go to the last bucket
+        - per_decade [int] Buckets per factor of 10
+        """
+        self._lowest = lowest
+        self._per_decade = per_decade
+        self._scale = per_decade/math.log(10.)
+        self._log_lowest = math.log(lowest)
+        self._buckets = [0]*(int(math.ceil(math.log10(highest/lowest)*per_decade))+2)
+        self.count = 0
+        self.total = 0.
+        self.min = math.inf
+        self.max = 0.
+
+    def record(self, value):
+        if value <= self._lowest:
+            i = 0
+        else:
+            i = min(int((math.log(value)-self._log_lowest)*self._scale)+1, len(self._buckets)-1)
+        self._buckets[i] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def _bucketValue(self, i):
+        """
+        Geometric middle of bucket i
+        """
+        if i==0:
+            return self._lowest
+        return self._lowest*10**((i-0.5)/self._per_decade)
+
+    def percentile(self, p):
+        """
+        Returns the p-th percentile (0-100). None if the histogram is empty
+        """
+        if self.count==0:
+            return None
+        rank = max(1, int(math.ceil(p/100.*self.count)))
+        seen = 0
+        for i, n in enumerate(self._buckets):
+            seen += n
+            if seen >= rank:
+                return min(max(self._bucketValue(i), self.min), self.max)
+        return self.max
+
+    def summary(self, scale=1e3):
+        """
+        Returns
+        --
+        [dict] count, mean, min, max, p50, p95, p99, multiplied by scale (ms by default)
+        """
+        if self.count==0:
+            return {'count': 0}
+        return {'count': self.count,
+                'mean': self.total/self.count*scale,
+                'min': self.min*scale,
+                'max': self.max*scale,
+                'p50': self.percentile(50)*scale,
+                'p95': self.percentile(95)*scale,
+                'p99': self.percentile(99)*scale}
+
+
+class _CommandRTT:
+    __slots__ = ('outstanding', 'sent', 'replies', 'timeouts', 'rtt', 'kernel_rtt', 'srtt', 'rttvar')
+
+    def __init__(self) -> None:
+        self.outstanding = deque() # (seq, monotonic send time, wall clock send time)
+        self.sent = 0
+        self.replies = 0
+        self.timeouts = 0
+        self.rtt = LatencyHistogram()
+        self.kernel_rtt = LatencyHistogram()
+        # Smoothed round trip time and its variation, as in TCP (RFC 6298)
+        self.srtt = None
+        self.rttvar = 0.
+
+
+class RTTTracker:
+    def __init__(self, timeout=1.0) -> None:
+        """
+
+        Params
+        --
+        - timeout [float] Seconds after which a request without reply is counted as lost
+        """
+        self.timeout = timeout
+        self.unsolicited = 0 # replies without request, e.g. pushed data streams
+        self._lock = threading.Lock()
+        self._commands = {}
+        # Only commands with a reply are tracked
+        self._tracked = [cmd_id in SCHEMAS and SCHEMAS[cmd_id].response is not None for cmd_id in range(256)]
+
+    def _command(self, cmd_id):
+        command = self._commands.get(cmd_id)
+        if command is None:
+            command = self._commands[cmd_id] = _CommandRTT()
+        return command
+
+    def _expire(self, command, now):
+        outstanding = command.outstanding
+        while outstanding and now-outstanding[0][1] > self.timeout:
+            outstanding.popleft()
+            command.timeouts += 1
+
+    def sent(self, cmd_id, seq, now, wall=None):
+        """
+        Records a request sent at monotonic time now, and wall clock time wall if kernel
+        timestamps are used
+        """
+        if not self._tracked[cmd_id]:
+            return
+        with self._lock:
+            command = self._command(cmd_id)
+            self._expire(command, now)
+            command.outstanding.append((seq, now, wall))
+            command.sent += 1
+
+    def received(self, cmd_id, seq, now, kernel_wall=None):
+        """
+        Matches a reply received at monotonic time now with its request
+
+        Params
+        --
+        - kernel_wall [float] Wall clock receive time from the kernel, if available
+
+        Returns
+        --
+        [float] Round trip time in seconds. None if no request was waiting
+        """
+        if not self._tracked[cmd_id]:
+            return None
+        with self._lock:
+            command = self._commands.get(cmd_id)
+            if command is None or not command.outstanding:
+                self.unsolicited += 1
+                return None
+            self._expire(command, now)
+            outstanding = command.outstanding
+            if not outstanding:
+                self.unsolicited += 1
+                return None
+            request = None
+            for item in outstanding:
+                if item[0]==seq:
+                    request = item
+                    break
+            if request is None:
+                # seq not echoed, the reply answers the oldest request. Requests older than the
+                # retransmission timeout of TCP were lost, while a newer one is waiting
+                if command.srtt is not None and len(outstanding) > 1:
+                    rto = max(command.srtt+4.*command.rttvar, 2.*command.srtt)
+                    while len(outstanding) > 1 and now-outstanding[0][1] > rto:
+                        outstanding.popleft()
+                        command.timeouts += 1
+                request = outstanding[0]
+            if request is outstanding[0]:
+                outstanding.popleft()
+            else:
+                outstanding.remove(request)
+            rtt = now-request[1]
+            if command.srtt is None:
+                command.srtt = rtt
+                command.rttvar = rtt/2.
+            else:
+                command.rttvar += (abs(command.srtt-rtt)-command.rttvar)/4.
+                command.srtt += (rtt-command.srtt)/8.
+            command.replies += 1
+            command.rtt.record(rtt)
+            if kernel_wall is not None and request[2] is not None:
+                command.kernel_rtt.record(max(0., kernel_wall-request[2]))
+        return rtt
+
+    def reset(self):
+        with self._lock:
+            self._commands = {}
+            self.unsolicited = 0
+
+    def stats(self, now=None):
+        """
+        Returns
+        --
+        [dict] 'commands': per command name, sent, replies, timeouts, in_flight, loss (timeouts
+        over settled requests), rtt_ms and kernel_rtt_ms summaries, see LatencyHistogram.summary().
+        'total': the counters summed over all commands, and unsolicited replies
+        """
+        if now is None:
+            now = monotonic()
+        commands = {}
+        total = {'sent': 0, 'replies': 0, 'timeouts': 0, 'in_flight': 0, 'unsolicited': self.unsolicited}
+        with self._lock:
+            for cmd_id, command in sorted(self._commands.items()):
+                self._expire(command, now)
+                settled = command.replies+command.timeouts
+                entry = {'cmd_id': cmd_id,
+                         'sent': command.sent,
+                         'replies': command.replies,
+                         'timeouts': command.timeouts,
+                         'in_flight': len(command.outstanding),
+                         'loss': command.timeouts/settled if settled else 0.,
+                         'rtt_ms': command.rtt.summary()}
+                if command.kernel_rtt.count:
+                    entry['kernel_rtt_ms'] = command.kernel_rtt.summary()
+                commands[SCHEMAS[cmd_id].name] = entry
+                for key in ('sent', 'replies', 'timeouts', 'in_flight'):
+                    total[key] += entry[key]
+        settled = total['replies']+total['timeouts']
+        total['loss'] = total['timeouts']/settled if settled else 0.
+        return {'commands': commands, 'total': total}
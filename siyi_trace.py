@@ -0,0 +1,210 @@
+"""
+Tracing hooks of the SIYI SDK hot path
+
+Tracing wraps the instance methods of one SIYISDK, so nothing changes and nothing is
+paid while no tracer is set. Stages:
+
+- encode: SIYIMESSAGE.encodeCommand() and the constant request builders
+- send: SIYISDK.sendMsg()
+- receive: SIYISDK.bufferCallback(), including the wait for the datagram
+- dispatch: SIYISDK.feedBuffer(), including reassemble and parse
+- reassemble: FrameReassembler.feed(), i.e. header search, CRC check and payload copy
+- parse:<schema name>: handler of one command ID, e.g. parse:gimbal_attitude
+
+    timer = StageTimer()
+    cam.setTracer(timer)
+    ...
+    print(timer.format())
+
+    trace = ChromeTracer(sample=10)
+    cam.setTracer(trace)
+    ...
+    trace.save("siyi.json")  # open in chrome://tracing or https://ui.perfetto.dev
+
+Wrappers are named after their stage (e.g. siyi_stage_parse_gimbal_attitude), so the stages
+show up in cProfile, py-spy and perf (python -X perf on 3.12+) stacks too.
+"""
+import cProfile
+import json
+import os
+import pstats
+import threading
+from itertools import count
+from time import perf_counter_ns
+
+
+class Tracer:
+    """
+    Base class. enter() is called before each traced call and exit() after it
+
+    Params
+    --
+    - stages: Stages to trace. Prefixes ending with ':' match all parse stages. None traces all
+    - sample [int] Only every sample-th call of each stage is traced
+    """
+    def __init__(self, stages=None, sample=1) -> None:
+        self.stages = None if stages is None else tuple(stages)
+        self.sample = max(1, int(sample))
+
+    def wants(self, stage):
+        if self.stages is None:
+            return True
+        return any(stage==s or (s.endswith(':') and stage.startswith(s)) for s in self.stages)
+
+    def enter(self, stage):
+        return perf_counter_ns()
+
+    def exit(self, stage, token):
+        pass
+
+
+def traced(tracer, stage, func):
+    """
+    Wraps func with the enter and exit hooks of tracer. The original is kept in __wrapped__
+    """
+    enter = tracer.enter
+    exit = tracer.exit
+    if tracer.sample > 1:
+        sample = tracer.sample
+        counter = count()
+        def wrapper(*args, **kwargs):
+            if next(counter) % sample:
+                return func(*args, **kwargs)
+            token = enter(stage)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                exit(stage, token)
+    else:
+        def wrapper(*args, **kwargs):
+            token = enter(stage)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                exit(stage, token)
+    name = "siyi_stage_"+"".join(c if c.isalnum() else '_' for c in stage)
+    code = wrapper.__code__
+    if hasattr(code, 'co_qualname'): # Python 3.11+
+        wrapper.__code__ = code.replace(co_name=name, co_qualname=name)
+    else:
+        wrapper.__code__ = code.replace(co_name=name)
+    wrapper.__name__ = wrapper.__qualname__ = name
+    wrapper.__wrapped__ = func
+    return wrapper
+
+
+class StageTimer(Tracer):
+    """
+    Aggregated timings per stage
+    """
+    def __init__(self, stages=None, sample=1) -> None:
+        super().__init__(stages, sample)
+        self._lock = threading.Lock()
+        self._stages = {} # stage: [count, total ns, max ns]
+
+    def exit(self, stage, token):
+        dt = perf_counter_ns()-token
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                self._stages[stage] = [1, dt, dt]
+            else:
+                entry[0] += 1
+                entry[1] += dt
+                if dt > entry[2]:
+                    entry[2] = dt
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+    def report(self):
+        """
+        Returns
+        --
+        [dict] Per stage: count (traced calls), total_ms, mean_us, max_us
+        """
+        with self._lock:
+            items = sorted(self._stages.items())
+            return {stage: {'count': n, 'total_ms': total/1e6, 'mean_us': total/n/1e3, 'max_us': peak/1e3}
+                    for stage, (n, total, peak) in items}
+
+    def format(self):
+        lines = ["%-32s %10s %12s %10s %10s" % ('stage', 'count', 'total ms', 'mean us', 'max us')]
+        for stage, r in self.report().items():
+            lines.append("%-32s %10d %12.3f %10.2f %10.2f" %
+                         (stage, r['count'], r['total_ms'], r['mean_us'], r['max_us']))
+        return "\n".join(lines)
+
+
+class ChromeTracer(Tracer):
+    """
+    Records complete events in the Chrome trace event format. Events after max_events are
+    counted in dropped, so memory stays bounded
+    """
+    def __init__(self, stages=None, sample=1, max_events=1000000) -> None:
+        super().__init__(stages, sample)
+        self.max_events = max_events
+        self.dropped = 0
+        self._events = []
+        self._pid = os.getpid()
+
+    def exit(self, stage, token):
+        end = perf_counter_ns()
+        events = self._events
+        if len(events) >= self.max_events:
+            self.dropped += 1
+            return
+        # list.append is atomic, no lock needed
+        events.append((stage, token, end, threading.get_ident()))
+
+    def events(self):
+        return [{'name': stage, 'cat': stage.split(':')[0], 'ph': 'X',
+                 'ts': start/1e3, 'dur': (end-start)/1e3, 'pid': self._pid, 'tid': tid}
+                for stage, start, end, tid in list(self._events)]
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events(), 'displayTimeUnit': 'ns'}, f)
+
+    def clear(self):
+        self._events = []
+        self.dropped = 0
+
+
+class ProfilerTracer(Tracer):
+    """
+    Runs cProfile only inside the selected stages, e.g. ProfilerTracer(['parse:'])
+    to profile the parsers and nothing else. Calls on other threads than the first
+    traced one are not profiled
+    """
+    def __init__(self, stages, sample=1) -> None:
+        super().__init__(stages, sample)
+        self.profile = cProfile.Profile()
+        self._thread = None
+        self._depth = 0
+
+    def enter(self, stage):
+        if self._thread is None:
+            self._thread = threading.get_ident()
+        elif self._thread != threading.get_ident():
+            return False
+        self._depth += 1
+        if self._depth==1:
+            self.profile.enable()
+        return True
+
+    def exit(self, stage, token):
+        if not token:
+            return
+        self._depth -= 1
+        if self._depth==0:
+            self.profile.disable()
+
+    def stats(self, sort='cumulative'):
+        """
+        Returns
+        --
+        [pstats.Stats]
+        """
+        return pstats.Stats(self.profile).sort_stats(sort)
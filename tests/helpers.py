@@ -0,0 +1,24 @@
+"""
+Fake transport and frame factories shared by the tests
+"""
+from siyi_message import SCHEMAS, buildFrame, cmdId
+
+
+class SentFrames:
+    """
+    Transport keeping what the SDK sends. Nothing is answered, replies are fed with
+    cam.feedBuffer()
+    """
+    def __init__(self) -> None:
+        self.frames = []
+
+    def sendto(self, data, addr):
+        self.frames.append(bytes(data))
+
+
+def replyFrame(cmd_id, *values, seq=0):
+    """
+    Frame of a camera reply, from the field values of the response schema of cmd_id
+    """
+    cmd_id = cmdId(cmd_id)
+    return buildFrame(cmd_id, SCHEMAS[cmd_id].response.encode(*values), seq)
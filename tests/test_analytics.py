@@ -0,0 +1,101 @@
+"""
+Flight summaries of siyi_analytics
+"""
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+from siyi_recorder import FrameRecorder, RX, TX
+import siyi_analytics
+from siyi_analytics import SUMMARY_FIELDS, analyzeDirectory, summarizeRecording, writeTable
+from tests.helpers import replyFrame
+
+ATT, MAX_MIN_TEMP, RANGE = 0x0d, 0x14, 0x15
+
+
+
+class AnalyticsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def record(self, name, records):
+        path = os.path.join(self.dir, name)
+        recorder = FrameRecorder(path)
+        for direction, data, stamp in records:
+            recorder.record(direction, data, stamp)
+        recorder.close()
+        return path
+
+    def flight(self, name):
+        records = [(RX, replyFrame(ATT, yaw, -yaw, 0., yaw, 0., 0.), 10.+i*0.1)
+                   for i, yaw in enumerate((-5., 0., 5., 10.))]
+        records += [(TX, replyFrame(ATT, 90., 0., 0., 0., 0., 0.), 10.05),
+                    (RX, replyFrame(MAX_MIN_TEMP, 41.5, -2.25, 0, 0, 0, 0), 10.2),
+                    (RX, replyFrame(RANGE, 0.), 10.25),
+                    (RX, replyFrame(RANGE, 12.5), 10.3),
+                    (RX, replyFrame(RANGE, 30.), 10.35)]
+        corrupted = bytearray(replyFrame(RANGE, 1.))
+        corrupted[-1] ^= 0xff
+        records.append((RX, bytes(corrupted), 10.4))
+        return self.record(name, records)
+
+    @unittest.skipIf(siyi_analytics.np is None, "requires numpy")
+    def test_summary_row(self):
+        row = summarizeRecording(self.flight("a.siyirec"))
+        self.assertIsNone(row['error'])
+        self.assertEqual((row['frames'], row['crc_errors']), (8, 1))
+        self.assertAlmostEqual(row['crc_error_rate'], 1/9)
+        self.assertAlmostEqual(row['duration_s'], 0.35)
+        self.assertEqual(row['att_count'], 4)
+        self.assertAlmostEqual(row['att_rate_hz'], 10.)
+        self.assertAlmostEqual(row['att_gap_max_ms'], 100.)
+        self.assertEqual((row['yaw_min'], row['yaw_max'], row['pitch_min']), (-5., 10., -10.))
+        self.assertEqual(row['yaw_speed_abs_max'], 10.)
+        self.assertEqual((row['temp_count'], row['temp_max'], row['temp_min']), (1, 41.5, -2.25))
+        self.assertIsNone(row['box_temp_count'])
+        self.assertEqual((row['range_count'], row['range_min'], row['range_max']), (3, 12.5, 30.))
+        self.assertAlmostEqual(row['range_valid_ratio'], 2/3)
+
+    @unittest.skipIf(siyi_analytics.np is None, "requires numpy")
+    def test_directory(self):
+        os.mkdir(os.path.join(self.dir, "day2"))
+        self.flight("a.siyirec")
+        self.flight(os.path.join("day2", "b.siyirec"))
+        with open(os.path.join(self.dir, "bad.siyirec"), 'wb') as f:
+            f.write(b'not a recording')
+        output = os.path.join(self.dir, "summary.csv")
+        rows = analyzeDirectory(self.dir, workers=2, output=output)
+        self.assertEqual([os.path.relpath(row['file'], self.dir) for row in rows],
+                         ["a.siyirec", "bad.siyirec", os.path.join("day2", "b.siyirec")])
+        self.assertIsNotNone(rows[1]['error'])
+        self.assertEqual(rows[2]['att_count'], 4)
+        with open(output, newline='') as f:
+            table = list(csv.DictReader(f))
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table[0]['att_count'], '4')
+        self.assertEqual(table[1]['att_count'], '')
+
+    @unittest.skipUnless(siyi_analytics.np is None, "numpy is installed")
+    def test_without_numpy(self):
+        path = self.flight("a.siyirec")
+        row = summarizeRecording(path)
+        self.assertEqual((row['file'], row['frames']), (path, None))
+        self.assertTrue(row['error'].startswith("ImportError"))
+        with self.assertRaises(ImportError):
+            analyzeDirectory(self.dir)
+
+    def test_write_table(self):
+        output = os.path.join(self.dir, "summary.csv")
+        row = dict.fromkeys(SUMMARY_FIELDS)
+        row.update(file='x', frames=3)
+        writeTable([row], output)
+        with open(output, newline='') as f:
+            table = list(csv.DictReader(f))
+        self.assertEqual(tuple(table[0]), SUMMARY_FIELDS)
+        self.assertEqual((table[0]['file'], table[0]['frames'], table[0]['error']), ('x', '3', ''))
+
+
+if __name__=="__main__":
+    unittest.main()
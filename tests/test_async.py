@@ -0,0 +1,144 @@
+"""
+AsyncSIYISDK loops, getters and pipelined requests
+"""
+import asyncio
+import unittest
+from siyi_async import AsyncSIYISDK, _SIYIProtocol
+from siyi_message import COMMAND, SCHEMAS, cmdId
+from siyi_sdk import SIYISDK
+from tests.helpers import replyFrame
+
+ATT = cmdId(COMMAND.ACQUIRE_GIMBAL_ATT)
+POINT_TEMP = cmdId(COMMAND.POINT_TEMP)
+
+
+class DeadTransport:
+    """
+    Transport whose every send fails
+    """
+    def sendto(self, data, addr):
+        raise OSError("Transport is closed")
+
+
+class CameraTransport:
+    """
+    DatagramTransport answering on the event loop after delay seconds, with the seq of the
+    request. answers maps command IDs to a function of the request values returning the
+    reply values. The first drop requests of each command are not answered
+    """
+    def __init__(self, cam, answers, delay=0.01, drop=0) -> None:
+        self._protocol = _SIYIProtocol(cam)
+        self._loop = asyncio.get_running_loop()
+        self.answers = answers
+        self.delay = delay
+        self.drop = drop
+        self.sent = {} # requests by command ID
+        self.in_flight = 0
+        self.max_in_flight = 0
+        cam._transport = self
+        cam._core = SIYISDK(sock=self)
+
+    def sendto(self, data, addr=None):
+        seq, cmd_id = data[5] | data[6] << 8, data[7]
+        self.sent[cmd_id] = n = self.sent.get(cmd_id, 0)+1
+        if n <= self.drop or cmd_id not in self.answers:
+            return
+        values = SCHEMAS[cmd_id].request.decode(bytes(data[8:-2]))
+        frame = replyFrame(cmd_id, *self.answers[cmd_id](values), seq=seq)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self._loop.call_later(self.delay, self._answer, frame)
+
+    def _answer(self, frame):
+        self.in_flight -= 1
+        self._protocol.datagram_received(frame, ('127.0.0.1', 37260))
+
+    def close(self):
+        pass
+
+
+ANSWERS = {ATT: lambda values: (10., -20., 0.5, 0., 0., 0.),
+           POINT_TEMP: lambda values: (values[0]/10., values[0], values[1])}
+
+
+def runWithCamera(test, **kwargs):
+    """
+    Runs test(cam, transport) on a new event loop, with an AsyncSIYISDK on a CameraTransport
+    """
+    async def run():
+        cam = AsyncSIYISDK()
+        transport = CameraTransport(cam, ANSWERS, **kwargs)
+        return await test(cam, transport)
+    return asyncio.run(run())
+
+
+class GetterTest(unittest.TestCase):
+    def test_getters(self):
+        async def test(cam, transport):
+            return await cam.getAttitude(timeout=1.), await cam.getPointTemprature(123, 45, timeout=1.)
+        self.assertEqual(runWithCamera(test), ((10., -20., 0.5), (12.3, 123, 45)))
+
+    def test_max_age(self):
+        async def test(cam, transport):
+            await cam.getAttitude(timeout=1.)
+            cached = await cam.getAttitude(timeout=1., max_age=10.)
+            sent = transport.sent[ATT]
+            await asyncio.sleep(0.02)
+            fresh = await cam.getAttitude(timeout=1., max_age=0.01)
+            return cached, sent, fresh, transport.sent[ATT]
+        cached, sent, fresh, sent_after = runWithCamera(test)
+        self.assertEqual((cached, sent), ((10., -20., 0.5), 1))
+        self.assertEqual((fresh, sent_after), ((10., -20., 0.5), 2))
+
+    def test_retry_after_timeout(self):
+        async def test(cam, transport):
+            return await cam.getAttitude(timeout=0.05, retries=1), transport.sent[ATT]
+        with self.assertLogs('AsyncSIYISDK', 'WARNING') as logs:
+            self.assertEqual(runWithCamera(test, drop=1), ((10., -20., 0.5), 2))
+        self.assertEqual(len(logs.output), 1)
+
+    def test_timeout(self):
+        async def test(cam, transport):
+            return await cam.getAttitude(timeout=0.05, retries=2), transport.sent[ATT]
+        with self.assertLogs('AsyncSIYISDK', 'WARNING') as logs:
+            self.assertEqual(runWithCamera(test, drop=10), (None, 3))
+        self.assertEqual(len(logs.output), 3)
+
+
+class PipelineTest(unittest.TestCase):
+    def test_replies_in_request_order(self):
+        async def test(cam, transport):
+            requests = [(COMMAND.POINT_TEMP, x, 2*x, 1) for x in range(40)]
+            return await cam.pipeline(requests, window=4, timeout=1.), transport
+        replies, transport = runWithCamera(test)
+        self.assertEqual([(r.temprature, r.temp_point_x, r.temp_point_y) for r in replies],
+                         [(x/10., x, 2*x) for x in range(40)])
+        self.assertEqual(transport.max_in_flight, 4)
+
+    def test_unanswered_requests_are_none(self):
+        async def test(cam, transport):
+            return await cam.pipeline([(COMMAND.POINT_TEMP, x, x, 1) for x in range(4)], timeout=0.05)
+        with self.assertLogs('AsyncSIYISDK', 'WARNING'):
+            replies = runWithCamera(test, drop=2)
+        self.assertEqual([r is None for r in replies], [True, True, False, False])
+
+
+class ConnectionLoopTest(unittest.TestCase):
+    def test_failed_checks_wait_for_next_period(self):
+        cam = AsyncSIYISDK()
+        cam._core = SIYISDK(sock=DeadTransport())
+
+        async def run():
+            task = asyncio.ensure_future(cam.connectionLoop(0.1))
+            await asyncio.sleep(0.35)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        with self.assertLogs('SIYISDK', 'ERROR'):
+            asyncio.run(run())
+        self.assertFalse(cam.isConnected())
+        self.assertIn(cam._core.metrics()['send_errors'], (3, 4))
+
+
+if __name__=="__main__":
+    unittest.main()
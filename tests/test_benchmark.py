@@ -0,0 +1,58 @@
+"""
+Result handling of the benchmark suite
+"""
+import unittest
+import siyi_benchmark
+from siyi_benchmark import compareResults, runSuite
+
+
+def results(**values):
+    return {'results': {name: {'value': value, 'unit': unit, 'better': better}
+                        for name, (value, unit, better) in values.items()}}
+
+
+class CompareTest(unittest.TestCase):
+    def test_regressions_worst_first(self):
+        baseline = results(a=(1000., '1/s', 'higher'), b=(10., 'ms', 'lower'), c=(5., '', None))
+        current = results(a=(850., '1/s', 'higher'), b=(13., 'ms', 'lower'), c=(50., '', None))
+        regressions = compareResults(baseline, current, threshold=0.1)
+        self.assertEqual([r[0] for r in regressions], ['b', 'a'])
+        self.assertAlmostEqual(regressions[0][3], 0.3)
+        self.assertAlmostEqual(regressions[1][3], 0.15)
+
+    def test_improvements_noise_and_new_results(self):
+        baseline = results(a=(1000., '1/s', 'higher'), jitter_ms=(0.1, 'ms', 'lower'),
+                           zero=(0., '1/s', 'higher'))
+        current = results(a=(2000., '1/s', 'higher'), jitter_ms=(0.4, 'ms', 'lower'),
+                          zero=(10., '1/s', 'higher'), new=(1., 'ms', 'lower'))
+        self.assertEqual(compareResults(baseline, current), [])
+
+    def test_threshold(self):
+        baseline = results(a=(1000., '1/s', 'higher'))
+        current = results(a=(900., '1/s', 'higher'))
+        self.assertEqual(compareResults(baseline, current, threshold=0.2), [])
+        self.assertEqual(len(compareResults(baseline, current, threshold=0.05)), 1)
+
+
+class RunSuiteTest(unittest.TestCase):
+    def test_units_and_flattening(self):
+        suite = (('micro', lambda n: {'encode': float(n)}, {'n': 2}, {'n': 1}, '1/s'),
+                 ('loop', lambda: {'rtt': {'p50_ms': 1.}, 'cpu_percent': 3., 'drops': {10: 0}},
+                  {}, {}, None))
+        original = siyi_benchmark.SUITE
+        siyi_benchmark.SUITE = suite
+        self.addCleanup(setattr, siyi_benchmark, 'SUITE', original)
+
+        run = runSuite(quick=True, only=None)
+        self.assertTrue(run['meta']['quick'])
+        self.assertEqual(run['results'], {
+            'micro.encode': {'value': 1., 'unit': '1/s', 'better': 'higher'},
+            'loop.rtt.p50_ms': {'value': 1., 'unit': 'ms', 'better': 'lower'},
+            'loop.cpu_percent': {'value': 3., 'unit': '%', 'better': 'lower'},
+            'loop.drops.subscribers_10': {'value': 0, 'unit': '', 'better': None}})
+        self.assertEqual(list(runSuite(only=['micro'])['results']), ['micro.encode'])
+        self.assertEqual(runSuite(only=['micro'])['results']['micro.encode']['value'], 2.)
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+"""
+CRC-16 of crc16_python
+"""
+import unittest
+from crc16_python import CRC16, _crc16_table, crc16, crc16_bytes, crc16_str_swap
+
+# Acquire firmware version request of the SIYI manual, without its CRC
+FIRMWARE_REQUEST = bytes.fromhex('5566010000000001')
+
+
+class CRC16Test(unittest.TestCase):
+    def test_known_values(self):
+        self.assertEqual(crc16(b'123456789'), 0x31c3)
+        self.assertEqual(crc16_bytes(FIRMWARE_REQUEST), bytes.fromhex('64c4'))
+        self.assertEqual(crc16_str_swap(FIRMWARE_REQUEST.hex()), '64c4')
+
+    def test_table_fallback_matches(self):
+        data = bytes(range(256))*3
+        self.assertEqual(_crc16_table(data), crc16(data))
+        self.assertEqual(_crc16_table(b''), 0)
+
+    def test_buffer_protocol(self):
+        data = bytearray(FIRMWARE_REQUEST)+b'tail'
+        self.assertEqual(crc16(memoryview(data)[:8]), crc16(FIRMWARE_REQUEST))
+        self.assertEqual(crc16(data), crc16(bytes(data)))
+
+    def test_incremental(self):
+        c = CRC16(FIRMWARE_REQUEST[:3])
+        copy = c.copy()
+        c.update(FIRMWARE_REQUEST[3:])
+        self.assertEqual(c.value, crc16(FIRMWARE_REQUEST))
+        self.assertEqual(c.digest(), bytes.fromhex('64c4'))
+        self.assertEqual(copy.value, crc16(FIRMWARE_REQUEST[:3]))
+        self.assertEqual(crc16(FIRMWARE_REQUEST[4:], crc16(FIRMWARE_REQUEST[:4])), crc16(FIRMWARE_REQUEST))
+
+    def test_str_swap_rejects_bytes(self):
+        self.assertEqual(crc16_str_swap(FIRMWARE_REQUEST), "")
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+"""
+Batch frame scanning of siyi_decoder
+"""
+import os
+import random
+import shutil
+import struct
+import tempfile
+import unittest
+from crc16_python import crc16, crc16_bytes
+from siyi_message import HEADER_LEN, SCHEMAS, FrameReassembler, buildFrame
+from siyi_recorder import FrameRecorder, RecordingReader, RX, TX
+import siyi_decoder
+from tests.helpers import replyFrame
+
+
+@unittest.skipIf(siyi_decoder.np is None, "requires numpy")
+class ScanFramesTest(unittest.TestCase):
+    def test_matches_reassembler(self):
+        stream = b''.join(buildFrame(0x0d, bytes(range(12)), seq) + b'\x55junk' for seq in range(50))
+        starts, data_lens, crc_errors = siyi_decoder.scanFrames(stream)
+        frames = FrameReassembler(datagram=True).feed(stream)
+        self.assertEqual(len(starts), len(frames))
+        self.assertEqual(crc_errors, 0)
+
+    def test_rejected_nested_header_hides_nothing(self):
+        # The payload of A holds a CRC-valid header X whose claimed length runs past the
+        # end of A over the next frame C. X is nested in A, so C must still be found
+        frame_c = buildFrame(0x0d, bytes(12), 7)
+        payload_len = 16
+        x_data_len = payload_len-HEADER_LEN+2+len(frame_c)
+        x_head = struct.pack('<2sBHHB', b'\x55\x66', 1, x_data_len, 3, 0x15)
+        frame_a = buildFrame(0x99, x_head+bytes(payload_len-HEADER_LEN), 1)
+        stream = frame_a+frame_c
+        stream += crc16_bytes(stream[HEADER_LEN:])
+
+        starts, data_lens, crc_errors = siyi_decoder.scanFrames(stream)
+        self.assertEqual(starts.tolist(), [0, len(frame_a)])
+        self.assertEqual(data_lens.tolist(), [payload_len, 12])
+
+
+def mixedStream(seed, frames=400):
+    """
+    Replies of several commands with junk, corrupted, short and unknown frames between them,
+    and a truncated frame at the end. Returns the stream and the number of corrupted frames
+    """
+    rng = random.Random(seed)
+    parts = []
+    corrupted = 0
+    for seq in range(frames):
+        kind = rng.randrange(8)
+        if kind < 3:
+            frame = replyFrame(0x0d, *[rng.randrange(-1800, 1800)/10. for _ in range(6)], seq=seq)
+        elif kind==3:
+            frame = replyFrame(0x14, rng.randrange(-2000, 15000)/100., rng.randrange(-2000, 2000)/100.,
+                               *[rng.randrange(640) for _ in range(4)], seq=seq)
+        elif kind==4:
+            frame = replyFrame(0x15, rng.randrange(0, 20000)/10., seq=seq)
+        elif kind==5:
+            frame = replyFrame(0x12, rng.randrange(-2000, 2000)/100., rng.randrange(640), rng.randrange(512), seq=seq)
+        elif kind==6:
+            # Unknown command, and a rangefinder reply too short for its schema
+            frame = buildFrame(0xa0, bytes(3), seq)+buildFrame(0x15, b'\x01', seq)
+        else:
+            frame = bytearray(replyFrame(0x0d, 1., 2., 3., 4., 5., 6., seq=seq))
+            frame[HEADER_LEN+rng.randrange(12)] ^= 0x10
+            frame = bytes(frame)
+            corrupted += 1
+        parts.append(frame)
+        parts.append(bytes(rng.choice((0x00, 0x66, 0x13, 0xff)) for _ in range(rng.randrange(4))))
+    parts.append(replyFrame(0x0d, 1., 2., 3., 4., 5., 6.)[:-3])
+    return b''.join(parts), corrupted
+
+
+@unittest.skipIf(siyi_decoder.np is None, "requires numpy")
+class DecodeStreamTest(unittest.TestCase):
+    def test_matches_scalar_decode(self):
+        for seed in range(3):
+            stream, corrupted = mixedStream(seed)
+            decoded = siyi_decoder.decodeStream(stream)
+            reassembler = FrameReassembler(datagram=True)
+            expected, columns = {}, {}
+            short = unknown = 0
+            for cmd_id, seq, data in reassembler.feed(stream):
+                command = SCHEMAS.get(cmd_id)
+                if command is None or command.response is None:
+                    unknown += 1
+                elif len(data) < command.response.size:
+                    short += 1
+                else:
+                    columns[command.name] = ('seq',)+command.response.names
+                    expected.setdefault(command.name, []).append((seq,)+command.response.decode(data))
+
+            self.assertEqual(decoded.frames, reassembler.frames)
+            self.assertEqual(decoded.crc_errors, corrupted)
+            self.assertEqual((decoded.unknown, decoded.short), (unknown, short))
+            self.assertEqual(sorted(decoded), sorted(expected))
+            for name, rows in expected.items():
+                array = decoded[name]
+                actual = list(zip(*[array[column].tolist() for column in columns[name]]))
+                self.assertEqual(actual, rows, name)
+                self.assertTrue(all(stamp!=stamp for stamp in array['stamp'].tolist()))
+
+    def test_stamps_of_datagrams(self):
+        frames = [replyFrame(0x15, float(i), seq=i) for i in range(4)]
+        # The third frame starts in the second datagram and ends in the third
+        stream = b''.join(frames)
+        offsets = [0, len(frames[0])+len(frames[1]), len(stream)-5]
+        decoded = siyi_decoder.decodeStream(stream, offsets, [1., 2., 3.])
+        self.assertEqual(decoded['range_finder']['stamp'].tolist(), [1., 1., 2., 2.])
+        self.assertEqual(decoded['range_finder']['Range_value'].tolist(), [0., 1., 2., 3.])
+
+    def test_crc_batch(self):
+        rng = random.Random(5)
+        stream = bytes(rng.randrange(256) for _ in range(4096))
+        buf = siyi_decoder.np.frombuffer(stream, dtype=siyi_decoder.np.uint8)
+        starts = siyi_decoder.np.array([0, 1, 100, 4000], dtype=siyi_decoder.np.int64)
+        for length in (1, 8, 20, 96):
+            self.assertEqual(siyi_decoder.crc16Batch(buf, starts, length).tolist(),
+                             [crc16(stream[start:start+length]) for start in starts.tolist()])
+
+    def test_empty_and_short(self):
+        for stream in (b'', b'\x55\x66\x01', replyFrame(0x15, 1.)[:-1]):
+            decoded = siyi_decoder.decodeStream(stream)
+            self.assertEqual((decoded.frames, decoded.crc_errors, len(decoded)), (0, 0, 0))
+
+
+@unittest.skipIf(siyi_decoder.np is None, "requires numpy")
+class DecodeRecordingTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, "flight.siyirec")
+
+    def test_chunks_match_whole_stream(self):
+        rng = random.Random(3)
+        stream = b''.join(buildFrame(0x0d, bytes(rng.randrange(256) for _ in range(12)), seq)
+                          + buildFrame(0x15, bytes(2), seq) + b'\x55\x66' + bytes(rng.randrange(4))
+                          for seq in range(300))
+        recorder = FrameRecorder(self.path)
+        stamp = 0.
+        # Datagrams of random sizes, frames are split across them
+        offset = 0
+        while offset < len(stream):
+            n = rng.randrange(1, 60)
+            recorder.record(RX, stream[offset:offset+n], stamp)
+            recorder.record(TX, buildFrame(0x0d, bytes(12)), stamp)
+            offset += n
+            stamp += 0.01
+        recorder.close()
+
+        with RecordingReader(self.path) as reader:
+            offsets, stamps, size = [], [], 0
+            for record_stamp, _, data in reader.records(RX):
+                offsets.append(size)
+                stamps.append(record_stamp)
+                size += len(data)
+            whole = siyi_decoder.decodeStream(reader.data(RX), offsets, stamps)
+        self.assertEqual(whole.frames, 600)
+        self.assertGreater(whole.crc_errors, 0)
+
+        for chunk_size in (1500, 4000, len(stream)*2):
+            chunked = siyi_decoder.decodeRecording(self.path, chunk_size=chunk_size)
+            self.assertEqual((chunked.frames, chunked.crc_errors, chunked.unknown),
+                             (whole.frames, whole.crc_errors, whole.unknown), chunk_size)
+            self.assertEqual(sorted(chunked), sorted(whole))
+            for name in whole:
+                self.assertEqual(chunked[name].tolist(), whole[name].tolist(), (name, chunk_size))
+
+        sent = siyi_decoder.decodeRecording(self.path, direction=TX)
+        self.assertEqual(len(sent['gimbal_attitude']), len(stamps_tx(self.path)))
+
+
+def stamps_tx(path):
+    with RecordingReader(path) as reader:
+        return [record[0] for record in reader.records(TX)]
+
+
+if __name__=="__main__":
+    unittest.main()
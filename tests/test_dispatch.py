@@ -0,0 +1,50 @@
+"""
+Handler table of SIYISDK.feedBuffer
+"""
+import unittest
+from siyi_message import COMMAND, buildFrame, cmdId
+from siyi_sdk import SIYISDK
+from tests.helpers import SentFrames, replyFrame
+
+ZOOM = cmdId(COMMAND.MANUAL_ZOOM)
+ENCODER = cmdId(COMMAND.MAGNETIC_ENCODER)
+
+
+class DispatchTest(unittest.TestCase):
+    def setUp(self):
+        self.cam = SIYISDK(sock=SentFrames())
+
+    def test_builtin_handler(self):
+        self.cam.feedBuffer(replyFrame(ZOOM, 4.5, seq=9))
+        self.assertEqual((self.cam._manualZoom_msg.seq, self.cam._manualZoom_msg.level), (9, 4.5))
+
+    def test_custom_handler(self):
+        received = []
+        self.assertTrue(self.cam.registerHandler(0xa0, lambda data, seq: received.append((data, seq))))
+        self.cam.feedBuffer(buildFrame(0xa0, b'\x01\x02', 3))
+        self.assertEqual(received, [(b'\x01\x02', 3)])
+        self.cam.registerHandler(0xa0, None)
+        with self.assertLogs('SIYISDK', 'WARNING'):
+            self.cam.feedBuffer(buildFrame(0xa0, b'', 4))
+        self.assertEqual(len(received), 1)
+        self.assertEqual(self.cam.metrics()['unknown_ids'], 1)
+        with self.assertLogs('SIYISDK', 'ERROR'):
+            self.assertFalse(self.cam.registerHandler(256, print))
+
+    def test_generic_message_from_schema(self):
+        self.cam.feedBuffer(replyFrame(ENCODER, 1.5, -2., 0., seq=5))
+        seq, stamp, fields = self.cam.getMsg(COMMAND.MAGNETIC_ENCODER)
+        self.assertEqual((seq, fields), (5, {'yaw': 1.5, 'pitch': -2., 'roll': 0.}))
+        self.assertIsNone(self.cam.getMsg(COMMAND.MOTOR_VOLTAGE))
+
+    def test_failing_handler_does_not_stop_datagram(self):
+        self.cam.registerHandler(0xa0, lambda data, seq: 1/0)
+        datagram = buildFrame(0xa0, b'', 1)+replyFrame(ZOOM, 2., seq=2)
+        with self.assertLogs('SIYISDK', 'ERROR'):
+            self.cam.feedBuffer(datagram)
+        self.assertEqual(self.cam._manualZoom_msg.level, 2.)
+        self.assertEqual(self.cam.metrics()['parse_errors'], 1)
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Timers and readers of SelectorEngine, on a fake clock
+"""
+import socket
+import unittest
+from siyi_engine import SelectorEngine
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.
+
+    def __call__(self):
+        return self.now
+
+
+class EngineTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.engine = SelectorEngine(clock=self.clock)
+        self.addCleanup(self.engine.close)
+        self.calls = []
+
+    def at(self, t):
+        self.clock.now = 100.+t
+        self.engine.runOnce(timeout=0)
+
+    def test_timers_run_in_deadline_order(self):
+        self.engine.callLater(0.3, lambda: self.calls.append('c'))
+        self.engine.callLater(0.1, lambda: self.calls.append('a'))
+        self.engine.callLater(0.2, lambda: self.calls.append('b1'))
+        self.engine.callLater(0.2, lambda: self.calls.append('b2'))
+        self.at(0.05)
+        self.assertEqual(self.calls, [])
+        self.at(0.25)
+        # Equal deadlines keep the scheduling order
+        self.assertEqual(self.calls, ['a', 'b1', 'b2'])
+        self.at(1.)
+        self.assertEqual(self.calls, ['a', 'b1', 'b2', 'c'])
+
+    def test_periodic_timer_does_not_drift(self):
+        timer = self.engine.callEvery(0.1, lambda: self.calls.append(self.clock.now))
+        self.at(0.)
+        self.at(0.13) # late run, the next deadline stays at 0.2
+        self.assertAlmostEqual(timer.deadline, 100.2)
+        self.at(0.2)
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(timer.late, 0)
+
+    def test_missed_periods_skipped(self):
+        timer = self.engine.callEvery(0.1, lambda: self.calls.append(self.clock.now))
+        self.at(0.)
+        self.at(0.55) # busy loop: 0.1 to 0.5 missed, run once
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(timer.late, 4)
+        self.assertAlmostEqual(timer.deadline, 100.6)
+
+    def test_cancel(self):
+        timer = self.engine.callEvery(0.1, lambda: self.calls.append('x'))
+        self.engine.callLater(0.1, timer.cancel)
+        self.at(0.)
+        self.at(0.1)
+        self.at(0.2)
+        self.assertEqual(self.calls, ['x'])
+
+    def test_failing_timer_logged(self):
+        self.engine.callLater(0., lambda: 1/0)
+        self.engine.callLater(0., lambda: self.calls.append('after'))
+        with self.assertLogs('SelectorEngine', 'ERROR'):
+            self.at(0.)
+        self.assertEqual(self.calls, ['after'])
+
+    def test_reader(self):
+        a, b = socket.socketpair()
+        self.addCleanup(a.close)
+        self.addCleanup(b.close)
+        self.engine.addReader(a, lambda: self.calls.append(a.recv(16)))
+        b.send(b'ping')
+        self.engine.runOnce(timeout=1.)
+        self.assertEqual(self.calls, [b'ping'])
+        self.assertTrue(self.engine.removeReader(a))
+        self.assertFalse(self.engine.removeReader(a))
+        b.send(b'ignored')
+        self.engine.runOnce(timeout=0)
+        self.assertEqual(self.calls, [b'ping'])
+
+
+if __name__=="__main__":
+    unittest.main()
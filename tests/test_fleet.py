@@ -0,0 +1,100 @@
+"""
+SIYIFleet against dozens of simulated cameras on loopback
+"""
+import logging
+import unittest
+from time import monotonic, sleep
+from siyi_engine import SelectorEngine
+from siyi_fleet import SIYIFleet
+from siyi_simulator import SIYISimulator, GimbalModel
+
+CAMERAS = 24
+
+
+class FleetTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = SelectorEngine()
+        self.sims = []
+        self.fleet = None
+        # Also runs when setUp fails
+        self.addCleanup(self.closeAll)
+        for i in range(CAMERAS):
+            # Every camera has its own attitude and zoom, to tell them apart
+            model = GimbalModel()
+            model.yaw = float(i)
+            model.pitch = -float(i)
+            model.zoom = 1.+i
+            self.sims.append(SIYISimulator(port=0, model=model, engine=self.engine).start())
+        self.assertUniqueAddresses(self.sims)
+        self.fleet = SIYIFleet(local_addr=('127.0.0.1', 0))
+        self.cams = [self.fleet.addCamera(*sim.address) for sim in self.sims]
+
+    def closeAll(self):
+        if self.fleet is not None:
+            self.fleet.close()
+        for sim in self.sims:
+            sim.close()
+        self.engine.stop()
+        self.engine.close()
+
+    def assertUniqueAddresses(self, sims):
+        # Two simulators on one port would look like misrouted replies
+        addresses = [sim.address for sim in sims]
+        duplicates = sorted({a for a in addresses if addresses.count(a) > 1})
+        self.assertEqual(duplicates, [], "simulators share UDP addresses %s" % duplicates)
+
+    def test_replies_reach_their_camera(self):
+        self.assertTrue(self.fleet.connect(maxWaitTime=5.0))
+        for i, cam in enumerate(self.cams):
+            yaw, pitch, roll = cam.getAttitude()
+            self.assertEqual((yaw, pitch), (float(i), -float(i)))
+            self.assertEqual(cam.getZoomLevel(), 1.+i)
+
+    def test_stats_add_up(self):
+        self.assertTrue(self.fleet.connect(maxWaitTime=5.0))
+        sleep(0.5)
+        self.assertEqual(self.fleet.stats()['connected'], CAMERAS)
+        self.fleet.disconnect()
+        # Read what is still on its way, the engine is stopped
+        sleep(0.2)
+        self.fleet._onReadable()
+
+        stats = self.fleet.stats()
+        sent = sum(sim.stats()['replies'] for sim in self.sims)
+        self.assertEqual(stats['cameras'], CAMERAS)
+        self.assertEqual(stats['unknown'], 0)
+        self.assertEqual(stats['crc_errors'], 0)
+        self.assertEqual(stats['datagrams'], sent)
+        self.assertEqual(stats['frames'], sent)
+        self.assertEqual(stats['frames'], sum(cam._reassembler.frames for cam in self.cams))
+        for sim, cam in zip(self.sims, self.cams):
+            self.assertEqual(cam._reassembler.frames, sim.stats()['replies'])
+
+    def test_cameras_added_while_polling(self):
+        self.assertTrue(self.fleet.connect(maxWaitTime=5.0))
+        extra = [SIYISimulator(port=0, engine=self.engine).start() for _ in range(8)]
+        self.sims.extend(extra)
+        self.assertUniqueAddresses(self.sims)
+        # The engine thread keeps iterating the cameras meanwhile
+        errors = []
+        handler = logging.Handler(logging.ERROR)
+        handler.emit = errors.append
+        logging.getLogger('SelectorEngine').addHandler(handler)
+        try:
+            t0 = monotonic()
+            while monotonic()-t0 < 1.0:
+                for sim in extra:
+                    self.fleet.addCamera(*sim.address)
+                for sim in extra:
+                    self.fleet.removeCamera(*sim.address)
+        finally:
+            logging.getLogger('SelectorEngine').removeHandler(handler)
+        self.assertEqual([record.getMessage() for record in errors], [])
+        cams = [self.fleet.addCamera(*sim.address) for sim in extra]
+        self.assertTrue(self.fleet.connect(maxWaitTime=5.0))
+        self.assertTrue(all(cam.getAttitude() is not None for cam in cams))
+        self.assertEqual(self.fleet.stats()['cameras'], CAMERAS+len(extra))
+
+
+if __name__=="__main__":
+    unittest.main()
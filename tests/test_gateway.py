@@ -0,0 +1,205 @@
+"""
+SIYIGateway on loopback, against a scripted camera and against the simulator
+"""
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+from time import sleep
+from siyi_gateway import SIYIGateway, GatewaySocket
+from siyi_message import COMMAND, DATA_STREAM_TYPE, FrameReassembler, buildFrame, cmdId
+from siyi_sdk import SIYISDK
+from siyi_simulator import SIYISimulator
+
+ATT = cmdId(COMMAND.ACQUIRE_GIMBAL_ATT)
+GIMBAL_ROT = cmdId(COMMAND.GIMBAL_ROT)
+DATA_STREAM = cmdId(COMMAND.DATA_STREAM)
+ATT_DATA = bytes(range(12))
+
+
+class ScriptedCamera:
+    """
+    UDP camera answering only when the test says so
+    """
+    def __init__(self) -> None:
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.settimeout(1.0)
+        self.address = self.sock.getsockname()
+        self.reassembler = FrameReassembler(datagram=True)
+        self.peer = None
+
+    def recv(self, timeout=1.0):
+        """
+        Returns the next request (cmd_id, seq, data), None if nothing came within timeout
+        """
+        self.sock.settimeout(timeout)
+        try:
+            buff, self.peer = self.sock.recvfrom(4096)
+        except socket.timeout:
+            return None
+        frames = self.reassembler.feed(buff)
+        return frames[0] if frames else None
+
+    def reply(self, cmd_id, data, seq):
+        self.sock.sendto(buildFrame(cmd_id, data, seq), self.peer)
+
+    def close(self):
+        self.sock.close()
+
+
+class Client(GatewaySocket):
+    def request(self, cmd_id, data=b'', seq=0):
+        self.send(buildFrame(cmd_id, data, seq))
+
+    def reply(self, timeout=1.0):
+        """
+        Returns the next frame (cmd_id, seq, data) from the gateway, None on timeout
+        """
+        self.settimeout(timeout)
+        try:
+            buff = self.recv(4096)
+        except socket.timeout:
+            return None
+        frames = FrameReassembler(datagram=True).feed(buff)
+        return frames[0] if frames else None
+
+
+class GatewayTest(unittest.TestCase):
+    ttl = 0.2
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix='siyi_gateway_test_')
+        self.path = os.path.join(self.dir, 'gateway.sock')
+        self.camera = ScriptedCamera()
+        self.gateway = SIYIGateway(*self.camera.address, path=self.path, ttl=self.ttl,
+                                   client_timeout=0.5).start()
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.gateway.close()
+        self.camera.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def client(self):
+        client = Client(self.path)
+        self.clients.append(client)
+        return client
+
+    def answerQuery(self, client, seq):
+        client.request(ATT, seq=seq)
+        cmd_id, up_seq, data = self.camera.recv()
+        self.camera.reply(ATT, ATT_DATA, up_seq)
+        return client.reply()
+
+    def test_seq_rewritten_and_restored(self):
+        a, b = self.client(), self.client()
+        a.request(GIMBAL_ROT, b'\x10\x00', seq=1234)
+        b.request(GIMBAL_ROT, b'\x20\x00', seq=1234)
+        first = self.camera.recv()
+        second = self.camera.recv()
+        self.assertEqual((first[0], first[2]), (GIMBAL_ROT, b'\x10\x00'))
+        self.assertNotEqual(first[1], second[1])
+        # Answered in the other order, each reply still reaches its client
+        self.camera.reply(GIMBAL_ROT, b'\x02', second[1])
+        self.camera.reply(GIMBAL_ROT, b'\x01', first[1])
+        self.assertEqual(a.reply(), (GIMBAL_ROT, 1234, b'\x01'))
+        self.assertEqual(b.reply(), (GIMBAL_ROT, 1234, b'\x02'))
+
+    def test_identical_queries_coalesced(self):
+        a, b = self.client(), self.client()
+        a.request(ATT, seq=10)
+        cmd_id, up_seq, data = self.camera.recv()
+        b.request(ATT, seq=20)
+        self.assertIsNone(self.camera.recv(timeout=0.2))
+        self.camera.reply(ATT, ATT_DATA, up_seq)
+        self.assertEqual(a.reply(), (ATT, 10, ATT_DATA))
+        self.assertEqual(b.reply(), (ATT, 20, ATT_DATA))
+        self.assertEqual(self.gateway.stats()['coalesced'], 1)
+
+    def test_cache_expires(self):
+        client = self.client()
+        self.assertEqual(self.answerQuery(client, 1), (ATT, 1, ATT_DATA))
+        client.request(ATT, seq=2)
+        self.assertEqual(client.reply(), (ATT, 2, ATT_DATA))
+        self.assertIsNone(self.camera.recv(timeout=0.05))
+        self.assertEqual(self.gateway.stats()['cache_hits'], 1)
+        sleep(self.ttl)
+        self.assertEqual(self.answerQuery(client, 3), (ATT, 3, ATT_DATA))
+
+    def test_control_clears_cache(self):
+        client = self.client()
+        self.answerQuery(client, 1)
+        client.request(GIMBAL_ROT, b'\x10\x00', seq=2)
+        self.assertEqual(self.camera.recv()[0], GIMBAL_ROT)
+        client.request(ATT, seq=3)
+        request = self.camera.recv(timeout=0.1)
+        self.assertIsNotNone(request)
+        self.assertEqual(request[0], ATT)
+
+    def test_stream_rate_drops_when_client_leaves(self):
+        fast, slow = self.client(), self.client()
+        fast.request(DATA_STREAM, bytes((DATA_STREAM_TYPE.ATTITUDE, 7)), seq=1)
+        self.assertEqual(self.camera.recv()[2], bytes((DATA_STREAM_TYPE.ATTITUDE, 7)))
+        slow.request(DATA_STREAM, bytes((DATA_STREAM_TYPE.ATTITUDE, 4)), seq=1)
+        self.assertEqual(self.camera.recv()[2], bytes((DATA_STREAM_TYPE.ATTITUDE, 7)))
+
+        # The fast client goes away, the next pushed frame finds its socket closed
+        fast.close()
+        self.camera.reply(ATT, ATT_DATA, 999)
+        self.assertEqual(slow.reply(), (ATT, 999, ATT_DATA))
+        self.assertEqual(self.camera.recv()[2], bytes((DATA_STREAM_TYPE.ATTITUDE, 4)))
+
+    def test_idle_client_expires(self):
+        client = self.client()
+        client.request(DATA_STREAM, bytes((DATA_STREAM_TYPE.ATTITUDE, 7)), seq=1)
+        self.camera.recv()
+        self.assertEqual(self.gateway.stats()['clients'], 1)
+        # Silent for longer than client_timeout: forgotten and its stream stopped
+        request = self.camera.recv(timeout=2.0)
+        self.assertEqual(request[:1]+request[2:], (DATA_STREAM, bytes((DATA_STREAM_TYPE.ATTITUDE, 0))))
+        self.assertEqual(self.gateway.stats()['clients'], 0)
+
+    def test_camera_with_own_seq_counter(self):
+        client = self.client()
+        # A first reply that happens to match, then the camera's own numbers
+        for camera_seq in (None, 2000, 2001, 5):
+            client.request(ATT, seq=42)
+            cmd_id, up_seq, data = self.camera.recv()
+            self.camera.reply(ATT, ATT_DATA, up_seq if camera_seq is None else camera_seq)
+            self.assertEqual(client.reply(), (ATT, 42, ATT_DATA))
+            sleep(self.ttl)
+        stats = self.gateway.stats()
+        self.assertEqual((stats['unmatched'], stats['in_flight']), (0, 0))
+
+
+class GatewaySimulatorTest(unittest.TestCase):
+    def test_sdk_through_gateway_without_seq_echo(self):
+        path = os.path.join(tempfile.mkdtemp(prefix='siyi_gateway_test_'), 'gateway.sock')
+        with SIYISimulator(port=0, echo_seq=False) as sim, \
+                SIYIGateway(*sim.address, path=path, ttl=0.) as gateway:
+            cams = [SIYISDK(sock=GatewaySocket(path)) for _ in range(3)]
+            for cam in cams:
+                cam._logger.setLevel(logging.ERROR)
+            try:
+                self.assertTrue(all(cam.connect() for cam in cams))
+                # Both counters start at 1, so the first replies matched by chance.
+                # Now the camera numbers its frames far from the gateway's requests
+                sim._seq = 30000
+                for _ in range(20):
+                    for cam in cams:
+                        self.assertIsNotNone(cam.getAttitude(timeout=0.5, retries=0))
+                self.assertEqual(gateway.stats()['unmatched'], 0)
+            finally:
+                for cam in cams:
+                    cam.disconnect()
+                    cam._socket.close()
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+if __name__=="__main__":
+    unittest.main()
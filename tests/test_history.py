@@ -0,0 +1,83 @@
+"""
+Attitude ring buffer of siyi_history
+"""
+import math
+import unittest
+from siyi_message import COMMAND, cmdId
+from siyi_sdk import SIYISDK
+import siyi_history
+from siyi_history import AttitudeHistory
+from tests.helpers import SentFrames, replyFrame
+
+ATT = cmdId(COMMAND.ACQUIRE_GIMBAL_ATT)
+
+
+@unittest.skipIf(siyi_history.np is None, "requires numpy")
+class AttitudeHistoryTest(unittest.TestCase):
+    def test_ring_keeps_newest_in_order(self):
+        history = AttitudeHistory(capacity=3)
+        for i in range(5):
+            self.assertTrue(history.append(float(i), yaw=i, pitch=0., roll=0.))
+        self.assertFalse(history.append(1.5, 0., 0., 0.))
+        t, values = history.samples()
+        self.assertEqual(len(history), 3)
+        self.assertEqual(t.tolist(), [2., 3., 4.])
+        self.assertEqual(values[:, 0].tolist(), [2., 3., 4.])
+        self.assertEqual(history.samples(2.5, 3.5)[0].tolist(), [3.])
+
+    def test_linear_interpolation_wraps_yaw(self):
+        history = AttitudeHistory(capacity=8)
+        history.append(0., 170., -10., 0.)
+        history.append(1., -170., 10., 0.)
+        out = history.interpolate([0.25, 0.5])
+        self.assertAlmostEqual(out[0, 0], 175.)
+        self.assertAlmostEqual(abs(out[1, 0]), 180.)
+        self.assertAlmostEqual(out[0, 1], -5.)
+        self.assertAlmostEqual(out[1, 1], 0.)
+
+    def test_outside_history(self):
+        history = AttitudeHistory(capacity=8)
+        history.append(1., 10., 0., 0.)
+        history.append(2., 20., 0., 0.)
+        self.assertTrue(math.isnan(history.interpolate([0.])[0, 0]))
+        self.assertTrue(math.isnan(history.interpolate([3.])[0, 0]))
+        clamped = history.interpolate([0., 3.], clamp=True)
+        self.assertEqual(clamped[:, 0].tolist(), [10., 20.])
+        with self.assertRaises(ValueError):
+            history.interpolate([1.], method='cubic')
+
+    def test_slerp_matches_linear_on_one_axis(self):
+        history = AttitudeHistory(capacity=8)
+        history.append(0., 10., 0., 0.)
+        history.append(1., 30., 0., 0.)
+        self.assertAlmostEqual(history.interpolate([0.5], method='slerp')[0, 0], 20.)
+
+    def test_circular_yaw_stats(self):
+        history = AttitudeHistory(capacity=8)
+        history.append(0., 179., 0., 0.)
+        history.append(1., -179., 0., 0.)
+        stats = history.stats()
+        self.assertEqual(stats['count'], 2)
+        self.assertAlmostEqual(abs(stats['yaw']['mean']), 180.)
+        self.assertLess(stats['yaw']['std'], 2.)
+        self.assertEqual(history.stats(duration=0.5, now=1.)['count'], 1)
+
+    def test_sdk_appends_replies(self):
+        cam = SIYISDK(sock=SentFrames())
+        self.assertIsNone(cam.getAttitudeHistory())
+        history = cam.enableAttitudeHistory(capacity=16)
+        cam.feedBuffer(replyFrame(ATT, 12.5, -3., 0., 0., 0., 0.))
+        t, values = history.samples()
+        self.assertEqual(len(t), 1)
+        self.assertEqual(values[0, :2].tolist(), [12.5, -3.])
+
+
+@unittest.skipUnless(siyi_history.np is None, "numpy is installed")
+class WithoutNumpyTest(unittest.TestCase):
+    def test_import_error(self):
+        with self.assertRaises(ImportError):
+            AttitudeHistory()
+
+
+if __name__=="__main__":
+    unittest.main()
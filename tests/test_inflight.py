@@ -0,0 +1,122 @@
+"""
+Reply correlation of InFlightRequests and submit()
+"""
+import unittest
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from time import monotonic
+from siyi_message import COMMAND, buildFrame, cmdId
+from siyi_sdk import InFlightRequests, SIYISDK
+from tests.helpers import SentFrames
+
+ATT = 0x0d
+ZOOM = 0x05
+POINT_TEMP = cmdId(COMMAND.POINT_TEMP)
+
+
+class InFlightRequestsTest(unittest.TestCase):
+    def setUp(self):
+        self.inflight = InFlightRequests(timeout=1.0)
+
+    def test_resolve_by_seq(self):
+        first = self.inflight.add(1, ATT)
+        second = self.inflight.add(2, ATT)
+        self.assertIsNotNone(self.inflight.resolve(ATT, 2, 'b'))
+        self.assertEqual(second.result(0), 'b')
+        self.assertFalse(first.done())
+        self.assertEqual(len(self.inflight), 1)
+
+    def test_resolve_oldest_without_seq_echo(self):
+        first = self.inflight.add(1, ATT)
+        second = self.inflight.add(2, ATT)
+        zoom = self.inflight.add(3, ZOOM)
+        # Unknown seq, or the seq of another command: the oldest request of the command
+        self.inflight.resolve(ATT, 500, 'a')
+        self.inflight.resolve(ATT, 3, 'b')
+        self.assertEqual((first.result(0), second.result(0)), ('a', 'b'))
+        self.assertFalse(zoom.done())
+        self.assertIsNone(self.inflight.resolve(ATT, 4, 'c'))
+
+    def test_expire(self):
+        future = self.inflight.add(1, ATT)
+        self.assertEqual(self.inflight.expire(), 0)
+        self.assertEqual(self.inflight.expire(future_deadline(self.inflight)), 1)
+        with self.assertRaises(FutureTimeoutError):
+            future.result(0)
+        self.assertEqual((len(self.inflight), self.inflight.timeouts), (0, 1))
+
+    def test_expire_mixed_timeouts(self):
+        slow = self.inflight.add(1, ATT, timeout=10.)
+        fast = self.inflight.add(2, ATT, timeout=0.1)
+        other = self.inflight.add(3, ZOOM, timeout=0.5)
+        now = future_deadline(self.inflight)
+        # The long request at the head of the ATT queue does not hold the short one back
+        self.assertEqual(self.inflight.expire(now), 2)
+        self.assertTrue(fast.done() and other.done())
+        self.assertFalse(slow.done())
+        self.assertEqual(self.inflight.expire(now+10.), 1)
+        self.assertTrue(slow.done())
+
+    def test_expire_skips_answered(self):
+        answered = self.inflight.add(1, ATT, timeout=0.1)
+        waiting = self.inflight.add(2, ATT, timeout=0.2)
+        self.inflight.resolve(ATT, 1, 'a')
+        self.assertEqual(self.inflight.expire(future_deadline(self.inflight)), 1)
+        self.assertEqual(answered.result(0), 'a')
+        with self.assertRaises(FutureTimeoutError):
+            waiting.result(0)
+
+    def test_reused_seq_fails_old_request(self):
+        old = self.inflight.add(7, ATT)
+        new = self.inflight.add(7, ATT)
+        with self.assertRaises(FutureTimeoutError):
+            old.result(0)
+        self.inflight.resolve(ATT, 7, 'x')
+        self.assertEqual(new.result(0), 'x')
+
+    def test_fail(self):
+        future = self.inflight.add(1, ATT)
+        self.inflight.fail(1, OSError("send failed"))
+        with self.assertRaises(OSError):
+            future.result(0)
+        self.assertEqual(len(self.inflight), 0)
+
+    def test_cancel_all(self):
+        futures = [self.inflight.add(seq, ATT if seq % 2 else ZOOM) for seq in range(6)]
+        self.inflight.cancelAll()
+        self.assertTrue(all(future.cancelled() for future in futures))
+        self.assertEqual(len(self.inflight), 0)
+        self.assertEqual(self.inflight.expire(future_deadline(self.inflight)), 0)
+
+
+class SubmitTest(unittest.TestCase):
+    def setUp(self):
+        self.sock = SentFrames()
+        self.cam = SIYISDK(sock=self.sock)
+
+    def reply(self, data):
+        seq = self.cam._out_msg.frameSeq(self.sock.frames[-1])
+        self.cam.feedBuffer(buildFrame(POINT_TEMP, data, seq))
+
+    def test_truncated_reply_not_delivered(self):
+        first = self.cam.submit(POINT_TEMP, 10, 20, 1)
+        self.reply(bytes.fromhex('d007 0a00 1400'))
+        self.assertEqual(first.result(0).temprature, 20.)
+
+        second = self.cam.submit(POINT_TEMP, 30, 40, 1)
+        self.reply(bytes.fromhex('e803'))
+        # Not the record of the first request as the answer to the second
+        self.assertFalse(second.done())
+        self.assertEqual(self.cam.metrics()['parse_errors'], 1)
+        self.reply(bytes.fromhex('e803 1e00 2800'))
+        self.assertEqual((second.result(0).temprature, second.result(0).temp_point_x), (10., 30))
+
+
+def future_deadline(inflight):
+    """
+    A time after the default deadline of every request added so far
+    """
+    return monotonic()+inflight.timeout+1.
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Frame codec and frame cache of SIYIMESSAGE
+"""
+import unittest
+from siyi_message import COMMAND, SCHEMAS, SIYIMESSAGE, _cachedPayload, buildFrame, clearFrameCache, cmdId
+
+# Acquire firmware version request of the SIYI manual
+FIRMWARE_REQUEST = bytes.fromhex('556601000000000164c4')
+
+
+class CodecTest(unittest.TestCase):
+    def setUp(self):
+        self.msg = SIYIMESSAGE()
+
+    def test_manual_frame(self):
+        self.assertEqual(buildFrame(cmdId(COMMAND.ACQUIRE_DEVICE_INF), b''), FIRMWARE_REQUEST)
+        self.assertEqual(self.msg.firmwareVerFrame(), FIRMWARE_REQUEST)
+        self.assertEqual(self.msg.decodeFrame(FIRMWARE_REQUEST), (b'', 0, 0x01, 0))
+
+    def test_round_trip(self):
+        frame = self.msg.encodeFrame(b'\x01\x02\x03', COMMAND.GIMBAL_ROT)
+        self.assertEqual(self.msg.decodeFrame(frame), (b'\x01\x02\x03', 3, 0x07, 0))
+        # At an offset, in a bytearray
+        self.assertEqual(self.msg.decodeFrame(bytearray(b'xx'+frame), 2)[0], b'\x01\x02\x03')
+
+    def test_invalid_frames(self):
+        with self.assertLogs('SIYIMESSAGE', 'ERROR') as logs:
+            self.assertIsNone(self.msg.decodeFrame(FIRMWARE_REQUEST[:9]))
+            self.assertIsNone(self.msg.decodeFrame(b'\x00'+FIRMWARE_REQUEST[1:]))
+            self.assertIsNone(self.msg.decodeFrame(FIRMWARE_REQUEST[:-1]+b'\x00'))
+            self.assertIsNone(self.msg.decodeFrame(buildFrame(0x0d, bytes(12))[:-4]))
+        self.assertEqual(len(logs.output), 4)
+
+    def test_hex_wrappers(self):
+        self.assertEqual(self.msg.encodeMsg('', COMMAND.ACQUIRE_DEVICE_INF), FIRMWARE_REQUEST.hex())
+        self.assertEqual(self.msg.decodeMsg(self.msg.encodeMsg('0a0b', '0C')), ('0a0b', 2, '0c', 0))
+        with self.assertLogs('SIYIMESSAGE', 'ERROR'):
+            self.assertEqual(self.msg.encodeMsg('zz', '0C'), '')
+            self.assertIsNone(self.msg.decodeMsg('zz'))
+            self.assertIsNone(self.msg.decodeMsg(FIRMWARE_REQUEST))
+
+    def test_hex_builders(self):
+        self.assertEqual(self.msg.firmwareVerMsg(), FIRMWARE_REQUEST.hex())
+        self.assertEqual(self.msg.gimbalSpeedMsg(-10, 120), self.msg.encodeMsg('f664', COMMAND.GIMBAL_ROT))
+        self.assertEqual(self.msg.PointTempMsg(10, 20), self.msg.PointTempFrame(10, 20).hex())
+        args = {'dataStreamFrame': (1, 10)}
+        builders = [name for name in dir(SIYIMESSAGE) if name.endswith('Frame') and name[:-5]+'Msg' in dir(SIYIMESSAGE)
+                    and name not in ('encodeFrame', 'decodeFrame')]
+        self.assertEqual(len(builders), 33)
+        self.assertEqual(SIYIMESSAGE.gimbalAttMsg.__name__, 'gimbalAttMsg')
+        for name in builders:
+            frame_builder = getattr(SIYIMESSAGE, name)
+            values = args.get(name, (1,)*(frame_builder.__code__.co_argcount-1))
+            msg = getattr(self.msg, name[:-5]+'Msg')(*values)
+            self.assertEqual(bytes.fromhex(msg), frame_builder(self.msg, *values), name)
+
+    def test_sequence_numbers(self):
+        msg = SIYIMESSAGE(use_seq=True)
+        frames = [msg.firmwareVerFrame() for _ in range(3)]
+        seqs = [msg.frameSeq(frame) for frame in frames]
+        self.assertEqual(seqs[1:], [seqs[0]+1, seqs[0]+2])
+        for frame, seq in zip(frames, seqs):
+            self.assertEqual(msg.decodeFrame(frame), (b'', 0, 0x01, seq))
+
+
+class FrameCacheTest(unittest.TestCase):
+    def setUp(self):
+        clearFrameCache()
+        self.addCleanup(clearFrameCache)
+
+    def test_repeated_request_built_once(self):
+        msg = SIYIMESSAGE(use_seq=True)
+        first = msg.PointTempFrame(10, 20)
+        second = msg.PointTempFrame(10, 20)
+        self.assertEqual(_cachedPayload.cache_info().hits, 1)
+        # Same frame, each with its own seq and CRC
+        self.assertNotEqual(first, second)
+        self.assertEqual(msg.decodeFrame(first)[0], msg.decodeFrame(second)[0])
+        self.assertEqual(msg.frameSeq(second), msg.frameSeq(first)+1)
+        point = SCHEMAS[cmdId(COMMAND.POINT_TEMP)].request
+        self.assertEqual(msg.decodeFrame(second)[0], point.encode(10, 20, 1))
+
+    def test_frames_match_building_with_seq(self):
+        msg = SIYIMESSAGE(use_seq=True)
+        point = SCHEMAS[cmdId(COMMAND.POINT_TEMP)].request
+        for frame, cmd_id, data in ((msg.PointTempFrame(10, 20), COMMAND.POINT_TEMP, point.encode(10, 20, 1)),
+                                    (msg.gimbalAttFrame(), COMMAND.ACQUIRE_GIMBAL_ATT, b''),
+                                    (msg.encodeFrame(b'\x01', COMMAND.COLOR_MAP), COMMAND.COLOR_MAP, b'\x01')):
+            self.assertEqual(frame, buildFrame(cmdId(cmd_id), data, msg.frameSeq(frame)))
+            self.assertNotEqual(msg.frameSeq(frame), 0)
+
+    def test_constant_requests_survive_clear(self):
+        msg = SIYIMESSAGE()
+        self.assertEqual(msg.gimbalAttFrame(), buildFrame(cmdId(COMMAND.ACQUIRE_GIMBAL_ATT), b''))
+        self.assertEqual(msg.zoomOutFrame(), buildFrame(cmdId(COMMAND.MANUAL_ZOOM), b'\xff'))
+        self.assertEqual(_cachedPayload.cache_info().currsize, 0)
+
+    def test_unhashable_values_not_cached(self):
+        class Index:
+            __hash__ = None
+
+            def __index__(self):
+                return 3
+        msg = SIYIMESSAGE()
+        self.assertEqual(msg.encodeCommand(COMMAND.COLOR_MAP, Index()), msg.encodeCommand(COMMAND.COLOR_MAP, 3))
+        self.assertEqual(_cachedPayload.cache_info().currsize, 1)
+
+
+if __name__=="__main__":
+    unittest.main()
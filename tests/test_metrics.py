@@ -0,0 +1,78 @@
+"""
+Codec and transport counters of SIYISDK and their Prometheus rendering
+"""
+import threading
+import unittest
+from time import sleep
+from siyi_message import COMMAND, buildFrame, cmdId
+from siyi_metrics import prometheusText
+from siyi_sdk import SIYISDK
+from tests.helpers import SentFrames
+
+ZOOM = cmdId(COMMAND.MANUAL_ZOOM)
+
+
+class FailingSocket(SentFrames):
+    """
+    Open socket whose every receive fails
+    """
+    def recvfrom(self, size):
+        raise ConnectionRefusedError("Connection refused")
+
+    def fileno(self):
+        return 3
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.cam = SIYISDK(sock=SentFrames())
+
+    def test_counters(self):
+        self.cam.requestZoomIn()
+        frame = buildFrame(ZOOM, bytes.fromhex('1e00'), 1)
+        corrupted = frame[:-1]+bytes([frame[-1]^0xff])
+        self.cam.feedBuffer(frame+corrupted)
+        self.cam.feedBuffer(buildFrame(0xfe, b'', 2))
+        self.cam.feedBuffer(buildFrame(ZOOM, b'\x01', 3))
+        m = self.cam.metrics()
+        self.assertEqual(m['frames_out'], {'manual_zoom': 1})
+        self.assertEqual(m['frames_in'], {'manual_zoom': 2, 'fe': 1})
+        self.assertEqual((m['datagrams_in'], m['bytes_in']), (3, 2*len(frame)+10+len(frame)-1))
+        self.assertEqual((m['crc_errors'], m['unknown_ids'], m['parse_errors']), (1, 1, 1))
+        self.cam.resetStats()
+        self.assertEqual(self.cam.metrics()['frames_in'], {})
+
+    def test_prometheus_text(self):
+        self.cam.requestZoomIn()
+        text = prometheusText([self.cam])
+        self.assertIn('siyi_frames_sent_total{camera="192.168.144.25:37260",command="manual_zoom"} 1', text)
+        self.assertIn('siyi_recv_errors_total{camera="192.168.144.25:37260"} 0', text)
+
+
+class RecvLoopTest(unittest.TestCase):
+    def test_socket_errors_logged_and_backed_off(self):
+        cam = SIYISDK(sock=FailingSocket())
+        thread = threading.Thread(target=cam.recvLoop)
+        with self.assertLogs('SIYISDK', 'ERROR') as logs:
+            thread.start()
+            sleep(0.35)
+            cam._stop = True
+            thread.join(1)
+        self.assertFalse(thread.is_alive())
+        errors = cam.metrics()['recv_errors']
+        self.assertTrue(1 <= errors <= 5, errors)
+        self.assertIn("Connection refused", logs.output[0])
+
+    def test_closed_socket_ends_loop(self):
+        cam = SIYISDK()
+        cam._socket.close()
+        thread = threading.Thread(target=cam.recvLoop)
+        with self.assertLogs('SIYISDK', 'ERROR'):
+            thread.start()
+            thread.join(1)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(cam.metrics()['recv_errors'], 1)
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Subscriptions of SIYISDK and the queue policies of SubscriptionHub
+"""
+import threading
+import unittest
+from time import monotonic, sleep
+from siyi_message import COMMAND, buildFrame, cmdId
+from siyi_pubsub import POLICY_BLOCK, POLICY_DROP, POLICY_LATEST, TOPIC_ALL, SubscriptionHub, topicId
+from siyi_sdk import SIYISDK
+from tests.helpers import SentFrames, replyFrame
+
+ATT = cmdId(COMMAND.ACQUIRE_GIMBAL_ATT)
+ZOOM = cmdId(COMMAND.MANUAL_ZOOM)
+
+
+def waitFor(condition, timeout=2.):
+    deadline = monotonic()+timeout
+    while not condition():
+        if monotonic() > deadline:
+            return False
+        sleep(0.005)
+    return True
+
+
+class SubscribeTest(unittest.TestCase):
+    def setUp(self):
+        self.cam = SIYISDK(sock=SentFrames())
+        self.addCleanup(lambda: self.cam._hub.close())
+        self.received = []
+
+    def test_records_by_topic(self):
+        self.cam.subscribe('gimbal_attitude', lambda cmd_id, att: self.received.append((cmd_id, att.yaw)),
+                           policy=POLICY_BLOCK)
+        everything = []
+        self.cam.subscribe(TOPIC_ALL, lambda cmd_id, record: everything.append(cmd_id), policy=POLICY_BLOCK)
+        for yaw in (1., 2.):
+            self.cam.feedBuffer(replyFrame(ATT, yaw, 0., 0., 0., 0., 0.))
+        self.cam.feedBuffer(replyFrame(ZOOM, 3.))
+        self.assertTrue(waitFor(lambda: len(everything)==3))
+        self.assertEqual(self.received, [(ATT, 1.), (ATT, 2.)])
+        self.assertEqual(sorted(everything), [ZOOM, ATT, ATT])
+
+    def test_no_publish_without_subscriber(self):
+        sub = self.cam.subscribe(ZOOM, lambda cmd_id, record: None)
+        self.cam.feedBuffer(buildFrame(ATT, bytes(12)))
+        sub.cancel()
+        self.cam.feedBuffer(buildFrame(ZOOM, bytes(2)))
+        self.assertEqual(self.cam._hub.stats()['inbox'], 0)
+        self.assertEqual(sub.delivered, 0)
+
+
+class PolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.hub = SubscriptionHub(workers=1)
+        self.addCleanup(self.hub.close)
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.received = []
+
+    def blocking(self, cmd_id, record):
+        self.started.set()
+        self.release.wait(2.)
+        self.received.append(record)
+
+    def publishWhileBusy(self, sub, n):
+        # The first message keeps the only worker busy, the others queue up
+        self.hub.publish(ATT, 0)
+        self.assertTrue(self.started.wait(2.))
+        for i in range(1, n):
+            self.hub.publish(ATT, i)
+        self.assertTrue(waitFor(lambda: self.hub.stats()['inbox']==0))
+        self.release.set()
+        self.assertTrue(waitFor(lambda: sub.pending()==0 and sub.delivered+sub.dropped==n))
+
+    def test_latest(self):
+        sub = self.hub.subscribe(ATT, self.blocking, policy=POLICY_LATEST)
+        self.publishWhileBusy(sub, 5)
+        self.assertEqual(self.received, [0, 4])
+        self.assertEqual(sub.dropped, 3)
+
+    def test_drop(self):
+        sub = self.hub.subscribe(ATT, self.blocking, queue_size=2, policy=POLICY_DROP)
+        self.publishWhileBusy(sub, 6)
+        self.assertEqual(self.received, [0, 1, 2])
+        self.assertEqual(sub.dropped, 3)
+
+    def test_failing_callback_counted(self):
+        sub = self.hub.subscribe(ATT, lambda cmd_id, record: 1/0)
+        with self.assertLogs('SubscriptionHub', 'ERROR'):
+            self.hub.publish(ATT, 0)
+            self.assertTrue(waitFor(lambda: sub.errors==1))
+        self.assertEqual(sub.delivered, 0)
+
+    def test_full_inbox_drops(self):
+        hub = SubscriptionHub(workers=1, inbox_size=0)
+        self.addCleanup(hub.close)
+        self.assertFalse(hub.publish(ATT, 0))
+        self.assertEqual(hub.dropped, 1)
+
+    def test_topics(self):
+        self.assertEqual(topicId('gimbal_attitude'), ATT)
+        self.assertEqual(topicId(COMMAND.ACQUIRE_GIMBAL_ATT), ATT)
+        self.assertIsNone(topicId(TOPIC_ALL))
+        with self.assertRaises(ValueError):
+            topicId(300)
+        with self.assertRaises(ValueError):
+            self.hub.subscribe(ATT, print, policy='newest')
+
+
+if __name__=="__main__":
+    unittest.main()
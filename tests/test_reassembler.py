@@ -0,0 +1,58 @@
+"""
+FrameReassembler on streams and datagrams
+"""
+import unittest
+from siyi_message import FrameReassembler, buildFrame
+
+ATT_FRAME = buildFrame(0x0d, bytes(range(12)), 1)
+ZOOM_FRAME = buildFrame(0x05, b'\x1e\x00', 2)
+
+
+class StreamTest(unittest.TestCase):
+    def setUp(self):
+        self.reassembler = FrameReassembler()
+
+    def test_split_across_feeds(self):
+        stream = ATT_FRAME+ZOOM_FRAME
+        frames = []
+        for i in range(0, len(stream), 3):
+            frames += self.reassembler.feed(stream[i:i+3])
+        self.assertEqual(frames, [(0x0d, 1, bytes(range(12))), (0x05, 2, b'\x1e\x00')])
+        self.assertEqual((self.reassembler.pending(), self.reassembler.skipped_bytes), (0, 0))
+
+    def test_resync_after_garbage(self):
+        frames = self.reassembler.feed(b'\x00\x55\x01garbage'+ATT_FRAME+b'\xff\x55')
+        self.assertEqual([f[0] for f in frames], [0x0d])
+        self.assertEqual(self.reassembler.skipped_bytes, 11)
+        # Half a header is kept for the next feed
+        self.assertEqual(self.reassembler.pending(), 1)
+        self.assertEqual(self.reassembler.feed(ZOOM_FRAME[1:]), [(0x05, 2, b'\x1e\x00')])
+
+    def test_corrupted_frame_skipped(self):
+        corrupted = ATT_FRAME[:-1]+bytes([ATT_FRAME[-1]^1])
+        self.assertEqual(self.reassembler.feed(corrupted+ZOOM_FRAME), [(0x05, 2, b'\x1e\x00')])
+        self.assertEqual(self.reassembler.crc_errors, 1)
+
+    def test_oversized_length_is_not_waited_for(self):
+        reassembler = FrameReassembler(max_data_len=64)
+        bogus = b'\x55\x66\x01\xff\x7f\x00\x00\x0d'
+        self.assertEqual(reassembler.feed(bogus+ZOOM_FRAME), [(0x05, 2, b'\x1e\x00')])
+
+    def test_reset(self):
+        self.reassembler.feed(ATT_FRAME[:5])
+        self.reassembler.reset()
+        self.assertEqual(self.reassembler.pending(), 0)
+        self.assertEqual(self.reassembler.feed(ZOOM_FRAME), [(0x05, 2, b'\x1e\x00')])
+
+
+class DatagramTest(unittest.TestCase):
+    def test_truncated_frame_not_kept(self):
+        reassembler = FrameReassembler(datagram=True)
+        self.assertEqual(reassembler.feed(ATT_FRAME[:-3]), [])
+        self.assertEqual(reassembler.pending(), 0)
+        self.assertEqual(reassembler.feed(ZOOM_FRAME+ATT_FRAME), [(0x05, 2, b'\x1e\x00'),
+                                                                  (0x0d, 1, bytes(range(12)))])
+
+
+if __name__=="__main__":
+    unittest.main()
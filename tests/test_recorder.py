@@ -0,0 +1,82 @@
+"""
+FrameRecorder and RecordingReader
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from time import sleep
+from siyi_recorder import HEADER_LEN, RECORD_HEADER_LEN, FrameRecorder, RecordingReader, RX, TX
+
+
+class RecorderTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, "flight.siyirec")
+
+    def test_round_trip(self):
+        recorder = FrameRecorder(self.path)
+        self.assertTrue(recorder.record(TX, b'\x55\x66\x01', 1.5))
+        self.assertTrue(recorder.record(RX, b'\x55\x66\x02\x03', 2.5))
+        recorder.close()
+        self.assertEqual(recorder.stats(), {'records': 2, 'bytes': 7, 'dropped': 0,
+                                            'pending_bytes': 0, 'error': None})
+        self.assertFalse(recorder.record(RX, b'\x00'))
+        reader = RecordingReader(self.path)
+        self.addCleanup(reader.close)
+        self.assertEqual(list(reader), [(1.5, TX, b'\x55\x66\x01'), (2.5, RX, b'\x55\x66\x02\x03')])
+
+    def test_full_queue_drops(self):
+        recorder = FrameRecorder(self.path, max_pending=0)
+        self.assertFalse(recorder.record(RX, b'\x00'))
+        recorder.close()
+        self.assertEqual((recorder.stats()['records'], recorder.stats()['dropped']), (0, 1))
+
+    @unittest.skipUnless(os.path.exists('/dev/full'), "needs /dev/full")
+    def test_write_error_reported(self):
+        recorder = FrameRecorder('/dev/full', flush_interval=0.01)
+        with self.assertLogs('FrameRecorder', 'ERROR') as logs:
+            self.assertTrue(recorder.record(RX, b'\x00'*16))
+            for _ in range(200):
+                if recorder.error is not None:
+                    break
+                sleep(0.01)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIsInstance(recorder.error, OSError)
+        # The writer is gone, nothing is queued any more
+        self.assertFalse(recorder.record(RX, b'\x00'))
+        self.assertEqual(recorder.stats()['pending_bytes'], 0)
+        self.assertIsNotNone(recorder.stats()['error'])
+        with self.assertRaises(OSError):
+            recorder.close()
+
+    @unittest.skipUnless(hasattr(os, 'mkfifo'), "needs named pipes")
+    def test_close_leaves_busy_writer_the_file(self):
+        # The writer blocks on a pipe nobody reads yet
+        os.mkfifo(self.path)
+        reader = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+        self.addCleanup(os.close, reader)
+        recorder = FrameRecorder(self.path, flush_interval=0.01)
+        os.set_blocking(reader, True)
+        for _ in range(8):
+            self.assertTrue(recorder.record(RX, bytes(60000)))
+        sleep(0.05)
+        with self.assertLogs('FrameRecorder', 'WARNING'):
+            recorder.close(timeout=0.05)
+        self.assertTrue(recorder._thread.is_alive())
+
+        size = 0
+        while True:
+            chunk = os.read(reader, 1 << 16)
+            if not chunk:
+                break
+            size += len(chunk)
+        recorder._thread.join(5.)
+        self.assertIsNone(recorder.error)
+        self.assertEqual(recorder.records, 8)
+        self.assertEqual(size, HEADER_LEN+8*(RECORD_HEADER_LEN+60000))
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+Immutable timestamped state records
+"""
+import unittest
+from time import monotonic
+from siyi_message import (COMMAND, SCHEMAS, AttitdueMsg, BoxTemperatureMsg, ManualZoomMsg, PointTemperatureMsg,
+                          RangeFinderMsg, TemperatureMsg, cmdId)
+from siyi_sdk import SIYISDK
+from tests.helpers import SentFrames, replyFrame
+
+ATT = cmdId(COMMAND.ACQUIRE_GIMBAL_ATT)
+
+
+class RecordTest(unittest.TestCase):
+    def test_fields_follow_response_schema(self):
+        for record, command in ((AttitdueMsg, COMMAND.ACQUIRE_GIMBAL_ATT), (ManualZoomMsg, COMMAND.MANUAL_ZOOM),
+                                (TemperatureMsg, COMMAND.Max_Min_Temp), (BoxTemperatureMsg, COMMAND.BOX_TEMP),
+                                (PointTemperatureMsg, COMMAND.POINT_TEMP), (RangeFinderMsg, COMMAND.RANGE_FİNDER)):
+            self.assertEqual(record._fields[:2], ('seq', 'stamp'))
+            self.assertEqual(record._fields[2:], SCHEMAS[cmdId(command)].response.names, record.__name__)
+
+    def test_immutable(self):
+        att = AttitdueMsg()
+        with self.assertRaises(AttributeError):
+            att.yaw = 1.
+        with self.assertRaises(AttributeError):
+            att.extra = 1.
+
+    def test_reply_replaces_record(self):
+        cam = SIYISDK(sock=SentFrames())
+        before = cam._att_msg
+        self.assertEqual(before.stamp, 0.)
+        t0 = monotonic()
+        cam.feedBuffer(replyFrame(ATT, 1., 2., 3., 4., 5., 6., seq=7))
+        att = cam._att_msg
+        self.assertIsNot(att, before)
+        self.assertEqual(att, AttitdueMsg(7, att.stamp, 1., 2., 3., 4., 5., 6.))
+        self.assertGreaterEqual(att.stamp, t0)
+        self.assertEqual(before, AttitdueMsg())
+        cam.resetVars()
+        self.assertEqual(cam._att_msg.stamp, 0.)
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Blocking getters of SIYISDK and the replies they accept
+"""
+import threading
+import unittest
+from time import sleep
+from siyi_message import COMMAND, SCHEMAS, buildFrame, cmdId
+from siyi_sdk import SIYISDK
+from tests.helpers import replyFrame
+
+ATT = cmdId(COMMAND.ACQUIRE_GIMBAL_ATT)
+ATT_RESPONSE = SCHEMAS[ATT].response
+PUSHED_SEQ = 0xbeef
+
+
+class PushingCamera:
+    """
+    Pushes an attitude with its own seq, then answers each request with the echoed seq
+    """
+    def __init__(self) -> None:
+        self.cam = None
+        self.yaw = 0.
+
+    def sendto(self, data, addr):
+        seq = data[5] | data[6] << 8
+        self.yaw += 1.
+
+        def reply(yaw=self.yaw):
+            self.cam.feedBuffer(buildFrame(ATT, ATT_RESPONSE.encode(-yaw, 0., 0., 0., 0., 0.), PUSHED_SEQ))
+            self.cam.feedBuffer(buildFrame(ATT, ATT_RESPONSE.encode(yaw, 0., 0., 0., 0., 0.), seq))
+        threading.Timer(0.02, reply).start()
+
+
+class AckingCamera:
+    """
+    Answers parameter reads and writes of the thermal camera and the rangefinder, echoing seqs
+    """
+    REPLIES = {cmdId(COMMAND.Thermal_Params_Get): (10, 20, 30, 40, 50),
+               cmdId(COMMAND.Thermal_Params_Send): (1,),
+               cmdId(COMMAND.Range_finder_params_get): (1,),
+               cmdId(COMMAND.Range_finder_params_send): (1,)}
+
+    def __init__(self) -> None:
+        self.cam = None
+
+    def sendto(self, data, addr):
+        seq, cmd_id = data[5] | data[6] << 8, data[7]
+        frame = replyFrame(cmd_id, *self.REPLIES[cmd_id], seq=seq)
+        threading.Timer(0.02, self.cam.feedBuffer, (frame,)).start()
+
+
+class RequestReplyTest(unittest.TestCase):
+    def setUp(self):
+        self.camera = PushingCamera()
+        self.cam = self.camera.cam = SIYISDK(sock=self.camera)
+
+    def test_pushed_frame_not_taken_for_reply(self):
+        # Until a reply echoes its seq, any record newer than the request is taken
+        self.assertIsNotNone(self.cam.getAttitude(timeout=1., retries=0))
+        sleep(0.1)
+        self.assertTrue(self.cam._seq_echoed)
+        self.assertEqual(self.cam.getAttitude(timeout=1., retries=0)[0], 2.)
+        self.assertEqual(self.cam._att_msg.seq, self.cam._sent_seqs[ATT])
+
+
+class AckTest(unittest.TestCase):
+    def setUp(self):
+        self.camera = AckingCamera()
+        self.cam = self.camera.cam = SIYISDK(sock=self.camera)
+
+    def test_ack_completes_request(self):
+        cam = self.cam
+        self.assertEqual(cam.getThermalParams(timeout=1., retries=0), (10, 20, 30, 40, 50))
+        self.assertTrue(cam._seq_echoed)
+        params = cam._thermal_params_msg
+        ack = cam._requestReply('_thermal_params_msg', COMMAND.Thermal_Params_Send,
+                                lambda: cam.requestThermalParams(10, 20, 30, 40, 50), timeout=1., retries=0)
+        self.assertIsNotNone(ack)
+        self.assertEqual((ack.ack, ack.Distance), (1, 10))
+        self.assertEqual(ack.seq, cam._sent_seqs[cmdId(COMMAND.Thermal_Params_Send)])
+        self.assertGreater(ack.stamp, params.stamp)
+
+        self.assertEqual(cam.getRangefinderStatus(timeout=1., retries=0), 1)
+        ack = cam._requestReply('_rangefinder_params_msg', COMMAND.Range_finder_params_send,
+                                lambda: cam.requestRangefinderStatus(1), timeout=1., retries=0)
+        self.assertIsNotNone(ack)
+        self.assertEqual((ack.ack, ack.laser_state), (1, 1))
+        self.assertEqual(ack.seq, cam._sent_seqs[cmdId(COMMAND.Range_finder_params_send)])
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Schema encoders and decoders against the hex helpers of the former hand written codec
+"""
+import struct
+import unittest
+from siyi_message import SCHEMAS, COMMAND, SIYIMESSAGE, cmdId
+from utils import Hexcon, toHex, toInt
+
+ATT = SCHEMAS[cmdId(COMMAND.ACQUIRE_GIMBAL_ATT)]
+TARGET = SCHEMAS[cmdId(COMMAND.TargetAngle)]
+
+
+def _hexWords(msg, n):
+    """
+    Signed little endian 16 bit words of a hex payload, like the former parsers
+    """
+    return [toInt(msg[4*i+2:4*i+4]+msg[4*i:4*i+2]) for i in range(n)]
+
+
+class MessageSchemaTest(unittest.TestCase):
+    def test_attitude_decode_matches_hex_parser(self):
+        values = (12.3, -4.5, 0.1, 100.0, -200.0, 0.)
+        data = ATT.response.encode(*values)
+        self.assertEqual(ATT.response.decode(data), values)
+        self.assertEqual(tuple(v/10. for v in _hexWords(data.hex(), 6)), values)
+
+    def test_target_angle_encode_matches_hex_builder(self):
+        for yaw, pitch in ((90, -25), (-135.5, 10), (0, -90)):
+            data = TARGET.request.encode(yaw, pitch)
+            self.assertEqual(data.hex(), Hexcon(int(round(yaw*10)))+Hexcon(int(round(pitch*10))))
+            self.assertEqual(TARGET.request.decode(data), (yaw, pitch))
+
+    def test_target_angle_builder_matches_schema(self):
+        msg = SIYIMESSAGE()
+        for yaw, pitch in ((-90, -25), (135.5, -0.1), (0, -90)):
+            self.assertEqual(msg.gimbalTargetFrame(yaw, pitch), msg.encodeCommand(COMMAND.TargetAngle, yaw, pitch))
+            data, _, _, _ = msg.decodeFrame(msg.gimbalTargetFrame(yaw, pitch))
+            self.assertEqual(data.hex(), Hexcon(int(round(yaw*10)))+Hexcon(int(round(pitch*10))))
+        # Clipped instead of raising or wrapping to another angle
+        data, _, _, _ = msg.decodeFrame(msg.gimbalTargetFrame(-4000, 4000))
+        self.assertEqual(TARGET.request.decode(data), (-3276.8, 3276.7))
+
+    def test_signed_bytes_match_hex_builder(self):
+        rot = SCHEMAS[cmdId(COMMAND.GIMBAL_ROT)].request
+        for yaw_speed, pitch_speed in ((100, -100), (-1, 0), (37, -64)):
+            data = rot.encode(yaw_speed, pitch_speed)
+            self.assertEqual(data.hex(), toHex(yaw_speed, 8)+toHex(pitch_speed, 8))
+            self.assertEqual(rot.decode(data), (yaw_speed, pitch_speed))
+
+    def test_decode_dict_and_trailing_bytes(self):
+        data = ATT.response.encode(1., 2., 3., 4., 5., 6.)+b'\xff\xff'
+        self.assertEqual(ATT.response.decodeDict(data)['roll'], 3.)
+
+    def test_out_of_range_raises(self):
+        # 4000 degrees is 40000 tenths, it must not wrap to another angle
+        with self.assertRaisesRegex(struct.error, 'yaw'):
+            TARGET.request.encode(4000., 0.)
+        with self.assertRaises(struct.error):
+            SCHEMAS[cmdId(COMMAND.CENTER)].request.encode(-1)
+        with self.assertRaises(ValueError):
+            TARGET.request.encode(1.)
+
+    def test_short_buffer_raises(self):
+        with self.assertRaises(struct.error):
+            ATT.response.decode(bytes(11))
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+Shared memory telemetry of siyi_shm
+"""
+import multiprocessing
+import threading
+import unittest
+from siyi_message import COMMAND, AttitdueMsg, ManualZoomMsg, RangeFinderMsg, buildFrame, cmdId
+from siyi_sdk import SIYISDK
+import siyi_shm
+from siyi_shm import TelemetryPublisher, TelemetryReader
+from tests.helpers import SentFrames
+
+
+class _Camera:
+    """
+    The records a TelemetryPublisher reads from a SIYISDK
+    """
+    def __init__(self) -> None:
+        self._connected = True
+        self._att_msg = AttitdueMsg()
+        self._manualZoom_msg = ManualZoomMsg()
+        self._rangefinder_msg = RangeFinderMsg()
+
+    def update(self, i):
+        self._att_msg = AttitdueMsg(i, float(i), float(i), -float(i), 0.5, 1., 2., 3.)
+        self._manualZoom_msg = ManualZoomMsg(i, float(i), 1.+i)
+        self._rangefinder_msg = RangeFinderMsg(i, float(i), 10.*i)
+
+
+def _readInChild(name, queue):
+    with TelemetryReader(name) as reader:
+        queue.put(reader.read().yaw)
+
+
+class TelemetryTest(unittest.TestCase):
+    def setUp(self):
+        self.cam = _Camera()
+        self.publisher = TelemetryPublisher()
+        self.addCleanup(self.publisher.close)
+        self.reader = TelemetryReader(self.publisher.name)
+        self.addCleanup(self.reader.close)
+
+    def test_publish_then_read(self):
+        self.assertEqual(self.reader.read().updates, 0)
+        self.cam.update(3)
+        self.publisher.publish(self.cam)
+        snap = self.reader.read()
+        self.assertEqual((snap.updates, snap.connected), (1, True))
+        self.assertEqual((snap.yaw, snap.pitch, snap.roll), (3., -3., 0.5))
+        self.assertEqual((snap.zoom_level, snap.range_value), (4., 30.))
+
+    def test_write_in_progress_retried(self):
+        self.cam.update(1)
+        self.publisher.publish(self.cam)
+        buf = self.publisher._buf
+        seq, = siyi_shm._SEQ.unpack_from(buf, siyi_shm._SEQ_OFFSET)
+        siyi_shm._SEQ.pack_into(buf, siyi_shm._SEQ_OFFSET, seq+1)
+        self.assertIsNone(self.reader.read(max_tries=5))
+        self.assertEqual(self.reader.retries, 5)
+        siyi_shm._SEQ.pack_into(buf, siyi_shm._SEQ_OFFSET, seq)
+        self.assertEqual(self.reader.read().yaw, 1.)
+
+    def test_torn_record_retried(self):
+        # The final counter visible before part of the record, as on weakly ordered CPUs
+        self.cam.update(1)
+        self.publisher.publish(self.cam)
+        buf = self.publisher._buf
+        offset = siyi_shm._PAYLOAD_OFFSET+32
+        saved = bytes(buf[offset:offset+8])
+        buf[offset:offset+8] = bytes(8)
+        self.assertIsNone(self.reader.read(max_tries=5))
+        self.assertEqual((self.reader.retries, self.reader.torn), (5, 5))
+        buf[offset:offset+8] = saved
+        self.assertEqual(self.reader.read().yaw, 1.)
+
+    def test_concurrent_reads_consistent(self):
+        stop = threading.Event()
+
+        def write():
+            i = 0
+            while not stop.is_set():
+                i += 1
+                self.cam.update(i)
+                self.publisher.publish(self.cam)
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            for _ in range(20000):
+                # Threads of one process: the writer may hold the odd counter for a whole
+                # switch interval, longer than max_tries spins
+                snap = None
+                while snap is None:
+                    snap = self.reader.read()
+                self.assertEqual(snap.pitch, -snap.yaw)
+                self.assertEqual(snap.zoom_level, 1.+snap.yaw)
+        finally:
+            stop.set()
+            writer.join()
+
+    def test_child_process_leaves_block(self):
+        self.cam.update(7)
+        self.publisher.publish(self.cam)
+        for method in ('spawn', 'fork'):
+            if method not in multiprocessing.get_all_start_methods():
+                continue
+            ctx = multiprocessing.get_context(method)
+            queue = ctx.Queue()
+            child = ctx.Process(target=_readInChild, args=(self.publisher.name, queue))
+            child.start()
+            self.assertEqual(queue.get(timeout=30), 7.)
+            child.join(30)
+            self.assertEqual(child.exitcode, 0)
+            # Still there once the reader process is gone
+            with TelemetryReader(self.publisher.name) as reader:
+                self.assertEqual(reader.read().yaw, 7.)
+
+    def test_publish_after_close_ignored(self):
+        self.publisher.close()
+        self.publisher.publish(self.cam)
+        self.assertEqual(self.publisher.updates, 0)
+
+    def test_stop_while_receiving(self):
+        cam = SIYISDK(sock=SentFrames())
+        cam.publishTelemetry()
+        frame = buildFrame(cmdId(COMMAND.ACQUIRE_GIMBAL_ATT), bytes(12), 1)
+        errors = []
+
+        def receive():
+            try:
+                for _ in range(20000):
+                    cam.feedBuffer(frame)
+            except Exception as e:
+                errors.append(e)
+        receiver = threading.Thread(target=receive)
+        receiver.start()
+        cam.stopTelemetry()
+        receiver.join()
+        self.assertEqual(errors, [])
+
+    def test_not_a_telemetry_block(self):
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(create=True, size=siyi_shm.SIZE)
+        self.addCleanup(shm.unlink)
+        self.addCleanup(shm.close)
+        with self.assertRaises(ValueError):
+            TelemetryReader(shm.name)
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Round trip times of RTTTracker and LatencyHistogram
+"""
+import unittest
+from siyi_message import COMMAND, cmdId
+from siyi_stats import LatencyHistogram, RTTTracker
+
+ATT = cmdId(COMMAND.ACQUIRE_GIMBAL_ATT)
+PHOTO = cmdId(COMMAND.PHOTO_VIDEO_HDR)
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def test_percentiles_within_bucket_width(self):
+        hist = LatencyHistogram()
+        for i in range(1, 1001):
+            hist.record(i*1e-4) # 0.1 to 100 ms
+        summary = hist.summary()
+        self.assertEqual(summary['count'], 1000)
+        self.assertAlmostEqual(summary['mean'], 50.05)
+        self.assertEqual((summary['min'], summary['max']), (0.1, 100.))
+        for key, expected in (('p50', 50.), ('p95', 95.), ('p99', 99.)):
+            self.assertLess(abs(summary[key]/expected-1.), 0.06, key)
+
+    def test_empty(self):
+        self.assertEqual(LatencyHistogram().summary(), {'count': 0})
+        self.assertIsNone(LatencyHistogram().percentile(50))
+
+
+class RTTTrackerTest(unittest.TestCase):
+    def setUp(self):
+        self.rtt = RTTTracker(timeout=1.)
+
+    def commandStats(self, now):
+        return self.rtt.stats(now)['commands']['gimbal_attitude']
+
+    def test_matched_by_echoed_seq(self):
+        self.rtt.sent(ATT, 1, 10.)
+        self.rtt.sent(ATT, 2, 10.1)
+        self.assertAlmostEqual(self.rtt.received(ATT, 2, 10.15), 0.05)
+        self.assertAlmostEqual(self.rtt.received(ATT, 1, 10.2), 0.2)
+        stats = self.commandStats(10.2)
+        self.assertEqual((stats['sent'], stats['replies'], stats['in_flight']), (2, 2, 0))
+
+    def test_oldest_without_echo(self):
+        self.rtt.sent(ATT, 1, 10.)
+        self.rtt.sent(ATT, 2, 10.1)
+        self.assertAlmostEqual(self.rtt.received(ATT, 0, 10.3), 0.3)
+        self.assertEqual(self.commandStats(10.3)['in_flight'], 1)
+
+    def test_timeouts_and_loss(self):
+        self.rtt.sent(ATT, 1, 10.)
+        self.rtt.sent(ATT, 2, 10.5)
+        self.rtt.received(ATT, 2, 10.6)
+        stats = self.commandStats(12.)
+        self.assertEqual((stats['timeouts'], stats['in_flight'], stats['loss']), (1, 0, 0.5))
+
+    def test_unsolicited_and_untracked(self):
+        self.assertIsNone(self.rtt.received(ATT, 5, 10.))
+        self.rtt.sent(PHOTO, 1, 10.) # no reply expected
+        stats = self.rtt.stats(10.)
+        self.assertEqual(stats['total']['unsolicited'], 1)
+        self.assertEqual(stats['commands'], {})
+
+    def test_kernel_rtt(self):
+        self.rtt.sent(ATT, 1, 10., 1000.)
+        self.rtt.received(ATT, 1, 10.1, 1000.02)
+        self.assertAlmostEqual(self.commandStats(10.1)['kernel_rtt_ms']['max'], 20., places=3)
+
+    def test_reset(self):
+        self.rtt.sent(ATT, 1, 10.)
+        self.rtt.reset()
+        self.assertEqual(self.rtt.stats(10.)['total']['sent'], 0)
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Gimbal pushed data streams, against the simulator
+"""
+import logging
+import unittest
+from time import monotonic, sleep
+from siyi_engine import SelectorEngine
+from siyi_message import COMMAND, DATA_STREAM_TYPE, cmdId
+from siyi_sdk import SIYISDK
+from siyi_simulator import SIYISimulator
+
+ATT = cmdId(COMMAND.ACQUIRE_GIMBAL_ATT)
+
+
+class SilentCamera:
+    def sendto(self, data, addr):
+        pass
+
+
+class DataStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.sim = SIYISimulator(port=0).start()
+        self.addCleanup(self.sim.close)
+        self.engine = SelectorEngine()
+        self.addCleanup(self.engine.close)
+        self.cam = SIYISDK(*self.sim.address)
+        self.cam._logger.setLevel(logging.ERROR)
+        self.addCleanup(self.cam._socket.close)
+        self.addCleanup(self.cam.disconnect)
+        self.assertTrue(self.cam.connect(engine=self.engine))
+
+    def test_pushed_attitude_replaces_polling(self):
+        self.assertTrue(self.cam.requestDataStream(DATA_STREAM_TYPE.ATTITUDE, 50))
+        self.assertEqual(self.cam.getDataStreams(), {DATA_STREAM_TYPE.ATTITUDE: 50})
+        sleep(0.2)
+        polls = self.cam.metrics()['frames_out'].get('gimbal_attitude', 0)
+        received = self.cam.metrics()['frames_in']['gimbal_attitude']
+        sleep(0.5)
+        # Pushed frames keep coming, the 10 Hz poll stays quiet
+        self.assertGreater(self.cam.metrics()['frames_in']['gimbal_attitude']-received, 15)
+        self.assertEqual(self.cam.metrics()['frames_out'].get('gimbal_attitude', 0), polls)
+        self.assertLess(monotonic()-self.cam._att_msg.stamp, 0.1)
+        self.assertIsNotNone(self.cam.getAttitude(max_age=0.1))
+
+        self.assertTrue(self.cam.stopDataStream(DATA_STREAM_TYPE.ATTITUDE))
+        self.assertEqual(self.cam.getDataStreams(), {})
+        sleep(0.5)
+        # Polling is back
+        self.assertGreater(self.cam.metrics()['frames_out']['gimbal_attitude'], polls)
+
+    def test_unsupported_rate(self):
+        with self.assertRaises(ValueError):
+            self.cam.requestDataStream(DATA_STREAM_TYPE.ATTITUDE, 30)
+
+
+class NoAcknowledgementTest(unittest.TestCase):
+    def test_polling_kept(self):
+        cam = SIYISDK(sock=SilentCamera())
+        with self.assertLogs('SIYISDK', 'WARNING'):
+            self.assertFalse(cam.requestDataStream(DATA_STREAM_TYPE.ATTITUDE, 50, timeout=0.05, retries=0))
+        self.assertEqual(cam.getDataStreams(), {})
+        cam._pollAttitude()
+        self.assertEqual(cam.metrics()['frames_out']['gimbal_attitude'], 1)
+
+
+if __name__=="__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Tracing hooks of siyi_trace on a SIYISDK
+"""
+import json
+import os
+import tempfile
+import unittest
+from siyi_message import COMMAND, cmdId
+from siyi_sdk import SIYISDK
+from siyi_trace import ChromeTracer, ProfilerTracer, StageTimer, Tracer, traced
+from tests.helpers import SentFrames, replyFrame
+
+ATT = cmdId(COMMAND.ACQUIRE_GIMBAL_ATT)
+ATT_FRAME = replyFrame(ATT, 1., 2., 3., 0., 0., 0.)
+
+
+class TraceTest(unittest.TestCase):
+    def setUp(self):
+        self.cam = SIYISDK(sock=SentFrames())
+
+    def test_stage_timer(self):
+        timer = StageTimer()
+        self.cam.setTracer(timer)
+        self.cam.requestGimbalAttitude()
+        self.cam.feedBuffer(ATT_FRAME)
+        report = timer.report()
+        for stage in ('encode', 'send', 'dispatch', 'reassemble', 'parse:gimbal_attitude'):
+            self.assertEqual(report[stage]['count'], 1, stage)
+        self.assertEqual(self.cam._att_msg.yaw, 1.)
+        self.assertIn('parse:gimbal_attitude', timer.format())
+
+    def test_clear_restores_methods(self):
+        handler = self.cam._handlers[ATT]
+        self.cam.setTracer(StageTimer())
+        self.assertIsNot(self.cam._handlers[ATT], handler)
+        self.assertIn('feedBuffer', self.cam.__dict__)
+        self.cam.clearTracer()
+        self.assertIs(self.cam._handlers[ATT], handler)
+        for name in ('sendMsg', 'bufferCallback', 'feedBuffer', 'parseGenericMsg'):
+            self.assertNotIn(name, self.cam.__dict__)
+        self.assertNotIn('feed', self.cam._reassembler.__dict__)
+        self.assertNotIn('encodeCommand', self.cam._out_msg.__dict__)
+
+    def test_selected_stages_and_sampling(self):
+        timer = StageTimer(stages=['parse:'], sample=3)
+        self.cam.setTracer(timer)
+        self.assertNotIn('feedBuffer', self.cam.__dict__)
+        for _ in range(7):
+            self.cam.feedBuffer(ATT_FRAME)
+        self.assertEqual(list(timer.report()), ['parse:gimbal_attitude'])
+        self.assertEqual(timer.report()['parse:gimbal_attitude']['count'], 3)
+
+    def test_chrome_trace(self):
+        trace = ChromeTracer(stages=['dispatch'], max_events=2)
+        self.cam.setTracer(trace)
+        for _ in range(3):
+            self.cam.feedBuffer(ATT_FRAME)
+        self.assertEqual(trace.dropped, 1)
+        path = os.path.join(tempfile.mkdtemp(), "trace.json")
+        self.addCleanup(os.rmdir, os.path.dirname(path))
+        self.addCleanup(os.remove, path)
+        trace.save(path)
+        with open(path) as f:
+            events = json.load(f)['traceEvents']
+        self.assertEqual([(e['name'], e['ph']) for e in events], [('dispatch', 'X')]*2)
+
+    def test_profiler(self):
+        profiler = ProfilerTracer(['parse:'])
+        self.cam.setTracer(profiler)
+        self.cam.feedBuffer(ATT_FRAME)
+        names = {func[2] for func in profiler.stats().stats}
+        self.assertIn('parseAttitudeMsg', names)
+        self.assertNotIn('feed', names)
+
+    def test_wrapper_named_after_stage(self):
+        wrapper = traced(Tracer(), 'parse:gimbal_attitude', len)
+        self.assertEqual(wrapper.__name__, 'siyi_stage_parse_gimbal_attitude')
+        self.assertEqual(wrapper.__code__.co_name, 'siyi_stage_parse_gimbal_attitude')
+        self.assertIs(wrapper.__wrapped__, len)
+        self.assertEqual(wrapper('abc'), 3)
+
+
+if __name__=="__main__":
+    unittest.main()